@@ -13,12 +13,18 @@ setup(
         'Operating System :: OS Independent',
         'Natural Language :: Russian',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.3',
-        'Programming Language :: Python :: 3.4',
-        'Programming Language :: Python :: 3.5',
-        'Programming Language :: Python :: 3.6',
+        'Programming Language :: Python :: 3.7',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
     ),
     packages=('vsptd',),
+    # используются упорядоченность словарей (3.7) и распаковка в кортежах (3.5)
+    python_requires='>=3.7',
+    extras_require={
+        'numpy': ('numpy',),  # пакетное вычисление триплетных выражений
+    },
     # data_files=(
     #     ('help', ('README.md',))
     # ),
@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 import unittest
 
-from vsptd.vsptd import Trp, TrpStr, TrpExpr
+from vsptd.vsptd import Trp, TrpStr, TrpExpr, VSPTDSettings
 
 
 class TestTrp(unittest.TestCase):
@@ -152,3 +152,58 @@ class TestTrp(unittest.TestCase):
         trp = Trp('A', 'B', 'C')
         self.assertEqual(dict(prefix='A', name='B', value='C', comment=None, bid=False, special=False),
                          dict(trp))
+
+    def test_from_trusted(self):
+        """Создание без валидации"""
+        self.assertEqual(Trp('A', 'B', 'C', 'D', True, True), Trp.from_trusted('A', 'B', 'C', 'D', True, True))
+        self.assertEqual(Trp('A'), Trp.from_trusted('A'))
+        # валидация не проводится
+        self.assertEqual('a', Trp.from_trusted('a').prefix)
+
+    def test_target(self):
+        """Общие триплеты-цели и интернирование"""
+        target = Trp.target('C', 'D')
+        self.assertIs(target, Trp.target('C', 'D'))
+        self.assertIsNot(target, Trp.target('C', 'D', special=True))
+        self.assertEqual(Trp('C', 'D'), target)
+        self.assertEqual('$A.B=$C.D;', str(Trp('A', 'B', target)))
+        for attr, value in (('value', 1), ('comment', 'E'), ('bid', True), ('special', True)):
+            with self.subTest(attr=attr), self.assertRaises(AttributeError):
+                setattr(target, attr, value)
+        with self.assertRaises(ValueError):
+            Trp.target('c', 'd')
+        # созданный без валидации триплет-цель не отменяет валидацию
+        trusted = Trp._target_trusted('c', 'd')
+        with self.assertRaises(ValueError):
+            Trp.target('c', 'd')
+        self.assertIs(trusted, Trp._target_trusted('c', 'd'))
+
+        self.assertIs(Trp(''.join(['K', 'W', 'O']), 'N').prefix, Trp('KWO', 'N').prefix)
+
+    def test_str_cache(self):
+        """Кэшированное текстовое представление сбрасывается при изменении триплета и настроек"""
+        trp = Trp('A', 'B', 1)
+        trp_str = TrpStr(trp, Trp('C', 'D', 'E'))
+        self.assertEqual("$A.B=1; $C.D='E';", str(trp_str))
+        trp.value = 2
+        trp.comment = 'F'
+        self.assertEqual('$A.B=2"F";', str(trp))
+        self.assertEqual("$A.B=2\"F\"; $C.D='E';", str(trp_str))
+        trp.bid = True
+        self.assertEqual('$A.B=:2"F";', str(trp))
+
+        # значение — изменяемый триплет
+        ref = Trp('G', 'H')
+        trp = Trp('A', 'B', ref)
+        self.assertEqual('$A.B=$G.H;', str(trp))
+        ref.special = True
+        self.assertEqual('$A.B=G.H;', str(trp))
+
+        settings = Trp.settings
+        Trp.settings = VSPTDSettings()
+        Trp.settings.trp_start = '~'
+        try:
+            self.assertEqual('~A.B=G.H;', str(trp))
+            self.assertEqual("~C.D='E';", str(trp_str[1]))
+        finally:
+            Trp.settings = settings
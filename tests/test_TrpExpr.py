@@ -1,7 +1,12 @@
 # -*- coding: utf-8 -*-
 import unittest
 
-from vsptd.vsptd import Trp, TrpStr, TrpExpr
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from vsptd.vsptd import Trp, TrpStr, TrpExpr, TrpExprMemo
 
 
 class TestTrpExpr(unittest.TestCase):
@@ -20,3 +25,92 @@ class TestTrpExpr(unittest.TestCase):
 
         expr2 = TrpExpr(expr, '*', 2)
         self.assertEqual(84, expr2.calculate(trp_str, trp_str_spec))
+
+    def test_compile(self):
+        """Метод compile"""
+        expr = TrpExpr(Trp('A', 'B'), '+', 2, '*', 3)
+        evaluator = expr.compile()
+        self.assertIs(evaluator, expr.compile())  # вычислитель кэшируется
+        self.assertEqual(7, evaluator(TrpStr(Trp('A', 'B', 1))))
+        self.assertEqual(1, len(evaluator.operands))
+
+        # пересоздание вычислителя после изменения элементов
+        expr.items = (Trp('A', 'B'), '-', 1)
+        self.assertIsNot(evaluator, expr.compile())
+        self.assertEqual(0, expr.calculate(TrpStr(Trp('A', 'B', 1))))
+
+        # приоритет операторов и скобки
+        self.assertEqual(-4, TrpExpr('-', 2, '**', 2).calculate())
+        self.assertEqual(6, TrpExpr('(', 1, '+', 2, ')', '*', 2).calculate())
+        self.assertEqual(True, TrpExpr(1, '<', Trp('A', 'B'), '<=', 3).calculate(TrpStr(Trp('A', 'B', 2))))
+
+        for items in (('*', 2), (2, '+'), ('(', 2), (2, '@', 3)):
+            with self.subTest(items=items), self.assertRaises(ValueError):
+                TrpExpr(*items).compile()
+        with self.assertRaises(KeyError):
+            TrpExpr(Trp('A', 'B')).calculate(TrpStr())
+
+    def test_memo(self):
+        """Кэш результатов TrpExprMemo"""
+        memo = TrpExprMemo(maxsize=2)
+        expr = TrpExpr(Trp('A', 'B'), '*', Trp('C', 'D', special=True))
+        special = TrpStr(Trp('C', 'D', 2))
+        for value in (1, 2, 1, 3, 2):
+            self.assertEqual(value * 2, expr.calculate(TrpStr(Trp('A', 'B', value)), special, memo=memo))
+        self.assertEqual((1, 4, 2), (memo.hits, memo.misses, memo.evictions))  # 2 вытеснено значением 3
+        self.assertEqual(2, len(memo))
+
+        # изменённое выражение не использует прежние результаты
+        expr.items = (Trp('A', 'B'), '+', 1)
+        self.assertEqual(3, expr.calculate(TrpStr(Trp('A', 'B', 2)), memo=memo))
+        self.assertEqual(5, memo.misses)
+
+        # равные значения разных типов различаются
+        expr = TrpExpr(Trp('A', 'B'), '*', 10 ** 20)
+        self.assertEqual('100000000000000000000', str(expr.calculate(TrpStr(Trp('A', 'B', 1)), memo=memo)))
+        self.assertEqual('1e+20', str(expr.calculate(TrpStr(Trp('A', 'B', 1.0)), memo=memo)))
+
+        # нехешируемое значение вычисляется без кэша
+        self.assertEqual([1], memo.evaluate(TrpExpr(Trp('A', 'B')).compile(), [[1]]))
+        memo.clear()
+        self.assertEqual((0, 0, 0, 0), (len(memo), memo.hits, memo.misses, memo.evictions))
+
+        for maxsize, error in ((0, ValueError), ('1', TypeError)):
+            with self.subTest(maxsize=maxsize), self.assertRaises(error):
+                TrpExprMemo(maxsize)
+
+    @unittest.skipIf(numpy is None, 'требуется NumPy')
+    def test_calculate_many(self):
+        """Метод calculate_many"""
+        expr = TrpExpr(Trp('A', 'B'), '*', Trp('C', 'D'), '/', Trp('E', 'F', special=True))
+        sources = [
+            TrpStr(Trp('A', 'B', 21), Trp('C', 'D', 2)),
+            TrpStr(Trp('A', 'B', 21)),  # нет триплета
+            TrpStr(Trp('A', 'B', 3), Trp('C', 'D', None)),  # нет значения
+            TrpStr(Trp('A', 'B', 1.5), Trp('C', 'D', 4)),
+        ]
+        result = expr.calculate_many(sources, TrpStr(Trp('E', 'F', 1)))
+        self.assertEqual([False, True, True, False], result.mask.tolist())
+        self.assertEqual([42, None, None, 6], result.tolist())
+        self.assertEqual(
+            [expr.calculate(source, TrpStr(Trp('E', 'F', 1))) for source in sources[::3]],
+            result.compressed().tolist()
+        )
+
+    @unittest.skipIf(numpy is None, 'требуется NumPy')
+    def test_calculate_many_errors(self):
+        """Пакетное вычисление совпадает с calculate: нет переполнения, строки с ошибками маскируются"""
+        def calculate_many(op, *pairs):
+            expr = TrpExpr(Trp('A', 'B'), op, Trp('C', 'D'))
+            sources = [TrpStr(Trp('A', 'B', a), Trp('C', 'D', c)) for a, c in pairs]
+            return expr.calculate_many(sources)
+
+        self.assertEqual([10 ** 24], calculate_many('*', (10 ** 12, 10 ** 12)).tolist())
+        result = calculate_many('//', (1, 0), (7, 2))
+        self.assertEqual([True, False], result.mask.tolist())
+        self.assertEqual([None, 3], result.tolist())
+        self.assertEqual([0.5, 8], calculate_many('**', (2, -1), (2, 3)).tolist())
+        result = calculate_many('/', (1.0, 0.0), (1.0, 4.0))
+        self.assertEqual([None, 0.25], result.tolist())
+        with self.assertRaises(ZeroDivisionError):
+            TrpExpr(Trp('A', 'B'), '/', Trp('C', 'D')).calculate(TrpStr(Trp('A', 'B', 1.0), Trp('C', 'D', 0.0)))
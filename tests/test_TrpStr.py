@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 import unittest
 
-from vsptd.vsptd import Trp, TrpStr
+from vsptd.vsptd import Trp, TrpStr, VSPTDSettings
 
 
 class TestTrpStr(unittest.TestCase):
@@ -207,3 +207,117 @@ class TestTrpStr(unittest.TestCase):
         _trp_str = TrpStr(Trp('A', 'B', 'C'), Trp('A', 'D', 'C'),  Trp('A2', 'D', 'C'), Trp('D', 'E', 'F'))
         del _trp_str[:100]
         self.assertEqual(TrpStr(), _trp_str)
+
+    def test_from_records(self):
+        """Создание из кортежей параметров"""
+        _trp_str = TrpStr.from_records([('A', 'B', 'C'), ('A', 'D', 1, 'E', True), ('F',)])
+        self.assertEqual(TrpStr(Trp('A', 'B', 'C'), Trp('A', 'D', 1, 'E', True), Trp('F')), _trp_str)
+        self.assertEqual(Trp('A', 'D', 1, 'E', True), _trp_str['A', 'D'])
+
+    def test_to_records(self):
+        """Выгрузка в кортежи параметров"""
+        _trp_str = TrpStr(Trp('A', 'B', 'C'), Trp('A', 'D', Trp('F', 'G'), 'E', True), Trp('F', special=True))
+        records = _trp_str.to_records()
+        self.assertEqual(
+            [('A', 'B', 'C', None, False, False), ('A', 'D', Trp('F', 'G'), 'E', True, False),
+             ('F', None, None, None, False, True)],
+            records
+        )
+        self.assertEqual(_trp_str, TrpStr.from_records(records))
+        self.assertEqual(records[1:2], _trp_str.getpr('A')[1:].to_records())
+        self.assertEqual(records[1], _trp_str['A', 'D'].to_record())
+
+    def test_prefix_index(self):
+        """Согласованность индекса по префиксам при изменении триплетной строки"""
+        _trp_str = TrpStr(Trp('B', 'A', 1), Trp('A', 'B', 2), Trp('B', 'C', 3))
+        _trp_str.add(Trp('B', 'A', 4))
+        self.assertEqual((Trp('B', 'A', 4), Trp('B', 'C', 3)), tuple(_trp_str.getpr('B')))
+
+        _trp_str2 = _trp_str + Trp('C', 'D', 5)
+        self.assertIn('C', _trp_str2)
+        self.assertNotIn('C', _trp_str)
+
+        _trp_str.sort()
+        self.assertEqual((Trp('B', 'A', 4), Trp('B', 'C', 3)), tuple(_trp_str.getpr('B')))
+
+        _trp_str.rem('A', 'B')
+        self.assertNotIn('A', _trp_str)
+        with self.assertRaises(KeyError):
+            _trp_str.getpr('A')
+
+        del _trp_str[0]
+        _trp_str.rempr('B')
+        self.assertEqual(TrpStr(), _trp_str)
+        with self.assertRaises(KeyError):
+            _trp_str.rempr('B')
+
+    def test_positions(self):
+        """Позиционный доступ после удалений и обновлений"""
+        trps = [Trp('A', name, i) for i, name in enumerate(a + b for a in 'ABCDEFGH' for b in 'ABCDEFGH')]
+        _trp_str = TrpStr(*trps)
+        for trp in trps[::3]:
+            _trp_str.rem(trp.prefix, trp.name)
+        del trps[::3]
+        _trp_str.add(Trp('A', 'BC', 'X'))
+        trps[trps.index(Trp('A', 'BC', 10))] = Trp('A', 'BC', 'X')
+
+        self.assertEqual(trps, list(_trp_str))
+        self.assertEqual(trps[5], _trp_str[5])
+        self.assertEqual(trps[-7], _trp_str[-7])
+        self.assertEqual(trps[10:30:4], list(_trp_str[10:30:4]))
+        self.assertEqual(trps.index(Trp('A', 'HG', 62)), _trp_str.index(Trp('A', 'HG', 62)))
+        with self.assertRaises(ValueError):
+            _trp_str.index(Trp('A', 'HG', 0))
+
+        del _trp_str[-1], trps[-1]
+        del _trp_str[3], trps[3]
+        self.assertEqual(trps, list(_trp_str))
+        self.assertEqual(len(trps) - 1, _trp_str.index(trps[-1]))
+
+        # удаление по индексу, затем по ключу и поиск позиции до уплотнения списка ключей
+        del _trp_str[0], trps[0]
+        _trp_str.rem(trps[1].prefix, trps[1].name)
+        del trps[1]
+        self.assertEqual(len(trps) - 1, _trp_str.index(trps[-1]))
+        self.assertEqual(trps, list(_trp_str))
+        self.assertEqual(trps[1], _trp_str[1])
+
+    def test_copy_on_write(self):
+        """Выборки, срезы и суммы не зависят от последующих изменений исходной строки и наоборот"""
+        _trp_str = TrpStr(Trp('A', 'B', 1), Trp('A', 'C', 2), Trp('D', 'E', 3))
+        by_prefix = _trp_str.getpr('A')
+        sliced = _trp_str[1:]
+        summed = _trp_str + Trp('F', 'G', 4)
+
+        _trp_str.add(Trp('A', 'H', 5))
+        _trp_str.rem('A', 'C')
+        self.assertEqual((Trp('A', 'B', 1), Trp('A', 'C', 2)), tuple(by_prefix))
+        self.assertEqual((Trp('A', 'C', 2), Trp('D', 'E', 3)), tuple(sliced))
+        self.assertEqual(4, len(summed))
+
+        by_prefix.rem('A', 'B')
+        sliced.sort()
+        self.assertEqual((Trp('A', 'B', 1), Trp('D', 'E', 3), Trp('A', 'H', 5)), tuple(_trp_str))
+        self.assertEqual(TrpStr(Trp('A', 'C', 2)), by_prefix)
+        self.assertEqual(Trp('F', 'G', 4), summed[-1])
+
+    def test_prefix_family(self):
+        """Нестрогий поиск по семейству префиксов"""
+        _trp_str = TrpStr(Trp('E', 'A', 1), Trp('A', 'B', 2), Trp('E2', 'C', 3), Trp('E1', 'D', 4))
+        self.assertEqual((Trp('E', 'A', 1), Trp('E2', 'C', 3), Trp('E1', 'D', 4)),
+                         tuple(_trp_str.getpr('E', strict=False)))
+        self.assertEqual((Trp('E', 'A', 1),), tuple(_trp_str.getpr('E')))
+
+        # изменение правила семейства в настройках
+        settings = TrpStr.settings
+        TrpStr.settings = VSPTDSettings()
+        TrpStr.settings.prefix_family_regexp = r'([A-Z])[A-Z]*\d*'
+        try:
+            _trp_str.add(Trp('EE', 'F', 5))
+            self.assertEqual((Trp('E', 'A', 1), Trp('E2', 'C', 3), Trp('E1', 'D', 4), Trp('EE', 'F', 5)),
+                             tuple(_trp_str.getpr('E', strict=False)))
+        finally:
+            TrpStr.settings = settings
+
+        _trp_str.rempr('E', strict=False)
+        self.assertEqual(TrpStr(Trp('A', 'B', 2), Trp('EE', 'F', 5)), _trp_str)
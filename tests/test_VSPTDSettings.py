@@ -59,6 +59,20 @@ class TestVSPTDSettings(unittest.TestCase):
         with self.assertRaises(TypeError):
             setts.validate(comment=123)
 
+    def test_compiled_validators(self):
+        """Скомпилированные валидаторы пересоздаются при изменении настроек"""
+        setts = VSPTDSettings()
+        setts.validate_prefix('AB')
+        setts.prefix_max = 1
+        with self.assertRaises(ValueError):
+            setts.validate_prefix('AB')
+        setts.from_dict(dict(prefix_max=2, prefix_regexp=r'[a-z]+'))
+        setts.validate_prefix('ab')
+        with self.assertRaises(ValueError):
+            setts.validate(prefix='AB')
+        # валидаторы не попадают в словарь настроек
+        self.assertNotIn('validate_prefix', setts.to_dict())
+
     def test_to_dict(self):
         """Метод to_dict"""
         setts = VSPTDSettings()
@@ -76,6 +90,7 @@ class TestVSPTDSettings(unittest.TestCase):
             prefix_max=32,
             prefix_min=1,
             prefix_regexp=r'[A-Z]+\d*',
+            prefix_family_regexp=r'([A-Z]+)\d*',
             prefix_types=(str,),
             name_max=32,
             name_min=1,
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from vsptd.vsptd import Trp, TrpStr, TrpExpr
+from vsptd.parse import parse_trp_str
+from vsptd.extra import VSPTDTechProcTable
+from vsptd.binary import dumps, loads, dumps_table, loads_table
+
+
+class TestBinary(unittest.TestCase):
+    def test_roundtrip(self):
+        """Кодирование и декодирование совпадают с текстовым представлением"""
+        text = "$A.B=1; $A.C=2.5; $A.D='Э'\"комм\"; $B.E=$A.B; $C.G=12345678901234567890123;"
+        trp_str = parse_trp_str(text)
+        for data in (dumps(trp_str), bytearray(dumps(trp_str)), memoryview(dumps(trp_str))):
+            self.assertEqual(str(loads(data)), text)
+        self.assertEqual(loads(dumps(Trp('A', 'B', 'C', 'D'))), Trp('A', 'B', 'C', 'D'))
+        trp_str = TrpStr(Trp('B', 'F', TrpExpr(Trp('A', 'B'), '*', 2, '+', 3)), Trp('C', 'G', 1, bid=True), Trp('C', 'H'))
+        self.assertEqual(str(loads(dumps(trp_str))), str(trp_str))
+        self.assertEqual(str(loads(dumps(TrpExpr(Trp('A', 'B'), '+', 1)))), '$A.B+1')
+
+    def test_table(self):
+        """Пакет триплетных строк"""
+        table = VSPTDTechProcTable()
+        for i in range(3):
+            table.add(parse_trp_str("$A.N=%d; $P.N=1; $P.KWO=2; $Q.DI=3; $Q.D='Э'; $F.G=$A.N;" % i))
+        records = loads_table(dumps_table(table), list)
+        self.assertEqual([str(record) for record in records], [str(record) for _, record in table])
+        self.assertEqual(len(loads_table(dumps_table([]))), 0)
+        self.assertIsInstance(loads_table(dumps_table(table)), VSPTDTechProcTable)
+
+    def test_table_keys(self):
+        """Первичные ключи таблицы сохраняются как есть"""
+        table = VSPTDTechProcTable.from_records([('k1', 'A', 'N', 1, None, False, False),
+                                                 ('k2', 'A', 'N', 2, None, False, False)])
+        restored = loads_table(dumps_table(table))
+        self.assertEqual(restored.to_records(), table.to_records())
+        with self.assertRaises(TypeError):
+            dumps_table(VSPTDTechProcTable.from_records([(1, 'A', 'N', 1, None, False, False)]))
+
+        # пакет версии 1 (без ключей): ключ вычисляется заново
+        trp_str = parse_trp_str("$A.N=1; $P.N=1; $P.KWO=2; $Q.DI=3;")
+        data = dumps_table([trp_str])
+        count = b'\x01\x00\x00\x00'
+        old = data[:4] + b'\x01' + data[5:].replace(count + b'\xff\xff\xff\xff', count, 1)
+        self.assertEqual(len(old), len(data) - 4)
+        expected = VSPTDTechProcTable()
+        expected.add(trp_str)
+        self.assertEqual(loads_table(old).to_records(), expected.to_records())
+
+    def test_errors(self):
+        """Повреждённые данные"""
+        data = dumps(TrpStr(Trp('A', 'B', 'C'), Trp('A', 'D', 1)))
+        for i in range(len(data)):
+            with self.assertRaises(ValueError):
+                loads(data[:i])
+        with self.assertRaises(ValueError):
+            loads(data + b'\0')
+        with self.assertRaises(ValueError):
+            loads(data[:4] + b'\xff' + data[5:])
+        with self.assertRaises(ValueError):
+            loads_table(data)
+        with self.assertRaises(TypeError):
+            dumps('$A.B;')
@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 import unittest
 
-from vsptd.vsptd import Trp, TrpStr
+from vsptd.vsptd import VSPTDSettings, Trp, TrpStr, TrpExpr
 from vsptd.extra import *
 
 
@@ -32,6 +32,40 @@ class TestSatisfyBid(unittest.TestCase):
         self.assertEqual(Trp('A', 'B', 'C'), satisfy_bid(Trp('A', 'B', bid=True), my_trp_str))
 
 
+class TestBidPlan(unittest.TestCase):
+    """Класс BidPlan"""
+    def test_resolve(self):
+        bids = [Trp('A', bid=True), Trp('A', 'B', bid=True), Trp('D', 'E', bid=True), Trp('X', 'Y', bid=True),
+                Trp('A', 'B', bid=True)]
+        trp_strs = [
+            TrpStr(Trp('A', 'B', 'C'), Trp('D', 'E', 'F'), Trp('A', 'R', 'H')),
+            TrpStr(Trp('D', 'E', 1)),
+            TrpStr(*(Trp('M', 'N' * i, i) for i in range(1, 10)), Trp('X', 'Y', 'Z')),
+        ]
+        plan = BidPlan(*bids)
+        results = list(plan.resolve_all(trp_strs))
+        self.assertEqual([0, 1, 2], [key for key, _ in results])
+        # результаты совпадают с satisfy_bid
+        for (_, result), trp_str in zip(results, trp_strs):
+            for found, bid in zip(result, bids):
+                try:
+                    expected = satisfy_bid(bid, trp_str)
+                except KeyError:
+                    expected = None
+                self.assertEqual(expected, found)
+
+        table = VSPTDTechProcTable(TrpStr(Trp('A', 'N', 1), Trp('P', 'N', 1), Trp('P', 'KWO', 5), Trp('Q', 'DI', 1)))
+        self.assertEqual(
+            [('000100100501', [None, Trp('P', 'KWO', 5)])],
+            list(BidPlan(Trp('B', bid=True), Trp('P', 'KWO', bid=True)).resolve_all(table))
+        )
+
+        with self.assertRaises(ValueError):
+            BidPlan(Trp('A', 'B'))
+        with self.assertRaises(TypeError):
+            BidPlan(TrpStr())
+
+
 class TestVSPTDTechProcTable(unittest.TestCase):
     """Класс VSPTDTechProcTable"""
     def test_init(self):
@@ -59,3 +93,210 @@ class TestVSPTDTechProcTable(unittest.TestCase):
         self.assertEqual('000000000000', _.calc_primary_key(trp_str))
         trp_str = TrpStr(Trp('A', 'N', 1), Trp('P', 'N', 3), Trp('P', 'KWO', '000'), Trp('Q', 'DI', '00'))
         self.assertEqual('000100300000', _.calc_primary_key(trp_str))
+
+    def test_records(self):
+        """Методы to_records и from_records"""
+        _ = VSPTDTechProcTable(
+            TrpStr(Trp('A', 'N', '0000'), Trp('P', 'N', '000'), Trp('P', 'KWO', '000'), Trp('Q', 'DI', '00')),
+            TrpStr(Trp('A', 'N', 1), Trp('P', 'N', 3), Trp('P', 'KWO', '000'), Trp('Q', 'DI', '00', 'C')),
+        )
+        records = _.to_records()
+        self.assertEqual(8, len(records))
+        self.assertEqual(('000100300000', 'Q', 'DI', '00', 'C', False, False), records[-1])
+
+        # порядок строк определяется первым появлением ключа
+        table = VSPTDTechProcTable.from_records(records[4:] + records[:4])
+        self.assertEqual(['000100300000', '000000000000'], [key for key, _ in table])
+        self.assertEqual(_['000100300000'], table['000100300000'])
+        self.assertEqual(str(_), str(VSPTDTechProcTable.from_records(records)))
+
+    def test_index(self):
+        """Вторичные индексы"""
+        def trp_str(a_n, kwo, material='Сталь'):
+            return TrpStr(
+                Trp('A', 'N', a_n), Trp('P', 'N', 1), Trp('P', 'KWO', kwo), Trp('Q', 'DI', 1), Trp('M', 'MAT', material)
+            )
+
+        _ = VSPTDTechProcTable(trp_str(1, 5), trp_str(2, 7))
+        with self.assertRaises(KeyError):
+            _.lookup('P', 'KWO', 5)
+        _.create_index('P', 'KWO')
+        _.create_index('M', 'MAT')
+        self.assertEqual([('P', 'KWO'), ('M', 'MAT')], _.indexes())
+        self.assertEqual([trp_str(1, 5)], _.lookup('P', 'KWO', 5))
+        self.assertEqual(['000100100501', '000200100701'], _.lookup_keys('M', 'MAT', 'Сталь'))
+
+        # индексы поддерживаются при добавлении, замене и удалении строк
+        _.add(trp_str(3, 5))
+        self.assertEqual(['000100100501', '000300100501'], _.lookup_keys('P', 'KWO', 5))
+        _.add(trp_str(3, 5, Trp.target('X', 'Y')))
+        self.assertEqual(['000300100501'], _.lookup_keys('M', 'MAT', Trp('X', 'Y')))
+        self.assertEqual(['000100100501', '000200100701'], _.lookup_keys('M', 'MAT', 'Сталь'))
+        del _['000100100501']
+        self.assertEqual(['000300100501'], _.lookup_keys('P', 'KWO', 5))
+        self.assertEqual([], _.lookup_keys('P', 'KWO', 100))
+
+        # ключи значений-триплетов и выражений не зависят от настроек текстового представления
+        expr = TrpExpr(Trp('X', 'Y'), '*', TrpExpr(2, '+', 1))
+        _.add(trp_str(4, 5, expr))
+        settings = Trp.settings, TrpExpr.settings
+        Trp.settings, TrpExpr.settings = VSPTDSettings(), VSPTDSettings()
+        Trp.settings.trp_start = TrpExpr.settings.trp_expr_items_sprtr = ' '
+        try:
+            self.assertEqual(['000300100501'], _.lookup_keys('M', 'MAT', Trp('X', 'Y')))
+            same = TrpExpr(Trp('X', 'Y'), '*', TrpExpr(2, '+', 1))
+            self.assertEqual(['000400100501'], _.lookup_keys('M', 'MAT', same))
+        finally:
+            Trp.settings, TrpExpr.settings = settings
+
+        _.drop_index('M', 'MAT')
+        with self.assertRaises(KeyError):
+            _.lookup_keys('M', 'MAT', 'Сталь')
+
+
+class TestValueIndex(unittest.TestCase):
+    """Класс ValueIndex"""
+    def test_find(self):
+        index = ValueIndex([
+            TrpStr(Trp('A', 'N', 1), Trp('M', 'MAT', 'Сталь')),
+            TrpStr(Trp('A', 'N', 2.0), Trp('B', 'C', Trp('A', 'N')), Trp('B', 'E', 'Сталь')),
+            TrpStr(Trp('B', 'D', TrpExpr(Trp('C', 'D'), '+', TrpExpr(Trp('A', 'N'), '*', 2)))),
+        ])
+        self.assertEqual(3, len(index))
+        self.assertEqual([(0, 'M', 'MAT'), (1, 'B', 'E')], index.find('Сталь'))
+        self.assertEqual([(1, 'A', 'N')], index.find(2))
+        self.assertEqual([(1, 'B', 'C'), (2, 'B', 'D')], index.references('A', 'N'))
+        self.assertEqual([(2, 'B', 'D')], index.find(Trp('C', 'D')))
+        self.assertEqual([(2, 'B', 'D')], index.find(TrpExpr(Trp('C', 'D'), '+', TrpExpr(Trp('A', 'N'), '*', 2))))
+        self.assertEqual([], index.find('Чугун'))
+
+    def test_add_remove(self):
+        table = VSPTDTechProcTable(
+            TrpStr(
+                Trp('A', 'N', 1), Trp('P', 'N', 1), Trp('P', 'KWO', 5), Trp('Q', 'DI', 1), Trp('B', 'C', Trp('A', 'N'))
+            )
+        )
+        index = ValueIndex(table)
+        self.assertIn('000100100501', index)
+        self.assertEqual([('000100100501', 'B', 'C')], index.references('A', 'N'))
+
+        index.add('000100100501', TrpStr(Trp('B', 'C', 'Сталь')))
+        self.assertEqual([], index.references('A', 'N'))
+        self.assertEqual([], index.find(5))
+        self.assertEqual([('000100100501', 'B', 'C')], index.find('Сталь'))
+
+        index.remove('000100100501')
+        self.assertEqual([], index.find('Сталь'))
+        self.assertEqual(0, len(index))
+        with self.assertRaises(KeyError):
+            index.remove('000100100501')
+        with self.assertRaises(TypeError):
+            index.add(1, Trp('A', 'B', 'C'))
+
+
+class TestFormulaGraph(unittest.TestCase):
+    """Класс FormulaGraph"""
+    def test_refresh(self):
+        trp_str = TrpStr(
+            Trp('G', 'H', TrpExpr(Trp('E', 'F'), '+', Trp('X', 'Y', special=True))),
+            Trp('E', 'F', TrpExpr(Trp('A', 'B'), '*', Trp('C', 'D'))),
+            Trp('K', 'L', TrpExpr(Trp('A', 'B'), '-', 1)),
+            Trp('A', 'B', 2), Trp('C', 'D', 3),
+        )
+        graph = FormulaGraph(trp_str, special_source=TrpStr(Trp('X', 'Y', 100)))
+        self.assertEqual([('E', 'F'), ('K', 'L'), ('G', 'H')], graph.order)
+        self.assertEqual((6, 106, 1), (graph['E', 'F'], graph['G', 'H'], graph['K', 'L']))
+        self.assertEqual([('G', 'H')], graph.dependents('E', 'F'))
+        self.assertEqual([], graph.refresh())
+
+        # изменение значения триплета
+        trp_str['C', 'D'].value = 4
+        self.assertEqual([('E', 'F'), ('G', 'H')], graph.refresh())
+        self.assertEqual(108, graph['G', 'H'])
+
+        # замена и добавление триплетов
+        trp_str.add(Trp('A', 'B', 1))
+        self.assertEqual([('E', 'F'), ('K', 'L'), ('G', 'H')], graph.refresh())
+        self.assertEqual((104, 0), (graph['G', 'H'], graph['K', 'L']))
+        trp_str.add(Trp('M', 'N', TrpExpr(Trp('K', 'L'), '+', Trp('G', 'H'))))
+        self.assertEqual([('M', 'N')], graph.refresh())
+        self.assertEqual(104, graph['M', 'N'])
+
+        # изменение выражения формулы
+        trp_str['K', 'L'].value.items = (Trp('A', 'B'), '+', 10)
+        self.assertEqual([('K', 'L'), ('M', 'N')], graph.refresh())
+        self.assertEqual(115, graph['M', 'N'])
+
+        # удаление операнда
+        trp_str.rem('C', 'D')
+        self.assertEqual([('E', 'F'), ('G', 'H'), ('M', 'N')], graph.refresh())
+        self.assertIsNone(graph['M', 'N'])
+        self.assertIsInstance(graph.errors['E', 'F'], KeyError)
+        self.assertIsInstance(graph.errors['M', 'N'], TypeError)
+        trp_str.add(Trp('C', 'D', 1))
+        graph.refresh()
+        self.assertEqual({}, graph.errors)
+        self.assertEqual(112, graph['M', 'N'])
+
+        graph.invalidate('A', 'B')
+        self.assertEqual([('E', 'F'), ('K', 'L'), ('G', 'H'), ('M', 'N')], graph.refresh())
+        with self.assertRaises(KeyError):
+            _ = graph['A', 'B']
+
+    def test_cycle(self):
+        trp_str = TrpStr(
+            Trp('A', 'B', TrpExpr(Trp('C', 'D'), '+', 1)), Trp('C', 'D', TrpExpr(Trp('A', 'B'), '+', 1)),
+            Trp('E', 'F', TrpExpr(Trp('E', 'F'), '+', 1)),
+        )
+        with self.assertRaises(ValueError):
+            FormulaGraph(trp_str)
+
+        trp_str = TrpStr(Trp('A', 'B', 1), Trp('C', 'D', TrpExpr(Trp('A', 'B'), '+', 1)))
+        graph = FormulaGraph(trp_str)
+        trp_str.add(Trp('A', 'B', TrpExpr(Trp('C', 'D'), '*', 2)))
+        with self.assertRaises(ValueError):
+            graph.refresh()
+        with self.assertRaises(TypeError):
+            FormulaGraph(Trp('A', 'B', 1))
+
+
+class TestTrpStrColumns(unittest.TestCase):
+    """Класс TrpStrColumns"""
+    def setUp(self):
+        self.trp_strs = (
+            TrpStr(Trp('A', 'N', 1), Trp('P', 'N', 2.5, 'комм'), Trp('Q', 'DI', 'X')),
+            TrpStr(Trp('A', 'N', 2), Trp('P', 'F', Trp('A', 'N')), Trp('Q', 'R', 1 << 70, bid=True)),
+            TrpStr(),
+        )
+
+    def test_roundtrip(self):
+        columns = TrpStrColumns(*self.trp_strs)
+        self.assertEqual(3, len(columns))
+        self.assertEqual(6, columns.trp_count)
+        for expected, actual in zip(self.trp_strs, columns):
+            self.assertTrue(eq_with_order(expected, actual))
+        self.assertEqual('комм', columns[0]['P', 'N'].comment)
+        self.assertTrue(columns[-2]['Q', 'R'].bid)
+        self.assertIs(Trp.target('A', 'N'), columns[1]['P', 'F'].value)
+        self.assertRaises(IndexError, columns.__getitem__, 3)
+        self.assertRaises(TypeError, columns.append, Trp('A', 'N'))
+
+    def test_column(self):
+        columns = TrpStrColumns(*self.trp_strs)
+        self.assertEqual([1, 2, None], columns.column('A', 'N'))
+        self.assertEqual([None, None, None], columns.column('Z', 'Z'))
+        self.assertFalse(columns.is_null(0))
+
+    def test_table(self):
+        trp_str = TrpStr(Trp('A', 'N', 1), Trp('P', 'N', 3), Trp('P', 'KWO', '000'), Trp('Q', 'DI', '00'))
+        table = VSPTDTechProcTable(trp_str)
+        columns = TrpStrColumns.from_table(table)
+        self.assertEqual('000100300000', columns.record_key(0))
+        self.assertEqual(str(table), str(columns.to_table()))
+
+        # ключи, не совпадающие с вычисляемыми, сохраняются
+        table = VSPTDTechProcTable.from_records([
+            ('k1', 'A', 'N', 1, None, False, False), ('k2', 'B', 'C', 'D', 'E', True, False),
+        ])
+        self.assertEqual(table.to_records(), TrpStrColumns.from_table(table).to_table().to_records())
+        self.assertEqual(['000100300000'], [key for key, _ in TrpStrColumns(trp_str).to_table()])
@@ -1,7 +1,11 @@
 # -*- coding: utf-8 -*-
+import io
+import os
+import pathlib
+import tempfile
 import unittest
 
-from vsptd.vsptd import Trp, TrpStr
+from vsptd.vsptd import Trp, TrpStr, TrpExpr
 from vsptd.parse import *
 
 
@@ -51,4 +55,179 @@ class TestParseTrpStr(unittest.TestCase):
         self.assertEqual(parse_trp_str("$P.N=.25;"), TrpStr(Trp('P', 'N', 0.25)))
         self.assertEqual(parse_trp_str("$P.N=10E-5;"), TrpStr(Trp('P', 'N', 10E-5)))
         self.assertEqual(parse_trp_str("$P.N=$A.B;"), TrpStr(Trp('P', 'N', Trp('A', 'B'))))  # триплет-ссылка
+        self.assertIs(Trp.target('A', 'B'), parse_trp_str("$P.N=$A.B;")['P', 'N'].value)
+        self.assertEqual(parse_trp_str("$P.N=-5;"), TrpStr(Trp('P', 'N', -5)))
+        self.assertEqual("$P.N=$A.B*2;", str(parse_trp_str("$P.N=$A.B*2;")))  # триплетное выражение
 
+    def test_without_validation(self):
+        """Разбор без валидации"""
+        text = "$A.B='C';$P.N='V'\"C\"; $P.=:;$D.E=$F.G;"
+        self.assertEqual(parse_trp_str(text), parse_trp_str(text, validate=False))
+        self.assertEqual(TrpStr.from_records([('a', 'b', 1)]), parse_trp_str('$a.b=1;', validate=False))
+        with self.assertRaises(ValueError):
+            parse_trp_str('$a.b=1;')
+        trp_str = parse_trp_str('$A.B=$c.d;', validate=False)  # общий триплет-цель $c.d существует
+        self.assertEqual(('c', 'd'), (trp_str['A', 'B'].value.prefix, trp_str['A', 'B'].value.name))
+        with self.assertRaises(ValueError):
+            parse_trp_str('$A.B=$c.d;')
+
+    def test_comment(self):
+        """Комментарии, содержащие разделители"""
+        self.assertEqual(parse_trp_str("$P.N='V'\"A;B\";$A.B=1;"), TrpStr(Trp('P', 'N', 'V', 'A;B'), Trp('A', 'B', 1)))
+        self.assertEqual(parse_trp_str("$P.N='V\"';"), TrpStr(Trp('P', 'N', 'V"')))
+        self.assertEqual(parse_trp_str("$P.N=\"C\";"), TrpStr(Trp('P', 'N', None, 'C')))
+
+    def test_long_values(self):
+        """Разбор строк с длинными и незавершёнными триплетами выполняется за линейное время"""
+        self.assertEqual(TrpStr(), parse_trp_str('$A.B=' * 100000))
+        self.assertEqual(TrpStr(Trp('A', 'B', 1)), parse_trp_str('$' * 100000 + 'A.B=1;'))
+        self.assertEqual(TrpStr(Trp('A', 'B', 'x' * 200)), parse_trp_str("junk $A.B='" + 'x' * 200 + "';" + '"' * 100000))
+
+
+class TestParseTrpExpr(unittest.TestCase):
+    """Разбор триплетных выражений"""
+    def test_parse(self):
+        expr = parse_trp_expr('($A.B + 1.5) * -2 ** K.N')
+        self.assertEqual(6, len(expr.items))
+        self.assertEqual(('+', 1.5), expr.items[0].items[1:])
+        self.assertIs(Trp.target('A', 'B'), expr.items[0].items[0])
+        self.assertIs(Trp.target('K', 'N', special=True), expr.items[-1])
+        self.assertEqual(-10, expr.calculate(TrpStr(Trp('A', 'B', 1)), TrpStr(Trp('K', 'N', 2))))
+        self.assertEqual('($A.B+1.5)*-2**K.N', str(expr))
+
+        # вложенные скобки и повторный разбор текстового представления
+        expr = parse_trp_expr('$A.B//(2*($C.D-1))')
+        self.assertEqual(4, expr.calculate(TrpStr(Trp('A', 'B', 9), Trp('C', 'D', 2))))
+        self.assertIs(expr, parse_trp_expr(str(expr)))  # кэширование по тексту
+        self.assertIs(expr, parse_trp_expr(expr))
+
+        # общее выражение неизменяемо
+        with self.assertRaises(AttributeError):
+            expr.items = (1,)
+
+        for text in ('', '$A.B+', '($A.B', '$A.B)', '()', '$A.', 'A', '1 @ 2', '$a.b', "'A'"):
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                parse_trp_expr(text)
+        with self.assertRaises(TypeError):
+            parse_trp_expr(1)
+
+    def test_trp_str(self):
+        """Триплетные выражения в значениях триплетов"""
+        text = '$E.F=$A.B*$C.D; $G.H=($E.F+1)/P.N;'
+        trp_str = parse_trp_str(text)
+        self.assertEqual(text, str(trp_str))
+        self.assertIsInstance(trp_str['G', 'H'].value, TrpExpr)
+        self.assertIs(trp_str['E', 'F'].value, parse_trp_str(text)['E', 'F'].value)
+        self.assertEqual(text, str(next(parse_many([text], workers=1))))
+
+    def test_without_validation(self):
+        """Разбор выражений без валидации триплетов-операндов"""
+        text = '$X.Y=$a.b*2;'
+        with self.assertRaises(ValueError):
+            parse_trp_str(text)
+        expr = parse_trp_str(text, validate=False)['X', 'Y'].value
+        self.assertEqual('a', expr.items[0].prefix)
+        self.assertEqual(text, str(next(parse_many([text], workers=1, validate=False))))
+        with self.assertRaises(ValueError):
+            parse_trp_expr('$a.b*2')
+        self.assertIs(expr, parse_trp_expr('$a.b*2', validate=False))
+
+
+class TestIterTrpStrs(unittest.TestCase):
+    """Потоковый разбор триплетных строк"""
+    def test_iter(self):
+        text = "$A.B='C';\n$D.E=1; $F.G=2;\n\n$H.I=:;\n"
+        expected = [TrpStr(Trp('A', 'B', 'C')), TrpStr(Trp('D', 'E', 1), Trp('F', 'G', 2)), TrpStr(Trp('H', 'I', bid=True))]
+        # записи, разорванные границей куска
+        for chunk_size in (1, 3, 7, 1024):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(expected, list(iter_trp_strs(io.StringIO(text), chunk_size=chunk_size)))
+        # двоичный поток и разделитель из нескольких символов
+        data = "$A.B='Ж';||$C.D='Ё';".encode('utf-8')
+        self.assertEqual([TrpStr(Trp('A', 'B', 'Ж')), TrpStr(Trp('C', 'D', 'Ё'))],
+                         list(iter_trp_strs(io.BytesIO(data), record_sep='||', chunk_size=3)))
+
+    def test_dump(self):
+        """Запись триплетных строк в поток"""
+        trp_strs = [TrpStr(Trp('A', 'B', 'Ж')), TrpStr(Trp('D', 'E', 1), Trp('F', 'G', 2.5, 'К')), TrpStr()] * 3
+        for stream in (io.StringIO(), io.BytesIO()):
+            with self.subTest(stream=stream):
+                self.assertEqual(9, dump_trp_strs(trp_strs, stream, record_sep='||', chunk_size=10))
+                stream.seek(0)
+                self.assertEqual([trp_str for trp_str in trp_strs if trp_str],
+                                 list(iter_trp_strs(stream, record_sep='||')))
+        with self.assertRaises(TypeError):
+            dump_trp_strs([Trp('A', 'B')], io.StringIO())
+
+
+class TestMappedTrpStrFile(unittest.TestCase):
+    """Класс MappedTrpStrFile"""
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        with os.fdopen(fd, 'wb') as file:
+            file.write("$A.B='Ж';\n\n$C.D=1; $E.F=2;\r\n  \n$G.H=:;".encode('utf-8'))
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_access(self):
+        expected = [TrpStr(Trp('A', 'B', 'Ж')), TrpStr(Trp('C', 'D', 1), Trp('E', 'F', 2)), TrpStr(Trp('G', 'H', bid=True))]
+        with MappedTrpStrFile(self.path) as trp_strs:
+            self.assertEqual(expected[1], trp_strs[1])  # просмотрена лишь часть файла
+            self.assertEqual(expected, list(trp_strs))
+            self.assertEqual(3, len(trp_strs))
+            self.assertEqual(expected[2], trp_strs[-1])
+            self.assertEqual(expected[:2], trp_strs[:2])
+            with self.assertRaises(IndexError):
+                _ = trp_strs[3]
+
+    def test_empty(self):
+        open(self.path, 'wb').close()
+        with MappedTrpStrFile(self.path) as trp_strs:
+            self.assertEqual([], list(trp_strs))
+            self.assertEqual(0, len(trp_strs))
+
+    def test_unicode_whitespace(self):
+        """Записи из пробельных символов Unicode пропускаются так же, как в iter_trp_strs"""
+        text = "$A.B=1;\n\u00a0\n\u3000 \n\x1c\n$C.D=2;"
+        with open(self.path, 'wb') as file:
+            file.write(text.encode('utf-8'))
+        expected = list(iter_trp_strs(io.StringIO(text)))
+        self.assertEqual([TrpStr(Trp('A', 'B', 1)), TrpStr(Trp('C', 'D', 2))], expected)
+        with MappedTrpStrFile(self.path) as trp_strs:
+            self.assertEqual(expected, list(trp_strs))
+        self.assertEqual(expected, list(parse_many(pathlib.Path(self.path), workers=1)))
+
+
+class TestParseMany(unittest.TestCase):
+    """Функция parse_many"""
+    texts = ["$A.B='C';", "$D.E=1; $F.G=$A.B;", '', "$H.I=:'J'\"K\";"] * 50
+
+    def test_strings(self):
+        expected = [parse_trp_str(text) for text in self.texts]
+        self.assertEqual(expected, list(parse_many(self.texts, workers=1, chunksize=7)))
+        self.assertEqual(expected, list(parse_many(iter(self.texts), workers=2, chunksize=7)))
+        self.assertEqual(expected, list(parse_many(self.texts, workers=1, validate=False)))
+
+        # ошибки параметров возникают при вызове, а не при получении первой строки
+        for params in ({'workers': 0}, {'workers': -1}, {'chunksize': 0}):
+            with self.subTest(**params), self.assertRaises(ValueError):
+                parse_many(self.texts, **params)
+
+        # строка не принимается как путь; строки для разбора проверяются до передачи процессам
+        with self.assertRaises(TypeError):
+            parse_many('strings.txt')
+        for workers in (1, 2):
+            with self.subTest(workers=workers), self.assertRaises(TypeError):
+                list(parse_many(["$A.B='C';", b"$A.B='C';"], workers=workers))
+
+    def test_file(self):
+        fd, path = tempfile.mkstemp()
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                file.write('\n'.join(self.texts))
+            expected = [parse_trp_str(text) for text in self.texts if text]
+            self.assertEqual(expected, list(parse_many(pathlib.Path(path), workers=1)))
+            self.assertEqual(expected, list(parse_many(pathlib.Path(path), workers=2)))
+        finally:
+            os.remove(path)
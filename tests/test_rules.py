@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from vsptd.vsptd import Trp, TrpStr
+from vsptd.rules import Rule, parse_rules, RuleEngine
+
+
+class TestRule(unittest.TestCase):
+    def test_parse(self):
+        """Разбор правил"""
+        rule = Rule("ЕСЛИ нет(A.N) и $B.C='x И y, z' И $B.D!=$A.N ТО НАЙТИ_В_БД($A.N=1, $B.C), ДОБАВИТЬ_В_БД(B);")
+        self.assertEqual(
+            (('нет', 'A', 'N', None), ('=', 'B', 'C', 'x И y, z'), ('!=', 'B', 'D', Trp('A', 'N'))),
+            rule.conditions
+        )
+        self.assertEqual((('НАЙТИ_В_БД', '$A.N=1, $B.C'), ('ДОБАВИТЬ_В_БД', 'B')), rule.actions)
+
+        rules = parse_rules("""
+            ЕСЛИ есть($A.N) ТО X(1);
+            ЕСЛИ $A.N<2.5 И $A.N>=1 ТО Y();
+        """)
+        self.assertEqual(2, len(rules))
+        self.assertEqual((('<', 'A', 'N', 2.5), ('>=', 'A', 'N', 1)), rules[1].conditions)
+        self.assertEqual([], parse_rules('  '))
+
+        for text in ('ЕСЛИ есть($A.N) ТО X(1)', 'ЕСЛИ есть($A.N) ТО X;', 'ЕСЛИ есть($A) ТО X(1);',
+                     'ЕСЛИ $A.N~1 ТО X(1);', 'ЕСЛИ $A.N=1 И ТО X(1);', 'ЕСЛИ $a.N=1 ТО X(1);',
+                     'ЕСЛИ $A.N=$B.C*2 ТО X(1);'):
+            with self.assertRaises(ValueError):
+                Rule(text)
+        with self.assertRaises(ValueError):
+            parse_rules('X ЕСЛИ есть($A.N) ТО X(1);')
+        with self.assertRaises(TypeError):
+            Rule(1)
+
+
+class TestRuleEngine(unittest.TestCase):
+    def test_activation(self):
+        """Активация, отмена активации и повторная активация правил"""
+        present, absent, compare = rules = [
+            Rule('ЕСЛИ есть($A.N) ТО X(1);'),
+            Rule('ЕСЛИ нет($A.N) ТО Y(2);'),
+            Rule('ЕСЛИ есть($A.N) И $B.C>=5 ТО Z(3), W(4);'),
+        ]
+        engine = RuleEngine(rules)
+        self.assertEqual([(absent, 'Y', '2')], engine.flush())
+        self.assertEqual([], engine.flush())
+
+        engine.add(TrpStr(Trp('A', 'N', 1), Trp('B', 'C', 7)))
+        self.assertEqual([(present, 'X', '1'), (compare, 'Z', '3'), (compare, 'W', '4')], engine.flush())
+
+        # правило, переставшее выполняться до вызова flush, не возвращается
+        engine.add(Trp('B', 'C', 1))
+        engine.add(Trp('B', 'C', 'строка'))
+        engine.add(Trp('B', 'C', 6))
+        engine.remove('A', 'N')
+        self.assertEqual(1, engine.pending())
+        self.assertEqual([(absent, 'Y', '2')], engine.flush())
+
+        # повторная активация
+        engine.add(Trp('A', 'N', 1))
+        self.assertEqual(
+            [(present, 'X'), (compare, 'Z'), (compare, 'W')], [(rule, name) for rule, name, _ in engine.flush()]
+        )
+        self.assertEqual(TrpStr(Trp('B', 'C', 6), Trp('A', 'N', 1)), engine.memory)
+
+        with self.assertRaises(KeyError):
+            engine.remove('X', 'Y')
+        with self.assertRaises(TypeError):
+            engine.add('$A.N=1;')
+
+    def test_rules(self):
+        """Добавление и удаление правил; общие узлы условий"""
+        engine = RuleEngine()
+        engine.add(Trp('A', 'N', 1))
+        first = engine.add_rule('ЕСЛИ есть($A.N) ТО X(1);')
+        second = engine.add_rule('ЕСЛИ есть($A.N) И нет($B.C) ТО X(2);')
+        self.assertEqual(2, len(engine._conditions))
+        self.assertEqual([first, second], [rule for rule, *_ in engine.flush()])
+
+        engine.remove_rule(first)
+        self.assertEqual([second], engine.rules)
+        self.assertEqual(2, len(engine._conditions))
+        engine.remove_rule(second)
+        self.assertEqual({}, engine._conditions)
+        self.assertEqual({}, engine._by_key)
+        with self.assertRaises(KeyError):
+            engine.remove_rule(second)
+        with self.assertRaises(TypeError):
+            engine.add_rule(1)
+
+    def test_references(self):
+        """Сравнение с текущим значением триплета, на который указывает ссылка"""
+        rule = Rule('ЕСЛИ $B.D>$A.N ТО X(1);')
+        engine = RuleEngine([rule, 'ЕСЛИ $B.D>$A.N И есть($A.N) ТО Y(2);'])
+        self.assertEqual(2, len(engine._conditions))  # узел сравнения общий для обоих правил
+        self.assertEqual([], engine.flush())
+
+        engine.add(TrpStr(Trp('A', 'N', 1), Trp('B', 'D', 2)))
+        self.assertEqual(['X', 'Y'], [name for _, name, _ in engine.flush()])
+        # изменение триплета, на который указывает ссылка, перепроверяет условие
+        engine.add(Trp('A', 'N', 5))
+        self.assertEqual(0, engine.pending())
+        engine.add(Trp('B', 'D', 6))
+        self.assertEqual(2, engine.pending())
+        engine.remove('A', 'N')
+        self.assertEqual(0, engine.pending())
+
+        engine.remove_rule(rule)
+        self.assertEqual(2, len(engine._conditions))
+        self.assertEqual(2, len(engine._by_key))
+        self.assertEqual(TrpStr(Trp('B', 'D', 6)), engine.memory)
+        engine.remove_rule(engine.rules[0])
+        self.assertEqual({}, engine._by_key)
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+import unittest
+
+from vsptd.vsptd import Trp, TrpStr, TrpExpr
+from vsptd.extra import VSPTDTechProcTable
+from vsptd.storage import SQLiteTechProcTable
+
+
+def _trp_str(a_n, kwo, *trps):
+    return TrpStr(Trp('A', 'N', a_n), Trp('P', 'N', 1), Trp('P', 'KWO', kwo), Trp('Q', 'DI', 1), *trps)
+
+
+class TestSQLiteTechProcTable(unittest.TestCase):
+    def test_interface(self):
+        """Интерфейс таблицы в памяти"""
+        trp_strs = (
+            _trp_str(1, 5, Trp('M', 'MAT', 'Сталь', 'комм'), Trp('M', 'R', Trp('A', 'N'))),
+            _trp_str(2, 7, Trp('M', 'MAT', 2 ** 70), Trp('M', 'E', TrpExpr(Trp('A', 'N'), '*', 2.5))),
+        )
+        with SQLiteTechProcTable(*trp_strs) as table:
+            memory = VSPTDTechProcTable(*trp_strs)
+            self.assertEqual(2, len(table))
+            self.assertEqual(str(memory), str(table))
+            self.assertEqual(memory.to_records()[:8], table.to_records()[:8])
+            self.assertEqual(trp_strs[0], table['000100100501'])
+            self.assertIs(Trp.target('A', 'N'), table['000100100501']['M', 'R'].value)
+            self.assertIn('000200100701', table)
+
+            # замена строки сохраняет её позицию
+            table.add(_trp_str(1, 5, Trp('M', 'MAT', 'Чугун')))
+            self.assertEqual(['000100100501', '000200100701'], [key for key, _ in table])
+            self.assertEqual(_trp_str(1, 5, Trp('M', 'MAT', 'Чугун')), table['000100100501'])
+
+            del table['000100100501']
+            self.assertEqual(1, len(table))
+            with self.assertRaises(KeyError):
+                _ = table['000100100501']
+            with self.assertRaises(KeyError):
+                del table['000100100501']
+            with self.assertRaises(TypeError):
+                table.add(Trp('A', 'N', 1))
+
+    def test_lookup(self):
+        """Поиск по значению триплета"""
+        with SQLiteTechProcTable(_trp_str(1, 5), _trp_str(2, 7), _trp_str(3, 5.0)) as table:
+            self.assertEqual(['000100100501', table.calc_primary_key(_trp_str(3, 5.0))], table.lookup_keys('P', 'KWO', 5))
+            self.assertEqual([_trp_str(2, 7)], table.lookup('P', 'KWO', 7))
+            self.assertEqual([], table.lookup('P', 'KWO', '7'))
+            self.assertEqual([], table.lookup('P', 'NONE', 7))
+
+        # большие целые числа и равные им float находятся так же, как в VSPTDTechProcTable
+        trp_strs = (_trp_str(1, 2 ** 70), _trp_str(2, float(2 ** 71)), _trp_str(3, 2 ** 70 + 1))
+        memory = VSPTDTechProcTable(*trp_strs)
+        memory.create_index('P', 'KWO')
+        with SQLiteTechProcTable(*trp_strs) as table:
+            self.assertEqual(1, len(table.lookup_keys('P', 'KWO', float(2 ** 70))))
+            for value in (2 ** 70, float(2 ** 70), 2 ** 71, float(2 ** 71), 2 ** 70 + 1, 10 ** 400, 0.5):
+                with self.subTest(value=value):
+                    self.assertEqual(memory.lookup_keys('P', 'KWO', value), table.lookup_keys('P', 'KWO', value))
+
+    def test_persistence(self):
+        """Хранение в файле и пакетная загрузка"""
+        handle, path = tempfile.mkstemp(suffix='.sqlite')
+        os.close(handle)
+        try:
+            memory = VSPTDTechProcTable(_trp_str(1, 5), _trp_str(2, 7))
+            SQLiteTechProcTable.from_records(memory.to_records(), database=path).close()
+            with SQLiteTechProcTable(database=path) as table:
+                self.assertEqual(str(memory), str(table))
+                self.assertEqual(memory.to_records(), table.to_records())
+        finally:
+            os.remove(path)
@@ -0,0 +1,388 @@
+# -*- coding: utf-8 -*-
+"""
+Двоичный формат обмена ВСПТД-объектами.
+
+Формат сообщения (порядок байтов — little-endian):
+
+* заголовок: сигнатура ``VSPT``, версия формата (1 байт), вид сообщения (1 байт):
+  ``T`` — триплет, ``S`` — триплетная строка, ``E`` — триплетное выражение, ``B`` — пакет триплетных строк;
+* таблица строк для префиксов и имён: количество строк, длины строк в байтах, строки в UTF-8;
+* тело: триплет, выражение, запись или количество записей и записи.
+
+В пакете (начиная с версии 2) каждой записи предшествует индекс первичного ключа таблицы в таблице строк
+или ``0xFFFFFFFF``, если ключ не задан. Пакеты версии 1 (без ключей) по-прежнему декодируются.
+
+Запись (триплетная строка) — длина записи в байтах, количество триплетов и триплеты. Триплет — индексы префикса
+и имени в таблице строк, тег типа значения, флаги (заявка, "особенность", наличие комментария), значение
+и комментарий. Значения-триплеты и триплеты в выражениях хранятся как вложенные триплеты.
+
+Декодирование выполняется непосредственно из ``bytes``, ``bytearray`` или ``memoryview`` без копирования данных.
+"""
+
+from struct import Struct, error as StructError
+from sys import intern
+
+from vsptd.vsptd import Trp, TrpStr, TrpExpr
+from vsptd.extra import VSPTDTechProcTable
+from vsptd.support import type_name
+
+__all__ = ('FORMAT_VERSION', 'dumps', 'loads', 'dumps_table', 'loads_table')
+
+FORMAT_VERSION = 2  #: Версия двоичного формата
+_SUPPORTED_VERSIONS = (1, 2)  # версии, которые поддерживает декодировщик
+
+_MAGIC = b'VSPT'
+_KIND_TRP, _KIND_TRP_STR, _KIND_TRP_EXPR, _KIND_BATCH = b'TSEB'
+
+# теги типов значений
+_NONE, _STR, _INT, _BIGINT, _FLOAT, _TRP, _EXPR = range(7)
+# флаги триплета
+_BID, _SPECIAL, _COMMENT = 1, 2, 4
+
+_NO_NAME = 0xFFFFFFFF  # индекс отсутствующего имени или первичного ключа
+
+_HEADER = Struct('<4sBB')
+_U8 = Struct('<B')
+_U32 = Struct('<I')
+_I64 = Struct('<q')
+_F64 = Struct('<d')
+_TRP_HEAD = Struct('<IIBB')  # префикс, имя, тег значения, флаги
+_RECORD_HEAD = Struct('<II')  # длина записи в байтах (без заголовка), количество триплетов
+
+
+def dumps(obj) -> bytes:
+    """
+    Кодирует триплет, триплетную строку или триплетное выражение в двоичный формат
+
+    :param obj: ВСПТД-объект
+    :type obj: Trp, TrpStr, TrpExpr
+    :rtype: bytes
+
+    :raises TypeError: если объект или значение триплета имеет неподдерживаемый тип
+
+    :Пример работы:
+        >>> data = dumps(TrpStr(Trp('A', 'B', 1), Trp('C', 'D', 'E', 'F')))
+        >>> print(loads(data))
+        $A.B=1; $C.D='E'"F";
+        >>> print(loads(memoryview(dumps(TrpExpr(Trp('A', 'B'), '*', 2)))))
+        $A.B*2
+    """
+    encoder = _Encoder()
+    if isinstance(obj, TrpStr):
+        kind = _KIND_TRP_STR
+        encoder.record(obj)
+    elif isinstance(obj, Trp):
+        kind = _KIND_TRP
+        encoder.trp(obj)
+    elif isinstance(obj, TrpExpr):
+        kind = _KIND_TRP_EXPR
+        encoder.expr(obj)
+    else:
+        raise TypeError('Должен быть Trp, TrpStr или TrpExpr, не ' + type_name(obj), obj)
+    return encoder.message(kind)
+
+
+def loads(data):
+    """
+    Декодирует ВСПТД-объект, закодированный функцией :func:`dumps`
+
+    :param data: данные
+    :type data: bytes, bytearray, memoryview
+    :rtype: Trp, TrpStr, TrpExpr
+
+    :raises ValueError: если данные повреждены, обрезаны или имеют другую версию формата
+    """
+    decoder, kind = _Decoder.open(data)
+    try:
+        if kind == _KIND_TRP_STR:
+            result = decoder.record()
+        elif kind == _KIND_TRP:
+            result = decoder.trp()
+        elif kind == _KIND_TRP_EXPR:
+            result = decoder.expr()
+        else:
+            raise ValueError('Неверный вид сообщения', kind)
+    except (StructError, IndexError, UnicodeDecodeError) as e:
+        raise ValueError('Данные повреждены или обрезаны', e)
+    decoder.finish()
+    return result
+
+
+def dumps_table(table) -> bytes:
+    """
+    Кодирует записи таблицы (или любой последовательности триплетных строк) одним пакетом
+    с общей таблицей строк
+
+    Первичные ключи таблицы сохраняются в пакете как есть и не вычисляются заново при декодировании.
+
+    :param table: таблица или триплетные строки
+    :type table: VSPTDTechProcTable, Iterable[TrpStr]
+    :rtype: bytes
+
+    :raises TypeError: если запись не :class:`TrpStr` или первичный ключ таблицы не str
+    """
+    rows = iter(table) if isinstance(table, VSPTDTechProcTable) else ((None, trp_str) for trp_str in table)
+    encoder = _Encoder()
+    out = encoder.out
+    count_pos = len(out)
+    out += _U32.pack(0)
+    count = 0
+    for key, trp_str in rows:
+        if not isinstance(trp_str, TrpStr):
+            raise TypeError('Должен быть TrpStr, не ' + type_name(trp_str), trp_str)
+        if key is None:
+            out += _U32.pack(_NO_NAME)
+        elif isinstance(key, str):
+            out += _U32.pack(encoder.string_index(key))
+        else:
+            raise TypeError('Первичный ключ должен быть str, не ' + type_name(key), key)
+        encoder.record(trp_str)
+        count += 1
+    _U32.pack_into(encoder.out, count_pos, count)
+    return encoder.message(_KIND_BATCH)
+
+
+def loads_table(data, table_cls=None):
+    """
+    Декодирует пакет, закодированный функцией :func:`dumps_table`, в таблицу
+
+    Сохранённые первичные ключи восстанавливаются как есть; для записей без ключа (пакет из последовательности
+    триплетных строк или пакет версии 1) ключ вычисляется методом :meth:`VSPTDTechProcTable.add`.
+
+    :param data: данные
+    :type data: bytes, bytearray, memoryview
+    :param table_cls: класс таблицы; по умолчанию :class:`VSPTDTechProcTable`. Если передан ``list``,
+        возвращается список триплетных строк
+    :rtype: VSPTDTechProcTable
+
+    :raises ValueError: если данные повреждены, обрезаны или имеют другую версию формата
+    """
+    decoder, kind = _Decoder.open(data)
+    if kind != _KIND_BATCH:
+        raise ValueError('Неверный вид сообщения', kind)
+    try:
+        count, = _U32.unpack_from(decoder.buf, decoder.pos)
+        decoder.pos += 4
+        rows = [(decoder.key(), decoder.record()) for _ in range(count)]
+    except (StructError, IndexError, UnicodeDecodeError) as e:
+        raise ValueError('Данные повреждены или обрезаны', e)
+    decoder.finish()
+
+    if table_cls is list:
+        return [trp_str for _, trp_str in rows]
+    table = (table_cls or VSPTDTechProcTable)()
+    for key, trp_str in rows:
+        if key is None:
+            table.add(trp_str)
+        else:
+            table._items[key] = trp_str
+    return table
+
+
+class _Encoder:
+    """Кодировщик сообщения: собирает тело и таблицу строк"""
+    __slots__ = ('out', 'strings')
+
+    def __init__(self):
+        self.out = bytearray()
+        self.strings = {}  # строка — индекс в таблице строк
+
+    def message(self, kind) -> bytes:
+        """Возвращает сообщение: заголовок, таблицу строк и тело"""
+        encoded = [string.encode('utf-8') for string in self.strings]
+        head = bytearray(_HEADER.pack(_MAGIC, FORMAT_VERSION, kind))
+        head += _U32.pack(len(encoded))
+        head += Struct('<{}I'.format(len(encoded))).pack(*map(len, encoded))
+        head += b''.join(encoded)
+        return bytes(head + self.out)
+
+    def string_index(self, string) -> int:
+        index = self.strings.get(string)
+        if index is None:
+            index = self.strings[string] = len(self.strings)
+        return index
+
+    def record(self, trp_str) -> None:
+        out = self.out
+        start = len(out)
+        out += _RECORD_HEAD.pack(0, len(trp_str))
+        for trp in trp_str:
+            self.trp(trp)
+        _RECORD_HEAD.pack_into(out, start, len(out) - start - _RECORD_HEAD.size, len(trp_str))
+
+    def trp(self, trp) -> None:
+        out = self.out
+        name = _NO_NAME if trp.name is None else self.string_index(trp.name)
+        flags = (_BID if trp.bid else 0) | (_SPECIAL if trp.special else 0) | \
+                (_COMMENT if trp.comment is not None else 0)
+        value = trp.value
+        if value is None:
+            out += _TRP_HEAD.pack(self.string_index(trp.prefix), name, _NONE, flags)
+        else:
+            head = len(out)
+            out += _TRP_HEAD.pack(self.string_index(trp.prefix), name, 0, flags)
+            out[head + 8] = self.value(value)
+        if trp.comment is not None:
+            self.text(trp.comment)
+
+    def value(self, value) -> int:
+        """Записывает значение и возвращает его тег"""
+        out = self.out
+        if isinstance(value, str):
+            self.text(value)
+            return _STR
+        elif isinstance(value, bool):
+            raise TypeError('Значение должно быть str, int, float, Trp, TrpExpr, не ' + type_name(value), value)
+        elif isinstance(value, int):
+            if -(1 << 63) <= value < (1 << 63):
+                out += _I64.pack(value)
+                return _INT
+            data = value.to_bytes((value.bit_length() + 8) // 8, 'little', signed=True)
+            out += _U32.pack(len(data))
+            out += data
+            return _BIGINT
+        elif isinstance(value, float):
+            out += _F64.pack(value)
+            return _FLOAT
+        elif isinstance(value, Trp):
+            self.trp(value)
+            return _TRP
+        elif isinstance(value, TrpExpr):
+            self.expr(value)
+            return _EXPR
+        raise TypeError('Значение должно быть str, int, float, Trp, TrpExpr, не ' + type_name(value), value)
+
+    def expr(self, expr) -> None:
+        out = self.out
+        out += _U32.pack(len(expr.items))
+        for item in expr.items:
+            tag_pos = len(out)
+            out.append(0)
+            out[tag_pos] = self.value(item)
+
+    def text(self, value) -> None:
+        data = value.encode('utf-8')
+        self.out += _U32.pack(len(data))
+        self.out += data
+
+
+class _Decoder:
+    """Декодировщик сообщения: читает данные по смещению без копирования"""
+    __slots__ = ('buf', 'pos', 'strings', 'version')
+
+    def __init__(self, buf, pos, strings, version=FORMAT_VERSION):
+        self.buf = buf
+        self.pos = pos
+        self.strings = strings
+        self.version = version
+
+    @classmethod
+    def open(cls, data):
+        """Проверяет заголовок, читает таблицу строк; возвращает декодировщик и вид сообщения"""
+        buf = memoryview(data)
+        if buf.format != 'B':
+            buf = buf.cast('B')
+        try:
+            magic, version, kind = _HEADER.unpack_from(buf, 0)
+            if magic != _MAGIC:
+                raise ValueError('Данные не являются сообщением в двоичном формате ВСПТД', bytes(magic))
+            if version not in _SUPPORTED_VERSIONS:
+                raise ValueError('Неподдерживаемая версия формата', version)
+            pos = _HEADER.size
+            count, = _U32.unpack_from(buf, pos)
+            pos += 4
+            lengths = Struct('<{}I'.format(count)).unpack_from(buf, pos)
+            pos += 4 * count
+            strings = []
+            for length in lengths:
+                end = pos + length
+                if end > len(buf):
+                    raise ValueError('Данные повреждены или обрезаны', end)
+                strings.append(intern(str(buf[pos:end], 'utf-8')))
+                pos = end
+        except (StructError, UnicodeDecodeError) as e:
+            raise ValueError('Данные повреждены или обрезаны', e)
+        return cls(buf, pos, strings, version), kind
+
+    def finish(self) -> None:
+        if self.pos != len(self.buf):
+            raise ValueError('После сообщения остались лишние данные', len(self.buf) - self.pos)
+
+    def key(self):
+        """Первичный ключ записи пакета; ``None``, если ключ не задан или пакет версии 1"""
+        if self.version < 2:
+            return None
+        index, = _U32.unpack_from(self.buf, self.pos)
+        self.pos += 4
+        return None if index == _NO_NAME else self.strings[index]
+
+    def record(self):
+        size, count = _RECORD_HEAD.unpack_from(self.buf, self.pos)
+        self.pos += _RECORD_HEAD.size
+        end = self.pos + size
+        trp_str = TrpStr.from_records(self.trp_record() for _ in range(count))
+        if self.pos != end:
+            raise ValueError('Длина записи не соответствует содержимому', size)
+        return trp_str
+
+    def trp(self):
+        return Trp.from_trusted(*self.trp_record())
+
+    def expr(self):
+        return self.value(_EXPR)
+
+    def trp_record(self) -> tuple:
+        """Читает триплет и возвращает его параметры в порядке аргументов :meth:`Trp.from_trusted`"""
+        buf = self.buf
+        strings = self.strings
+        prefix, name, tag, flags = _TRP_HEAD.unpack_from(buf, self.pos)
+        self.pos += _TRP_HEAD.size
+        value = None if tag == _NONE else self.value(tag)
+        comment = self.text() if flags & _COMMENT else None
+        return (
+            strings[prefix], None if name == _NO_NAME else strings[name], value, comment,
+            bool(flags & _BID), bool(flags & _SPECIAL)
+        )
+
+    def value(self, tag):
+        buf = self.buf
+        pos = self.pos
+        if tag == _STR:
+            return self.text()
+        elif tag == _INT:
+            self.pos = pos + 8
+            return _I64.unpack_from(buf, pos)[0]
+        elif tag == _FLOAT:
+            self.pos = pos + 8
+            return _F64.unpack_from(buf, pos)[0]
+        elif tag == _TRP:
+            prefix, name, value, comment, bid, special = self.trp_record()
+            if value is None and comment is None and not bid:
+                # как и при разборе текста, триплеты-ссылки — общие триплеты-цели
+                return Trp._target_trusted(prefix, name, special)
+            return Trp.from_trusted(prefix, name, value, comment, bid, special)
+        elif tag == _EXPR:
+            count, = _U32.unpack_from(buf, pos)
+            self.pos = pos + 4
+            items = []
+            for _ in range(count):
+                tag, = _U8.unpack_from(buf, self.pos)
+                self.pos += 1
+                items.append(self.value(tag))
+            return TrpExpr(*items)
+        elif tag == _BIGINT:
+            size, = _U32.unpack_from(buf, pos)
+            self.pos = pos + 4 + size
+            if self.pos > len(buf):
+                raise IndexError(self.pos)
+            return int.from_bytes(buf[pos + 4:self.pos], 'little', signed=True)
+        raise ValueError('Неизвестный тег значения', tag)
+
+    def text(self) -> str:
+        buf = self.buf
+        size, = _U32.unpack_from(buf, self.pos)
+        start = self.pos + 4
+        self.pos = start + size
+        if self.pos > len(buf):
+            raise IndexError(self.pos)
+        return str(buf[start:self.pos], 'utf-8')
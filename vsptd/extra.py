@@ -1,12 +1,16 @@
 # -*- coding: utf-8 -*-
 """Дополнительные функции и ВСПТД-объекты."""
 
+from array import array
 from collections import OrderedDict
+from itertools import compress
+from operator import is_not
 
-from vsptd.vsptd import Trp, TrpStr
+from vsptd.vsptd import Trp, TrpStr, TrpExpr, _trp_record, _trp_value, _versions
 from vsptd.support import type_name
 
-__all__ = ('satisfy_bid', 'eq_with_order', 'VSPTDTechProcTable',)
+__all__ = ('satisfy_bid', 'BidPlan', 'eq_with_order', 'VSPTDTechProcTable', 'ValueIndex', 'FormulaGraph',
+           'TrpStrColumns',)
 
 
 def satisfy_bid(bid, source):
@@ -48,6 +52,106 @@ def satisfy_bid(bid, source):
         raise ValueError
 
 
+class BidPlan:
+    """
+    **Скомпилированный набор заявок**
+
+    Заявки один раз группируются по ключам ``(префикс, имя)`` и по префиксам, после чего применяются
+    к множеству триплетных строк за один проход. Для каждой строки перебирается меньшее из множеств ключей
+    её триплетов и ключей заявок, поэтому затраты не растут как произведение количества заявок и строк,
+    в отличие от вызова :func:`satisfy_bid` для каждой пары.
+
+    Результат для строки — список, элементы которого соответствуют заявкам: триплет (заявка по префиксу
+    и имени), триплетная строка (заявка по префиксу, см. :meth:`TrpStr.getpr`) или None, если заявка
+    не удовлетворена.
+
+    :param `*bids`: триплеты с заявкой (``bid=True``)
+
+    :raises TypeError: если параметры не :class:`Trp`
+    :raises ValueError: если триплет не является заявкой
+
+    :Пример работы:
+        >>> plan = BidPlan(Trp('A', bid=True), Trp('D', 'E', bid=True), Trp('X', 'Y', bid=True))
+        >>> results = plan.resolve(TrpStr(Trp('A', 'B', 'C'), Trp('D', 'E', 'F'), Trp('A', 'R', 'H')))
+        >>> print(results[0], results[1], results[2], sep=' | ')
+        $A.B='C'; $A.R='H'; | $D.E='F'; | None
+    """
+
+    def __init__(self, *bids):
+        by_key = {}  # hash((префикс, имя)) — номера заявок
+        by_prefix = {}  # префикс — номера заявок
+        for index, bid in enumerate(bids):
+            if not isinstance(bid, Trp):
+                raise TypeError('Должен быть Trp, не ' + type_name(bid), bid)
+            if not bid.bid:
+                raise ValueError('Триплет не является заявкой', bid)
+            if bid.name is None:
+                by_prefix.setdefault(bid.prefix, []).append(index)
+            else:
+                by_key.setdefault(hash((bid.prefix, bid.name)), []).append(index)
+        self._bids = bids
+        self._by_key = by_key
+        self._by_prefix = by_prefix
+
+    @property
+    def bids(self) -> tuple:
+        """Заявки в порядке, в котором они были переданы"""
+        return self._bids
+
+    def __len__(self):
+        return len(self._bids)
+
+    def resolve(self, trp_str) -> list:
+        """
+        Применяет заявки к триплетной строке
+
+        :param TrpStr trp_str: триплетная строка
+        :return: результаты в порядке заявок
+        :rtype: list
+
+        :raises TypeError: если параметр не :class:`TrpStr`
+        """
+        if not isinstance(trp_str, TrpStr):
+            raise TypeError('Должен быть TrpStr, не ' + type_name(trp_str), trp_str)
+
+        result = [None] * len(self._bids)
+        trps = trp_str._trps()
+        by_key = self._by_key
+        if len(trps) < len(by_key):
+            for key, trp in trps.items():
+                indices = by_key.get(key)
+                if indices is not None:
+                    for index in indices:
+                        result[index] = trp
+        else:
+            for key, indices in by_key.items():
+                trp = trps.get(key)
+                if trp is not None:
+                    for index in indices:
+                        result[index] = trp
+
+        for prefix, indices in self._by_prefix.items():
+            found = trp_str._getpr_trusted(prefix)
+            if found is not None:
+                for index in indices:
+                    result[index] = found
+        return result
+
+    def resolve_all(self, source):
+        """
+        Применяет заявки к каждой строке таблицы или последовательности триплетных строк
+
+        :param source: таблица или триплетные строки
+        :type source: VSPTDTechProcTable, Iterable[TrpStr]
+        :return: пары ``(первичный ключ или номер строки, результаты)``; см. :meth:`resolve`
+        :rtype: Iterator[tuple]
+        """
+        items = iter(source) if isinstance(source, VSPTDTechProcTable) else enumerate(source)
+        resolve = self.resolve
+        for key, trp_str in items:
+            yield key, resolve(trp_str)
+
+
 def eq_with_order(first, second) -> bool:
     """
     Проверяет на равенство триплетные строки с учётом порядка триплетов
@@ -69,6 +173,9 @@ class VSPTDTechProcTable:
 
     Принимает:
         - `*trp_strs` (TrpStr): триплексные строки
+
+    По значениям отдельных триплетов можно создать вторичные индексы (см. :meth:`create_index`),
+    поиск по которым не перебирает всю таблицу.
     """
     #: Настройки для вычисления первичного ключа, (префикс, имя, длина)
     primary_key_setts = (
@@ -86,6 +193,7 @@ class VSPTDTechProcTable:
                 return True
             else:
                 raise TypeError('Должен быть TrpStr, не ' + type_name(trp), trp)
+        self._indexes = {}  # (префикс, имя) — {ключ значения: {первичный ключ: None}}
         self._items = OrderedDict(
             {self.calc_primary_key(trp_str): trp_str for trp_str in trp_strs if check_type(trp_str)}
         )
@@ -95,7 +203,111 @@ class VSPTDTechProcTable:
         if not isinstance(trp_str, TrpStr):
                 raise TypeError
 
-        self._items.update({self.calc_primary_key(trp_str): trp_str})
+        key = self.calc_primary_key(trp_str)
+        if self._indexes:
+            if key in self._items:
+                self._unindex(key, self._items[key])
+            self._index(key, trp_str)
+        self._items.update({key: trp_str})
+
+    def create_index(self, prefix, name) -> None:
+        """
+        Создаёт вторичный индекс по значению триплета с заданными префиксом и именем
+
+        Индекс сопоставляет значению триплета первичные ключи строк и поддерживается методами :meth:`add`
+        и ``del``. Строки без такого триплета в индекс не попадают. Повторное создание индекса ничего не делает.
+
+        .. warning::
+            Изменения строк, уже добавленных в таблицу, индексом не отслеживаются (как и первичным ключом).
+
+        :param str prefix: префикс
+        :param str name: имя
+
+        :Пример работы:
+            >>> table = VSPTDTechProcTable(
+            ...     TrpStr(Trp('A', 'N', 1), Trp('P', 'N', 1), Trp('P', 'KWO', 5), Trp('Q', 'DI', 1)),
+            ...     TrpStr(Trp('A', 'N', 2), Trp('P', 'N', 1), Trp('P', 'KWO', 7), Trp('Q', 'DI', 1)),
+            ... )
+            >>> table.create_index('P', 'KWO')
+            >>> table.lookup_keys('P', 'KWO', 7)
+            ['000200100701']
+            >>> print(table.lookup('P', 'KWO', 5)[0])
+            $A.N=1; $P.N=1; $P.KWO=5; $Q.DI=1;
+        """
+        if (prefix, name) in self._indexes:
+            return
+        index = self._indexes[prefix, name] = {}
+        for key, trp_str in self._items.items():
+            try:
+                value = trp_str.get(prefix, name).value
+            except KeyError:
+                continue
+            index.setdefault(_index_value(value), {})[key] = None
+
+    def drop_index(self, prefix, name) -> None:
+        """
+        Удаляет вторичный индекс
+
+        :raises KeyError: если индекс по заданным префиксу и имени не создан
+        """
+        try:
+            del self._indexes[prefix, name]
+        except KeyError:
+            raise KeyError('Индекс по заданным префиксу и имени не создан', (prefix, name))
+
+    def indexes(self) -> list:
+        """Возвращает ``(префикс, имя)`` созданных вторичных индексов"""
+        return list(self._indexes)
+
+    def lookup_keys(self, prefix, name, value) -> list:
+        """
+        Возвращает по вторичному индексу первичные ключи строк, в которых триплет имеет заданное значение
+
+        :param str prefix: префикс
+        :param str name: имя
+        :param value: значение триплета
+        :rtype: list
+
+        :raises KeyError: если индекс по заданным префиксу и имени не создан
+        """
+        try:
+            index = self._indexes[prefix, name]
+        except KeyError:
+            raise KeyError('Индекс по заданным префиксу и имени не создан', (prefix, name))
+        return list(index.get(_index_value(value), ()))
+
+    def lookup(self, prefix, name, value) -> list:
+        """
+        Возвращает по вторичному индексу строки, в которых триплет имеет заданное значение
+
+        См. :meth:`lookup_keys`.
+
+        :rtype: list
+        """
+        items = self._items
+        return [items[key] for key in self.lookup_keys(prefix, name, value)]
+
+    def _index(self, key, trp_str) -> None:
+        """Добавляет строку во вторичные индексы"""
+        for (prefix, name), index in self._indexes.items():
+            try:
+                value = trp_str.get(prefix, name).value
+            except KeyError:
+                continue
+            index.setdefault(_index_value(value), {})[key] = None
+
+    def _unindex(self, key, trp_str) -> None:
+        """Удаляет строку из вторичных индексов"""
+        for (prefix, name), index in self._indexes.items():
+            try:
+                value = _index_value(trp_str.get(prefix, name).value)
+            except KeyError:
+                continue
+            keys = index.get(value)
+            if keys is not None:
+                keys.pop(key, None)
+                if not keys:
+                    del index[value]
 
     def calc_primary_key(self, trp_str):
         """Вычисляет первичный ключ для принятой триплексной строки"""
@@ -105,9 +317,52 @@ class VSPTDTechProcTable:
             for prefix, name, len_ in self.primary_key_setts
         )
 
+    def to_records(self) -> list:
+        """
+        Возвращает триплеты всех строк таблицы списком кортежей
+        ``(первичный ключ, префикс, имя, значение, комментарий, заявка, особенность)``
+
+        Обратная операция — :meth:`from_records`.
+
+        :rtype: list
+        """
+        return [(key, *record) for key, trp_str in self._items.items() for record in map(_trp_record, trp_str)]
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Создаёт таблицу из кортежей, возвращённых :meth:`to_records`, без валидации
+
+        Кортежи группируются по первичному ключу, который не вычисляется заново; порядок строк таблицы
+        определяется первым появлением ключа. См. :meth:`TrpStr.from_records`.
+
+        :param records: кортежи ``(первичный ключ, префикс, имя, значение, комментарий, заявка, особенность)``
+        :type records: Iterable[tuple]
+        :rtype: VSPTDTechProcTable
+
+        :Пример работы:
+            >>> table = VSPTDTechProcTable.from_records([('1', 'A', 'B', 1, None, False, False)])
+            >>> print(table['1'])
+            $A.B=1;
+            >>> table.to_records()
+            [('1', 'A', 'B', 1, None, False, False)]
+        """
+        groups = OrderedDict()
+        for record in records:
+            try:
+                groups[record[0]].append(record)
+            except KeyError:
+                groups[record[0]] = [record]
+
+        table = cls()
+        from_records = TrpStr.from_records
+        for key, group in groups.items():
+            table._items[key] = from_records(record[1:] for record in group)
+        return table
+
     def __str__(self):
         # TODO: определить формат
-        return ' || '.join('{0}: {1}'.format(key, trp_str) for key, trp_str in self._items.items())
+        return ' || '.join('{0}: {1}'.format(key, trp_str) for key, trp_str in self)
 
     def __repr__(self):
         return 'VSPTDTechProcTable(' + \
@@ -120,10 +375,645 @@ class VSPTDTechProcTable:
 
     def __delitem__(self, key):
         """Удаляет по первичному ключу триплексную строку"""
-        del self._items[key]
+        trp_str = self._items.pop(key)
+        if self._indexes:
+            self._unindex(key, trp_str)
 
     def __iter__(self):
         yield from self._items.items()
 
     def __len__(self):
         return len(self._items)
+
+
+def _index_value(value):
+    """
+    Возвращает ключ вторичного индекса для значения триплета: изменяемые (нехэшируемые) значения —
+    триплеты и выражения — индексируются по структуре, не зависящей от настроек текстового представления
+    """
+    if isinstance(value, (str, int, float)) or value is None:
+        return value
+    if isinstance(value, Trp):
+        return Trp, value.prefix, value.name, _index_value(value.value), value.special
+    return TrpExpr, tuple(map(_index_value, value.items))
+
+
+class ValueIndex:
+    """
+    **Инвертированный индекс значений триплетов множества триплетных строк**
+
+    Сопоставляет значениям триплетов вхождения ``(ключ строки, префикс, имя)``. Значения-триплеты
+    и триплеты, входящие в триплетные выражения (в том числе вложенные), индексируются как ссылки
+    на триплет-цель ``(префикс, имя)`` (без учёта "особенности"); значения-триплеты и выражения, кроме того,
+    индексируются по структуре (типу, префиксу, имени, значению и "особенности" триплетов, элементам выражений),
+    поэтому ключ не зависит от текущих настроек (``Trp.settings``, ``TrpExpr.settings``), и значение можно найти
+    после их изменения. Поиск занимает время, пропорциональное количеству найденных вхождений.
+
+    .. warning::
+        Изменения строк, уже добавленных в индекс, не отслеживаются; для обновления следует повторно
+        добавить строку методом :meth:`add`.
+
+    :param source: таблица (ключи — первичные ключи) или триплетные строки (ключи — номера строк)
+    :type source: VSPTDTechProcTable, Iterable[TrpStr], необяз.
+
+    :Пример работы:
+        >>> index = ValueIndex([
+        ...     TrpStr(Trp('A', 'N', 1), Trp('M', 'MAT', 'Сталь')),
+        ...     TrpStr(Trp('B', 'C', Trp('A', 'N')), Trp('B', 'D', TrpExpr(Trp('A', 'N'), '*', 2))),
+        ... ])
+        >>> index.find('Сталь')
+        [(0, 'M', 'MAT')]
+        >>> index.references('A', 'N')
+        [(1, 'B', 'C'), (1, 'B', 'D')]
+    """
+
+    def __init__(self, source=()):
+        self._values = {}  # значение — {(ключ строки, префикс, имя): None}
+        self._refs = {}  # (префикс, имя) триплета-цели — {(ключ строки, префикс, имя): None}
+        self._records = {}  # ключ строки — [(вхождения, ключ вхождений, вхождение)]
+        items = iter(source) if isinstance(source, VSPTDTechProcTable) else enumerate(source)
+        for key, trp_str in items:
+            self.add(key, trp_str)
+
+    def add(self, key, trp_str) -> None:
+        """
+        Добавляет в индекс значения триплетов строки; прежние значения строки с тем же ключом удаляются
+
+        :param key: ключ строки (например, первичный ключ таблицы)
+        :param TrpStr trp_str: триплетная строка
+
+        :raises TypeError: если строка не :class:`TrpStr`
+        """
+        if not isinstance(trp_str, TrpStr):
+            raise TypeError('Должен быть TrpStr, не ' + type_name(trp_str), trp_str)
+        if key in self._records:
+            self.remove(key)
+
+        entries = self._records[key] = []
+        for prefix, name, value, *_ in map(_trp_record, trp_str):
+            if value is None:
+                continue
+            posting = (key, prefix, name)
+            if isinstance(value, Trp):
+                self._post(entries, self._refs, (value.prefix, value.name), posting)
+                continue
+            if isinstance(value, TrpExpr):
+                for target in _expr_targets(value):
+                    self._post(entries, self._refs, target, posting)
+            self._post(entries, self._values, _index_value(value), posting)
+
+    @staticmethod
+    def _post(entries, index, value, posting) -> None:
+        """Добавляет вхождение в индекс и запоминает его для удаления"""
+        postings = index.get(value)
+        if postings is None:
+            postings = index[value] = {}
+        elif posting in postings:
+            return
+        postings[posting] = None
+        entries.append((index, value, posting))
+
+    def remove(self, key) -> None:
+        """
+        Удаляет из индекса значения триплетов строки
+
+        :raises KeyError: если строки с таким ключом нет в индексе
+        """
+        try:
+            entries = self._records.pop(key)
+        except KeyError:
+            raise KeyError('Строки с таким ключом нет в индексе', key)
+        for index, value, posting in entries:
+            postings = index[value]
+            del postings[posting]
+            if not postings:
+                del index[value]
+
+    def find(self, value) -> list:
+        """
+        Возвращает вхождения триплетов с заданным значением
+
+        Для значения-триплета возвращаются ссылки на него (см. :meth:`references`).
+
+        :param value: значение триплета
+        :type value: str, int, float, Trp, TrpExpr
+        :return: кортежи ``(ключ строки, префикс, имя)``
+        :rtype: list
+        """
+        if isinstance(value, Trp):
+            return self.references(value.prefix, value.name)
+        return list(self._values.get(_index_value(value), ()))
+
+    def references(self, prefix, name=None) -> list:
+        """
+        Возвращает вхождения триплетов, значения которых ссылаются на триплет-цель
+        непосредственно или через триплетное выражение
+
+        :param str prefix: префикс триплета-цели
+        :param name: имя триплета-цели
+        :type name: str, необяз.
+        :return: кортежи ``(ключ строки, префикс, имя)``
+        :rtype: list
+        """
+        return list(self._refs.get((prefix, name), ()))
+
+    def __contains__(self, key):
+        return key in self._records
+
+    def __len__(self):
+        return len(self._records)
+
+
+def _expr_targets(expr):
+    """Возвращает ``(префикс, имя)`` триплетов триплетного выражения, включая вложенные выражения"""
+    for item in expr.items:
+        if isinstance(item, Trp):
+            yield item.prefix, item.name
+        elif isinstance(item, TrpExpr):
+            yield from _expr_targets(item)
+
+
+class FormulaGraph:
+    """
+    **Граф зависимостей формул триплетной строки**
+
+    Формулы — триплеты, значения которых являются триплетными выражениями :class:`TrpExpr`; триплеты-операнды
+    выражений (кроме "особенных") образуют их зависимости, в том числе от других формул. Формулы вычисляются
+    в порядке топологической сортировки; исходные триплеты строки не изменяются, результаты доступны
+    через ``<FormulaGraph>[prefix, name]``.
+
+    Метод :meth:`refresh` обнаруживает изменения строки — изменение значения триплета, добавление, замену
+    или удаление триплетов — сравнением с запомненным состоянием (без вычислений) и пересчитывает лишь
+    формулы, зависящие от изменённых триплетов.
+
+    .. note::
+        Если формулу не удаётся вычислить (нет триплета-операнда, значение неподходящего типа, деление на ноль
+        и т.д.), её результатом становится None, а исключение сохраняется в :attr:`errors`.
+
+    :param TrpStr trp_str: триплетная строка
+    :param special_source: триплетная строка, откуда будут браться значения "особенных" триплетов-операндов
+    :type special_source: TrpStr, необяз.
+
+    :raises TypeError: если параметр не :class:`TrpStr`
+    :raises ValueError: если формулы образуют циклическую зависимость или выражение записано неверно
+
+    :Пример работы:
+        >>> trp_str = TrpStr(
+        ...     Trp('A', 'B', 2), Trp('C', 'D', 3),
+        ...     Trp('E', 'F', TrpExpr(Trp('A', 'B'), '*', Trp('C', 'D'))), Trp('G', 'H', TrpExpr(Trp('E', 'F'), '+', 1))
+        ... )
+        >>> graph = FormulaGraph(trp_str)
+        >>> graph['G', 'H']
+        7
+        >>> trp_str['C', 'D'].value = 10
+        >>> graph.refresh()
+        [('E', 'F'), ('G', 'H')]
+        >>> graph['G', 'H']
+        21
+    """
+
+    def __init__(self, trp_str, special_source=None):
+        if not isinstance(trp_str, TrpStr):
+            raise TypeError('Должен быть TrpStr, не ' + type_name(trp_str), trp_str)
+        self._trp_str = trp_str
+        self._special_source = special_source
+        self._values = {}  # ключ формулы hash((префикс, имя)) — результат
+        self._invalid = set()  # ключи триплетов, отмеченных изменёнными
+        self.errors = {}  #: (префикс, имя) формулы — исключение, возникшее при её вычислении
+        self._build()
+        self._recompute(self._order)
+
+    def _build(self) -> None:
+        """Строит граф по формулам строки и запоминает её состояние"""
+        trps = self._trp_str._trps()
+        formulas = {}  # ключ формулы — (триплет, вычислитель)
+        for key, trp in trps.items():
+            if isinstance(trp.value, TrpExpr):
+                formulas[key] = (trp, trp.value.compile())
+
+        dependents = {}  # ключ триплета — ключи формул, использующих его
+        pending = {}  # ключ формулы — количество ещё не упорядоченных формул-зависимостей
+        for key, (_, evaluator) in formulas.items():
+            deps = {operand[0] for operand in evaluator.operands if not operand[1]}
+            pending[key] = sum(dep in formulas for dep in deps)
+            for dep in deps:
+                dependents.setdefault(dep, []).append(key)
+
+        # топологическая сортировка (алгоритм Кана)
+        order = [key for key, count in pending.items() if count == 0]
+        for key in order:
+            for dependent in dependents.get(key, ()):
+                pending[dependent] -= 1
+                if pending[dependent] == 0:
+                    order.append(dependent)
+        if len(order) != len(formulas):
+            cycle = [(formulas[key][0].prefix, formulas[key][0].name) for key, count in pending.items() if count]
+            raise ValueError('Формулы образуют циклическую зависимость', cycle)
+
+        self._formulas = formulas
+        self._dependents = dependents
+        self._order = order
+        self._ranks = {key: rank for rank, key in enumerate(order)}
+        self._values = {key: value for key, value in self._values.items() if key in formulas}
+        names = {(trp.prefix, trp.name) for trp, _ in formulas.values()}
+        self.errors = {name: error for name, error in self.errors.items() if name in names}
+        self._remember()
+
+    def _remember(self) -> None:
+        """Запоминает состояние строки: ключи, триплеты и их значения"""
+        trps = self._trp_str._trps()
+        self._keys = list(trps)
+        self._positions = {key: pos for pos, key in enumerate(self._keys)}
+        self._trps = list(trps.values())
+        self._trp_values = list(map(_trp_value, self._trps))
+        self._revision = self._trp_str._revision() + _versions()
+
+    @property
+    def order(self) -> list:
+        """``(префикс, имя)`` формул в порядке вычисления"""
+        formulas = self._formulas
+        return [(formulas[key][0].prefix, formulas[key][0].name) for key in self._order]
+
+    def dependents(self, prefix, name) -> list:
+        """Возвращает ``(префикс, имя)`` формул, непосредственно использующих триплет"""
+        formulas = self._formulas
+        return [
+            (formulas[key][0].prefix, formulas[key][0].name) for key in self._dependents.get(hash((prefix, name)), ())
+        ]
+
+    def __getitem__(self, key):
+        """
+        Возвращает результат формулы по ``(префикс, имя)``
+
+        :raises KeyError: если формулы с такими префиксом и именем нет
+        """
+        try:
+            return self._values[hash(key)]
+        except KeyError:
+            raise KeyError('По заданным префиксу и имени формула не найдена', key)
+
+    def __contains__(self, key):
+        return hash(key) in self._formulas
+
+    def __len__(self):
+        return len(self._formulas)
+
+    def invalidate(self, prefix, name) -> None:
+        """
+        Отмечает триплет изменённым, например если изменилось содержимое изменяемого значения;
+        зависящие от него формулы будут пересчитаны при следующем вызове :meth:`refresh`
+        """
+        self._invalid.add(hash((prefix, name)))
+
+    def refresh(self) -> list:
+        """
+        Пересчитывает формулы, зависящие от изменённых с прошлого вызова триплетов
+
+        Если строка не изменялась, проверка занимает постоянное время; иначе изменённые триплеты
+        определяются сравнением с запомненным состоянием, а вычисляются лишь зависящие от них формулы.
+
+        :return: ``(префикс, имя)`` пересчитанных формул в порядке вычисления
+        :rtype: list
+
+        :raises ValueError: если изменённые формулы образуют циклическую зависимость
+        """
+        trp_versions = _versions()
+        revision = self._trp_str._revision() + trp_versions
+        if revision == self._revision and not self._invalid:
+            return []
+
+        changed = set(self._invalid)
+        self._invalid.clear()
+        trps = self._trp_str._trps()
+        same_trps = revision[:2] == self._revision[:2]
+        if same_trps:
+            # состав строки не изменился: изменились лишь значения триплетов
+            if revision[2] != self._revision[2]:
+                changed.update(compress(self._keys, map(is_not, map(_trp_value, self._trps), self._trp_values)))
+        else:
+            keys = list(trps)
+            objects = list(trps.values())
+            if keys == self._keys:
+                changed.update(compress(keys, map(is_not, objects, self._trps)))
+                changed.update(compress(keys, map(is_not, map(_trp_value, objects), self._trp_values)))
+            else:
+                previous = dict(zip(self._keys, zip(self._trps, self._trp_values)))
+                for key, trp in trps.items():
+                    state = previous.pop(key, None)
+                    if state is None or state[0] is not trp or state[1] is not trp.value:
+                        changed.add(key)
+                changed.update(previous)
+
+        formulas = self._formulas
+        if revision[3] != self._revision[3]:
+            # выражения формул (в том числе вложенные) изменены без замены значения триплета
+            changed.update(key for key, (_, evaluator) in formulas.items() if not evaluator.is_actual())
+
+        if any(key in formulas or isinstance(getattr(trps.get(key), 'value', None), TrpExpr) for key in changed):
+            self._build()
+        elif same_trps:
+            positions = self._positions
+            for key in changed:
+                pos = positions.get(key)
+                if pos is not None:
+                    self._trp_values[pos] = _trp_value(self._trps[pos])
+            self._revision = revision
+        else:
+            self._remember()
+
+        # формулы, зависящие от изменённых триплетов (непосредственно или через другие формулы)
+        formulas = self._formulas
+        dependents = self._dependents
+        affected = {key for key in changed if key in formulas}
+        stack = list(changed)
+        while stack:
+            for dependent in dependents.get(stack.pop(), ()):
+                if dependent not in affected:
+                    affected.add(dependent)
+                    stack.append(dependent)
+        keys = sorted(affected, key=self._ranks.__getitem__)
+        self._recompute(keys)
+        return [(formulas[key][0].prefix, formulas[key][0].name) for key in keys]
+
+    def _recompute(self, keys) -> None:
+        """Вычисляет формулы в заданном (топологическом) порядке"""
+        trps = self._trp_str._trps()
+        values = self._values
+        formulas = self._formulas
+        special_source = self._special_source
+        for key in keys:
+            trp, evaluator = formulas[key]
+            self.errors.pop((trp.prefix, trp.name), None)
+            try:
+                operands = []
+                for operand_key, special, prefix, name in evaluator.operands:
+                    if special:
+                        if special_source is None:
+                            raise KeyError('По заданным префиксу и имени триплет не найден', (prefix, name))
+                        operands.append(special_source._get_by_key(operand_key).value)
+                    elif operand_key in formulas:
+                        operands.append(values[operand_key])
+                    else:
+                        try:
+                            operands.append(trps[operand_key].value)
+                        except KeyError:
+                            raise KeyError('По заданным префиксу и имени триплет не найден', (prefix, name))
+                values[key] = evaluator.evaluate(operands)
+            except (ArithmeticError, TypeError, ValueError, KeyError) as e:
+                values[key] = None
+                self.errors[trp.prefix, trp.name] = e
+
+
+class TrpStrColumns:
+    """
+    **Колоночное хранилище множества триплетных строк**
+
+    Триплеты всех строк хранятся в столбцах: ключи ``(префикс, имя)`` интернируются в целочисленные
+    идентификаторы, значения раскладываются по типизированным массивам (``int``, ``float``, ``str``,
+    триплеты-ссылки), отсутствие значения и комментария отмечается в битовых масках.
+    Объекты :class:`TrpStr` и :class:`Trp` создаются лишь при обращении к записи.
+
+    .. note::
+        * триплеты-ссылки при обращении возвращаются как общие триплеты-цели (см. :meth:`Trp.target`);
+        * значения, не укладывающиеся в типизированные массивы (например, :class:`TrpExpr`), хранятся как объекты.
+
+    :param `*trp_strs`: триплетные строки :class:`TrpStr`
+    :raises TypeError: если параметры не :class:`TrpStr`
+
+    :Пример работы:
+        >>> columns = TrpStrColumns(TrpStr(Trp('A', 'B', 1)), TrpStr(Trp('A', 'B', 2), Trp('C', 'D', 'E')))
+        >>> columns.column('A', 'B')
+        [1, 2]
+        >>> print(columns[1])
+        $A.B=2; $C.D='E';
+    """
+    # виды значений
+    _NONE, _INT, _FLOAT, _STR, _REF, _OBJECT = range(6)
+    # флаги триплета
+    _BID, _SPECIAL, _REF_SPECIAL = 1, 2, 4
+
+    def __init__(self, *trp_strs):
+        self._keys = []  # (префикс, имя) по идентификатору
+        self._key_ids = {}  # (префикс, имя) — идентификатор
+        self._record_keys = []  # первичные ключи записей (или None)
+        self._offsets = array('L', (0,))  # начало триплетов каждой записи; последний элемент — общее количество
+
+        # столбцы триплетов
+        self._trp_key = array('L')
+        self._trp_record = array('L')
+        self._kind = array('B')
+        self._slot = array('L')  # позиция значения в массиве своего типа
+        self._flags = array('B')
+        self._value_nulls = bytearray()  # битовая маска: значение отсутствует
+        self._comment_nulls = bytearray()  # битовая маска: комментарий отсутствует
+
+        # типизированные массивы значений
+        self._ints = array('q')
+        self._floats = array('d')
+        self._strs = []
+        self._refs = array('L')  # идентификаторы ключей триплетов-ссылок
+        self._objects = []
+        self._comments = {}  # номер триплета — комментарий
+
+        self._by_key = {}  # идентификатор ключа — номера триплетов
+
+        for trp_str in trp_strs:
+            self.append(trp_str)
+
+    def __repr__(self):
+        return '<{}: {} записей, {} триплетов>'.format(TrpStrColumns.__name__, len(self), self.trp_count)
+
+    def __len__(self):
+        return len(self._record_keys)
+
+    @property
+    def trp_count(self) -> int:
+        """Общее количество триплетов"""
+        return len(self._trp_key)
+
+    @property
+    def keys(self) -> list:
+        """Все встречающиеся ключи ``(префикс, имя)`` в порядке появления"""
+        return list(self._keys)
+
+    def _key_id(self, prefix, name) -> int:
+        key = (prefix, name)
+        key_id = self._key_ids.get(key)
+        if key_id is None:
+            key_id = self._key_ids[key] = len(self._keys)
+            self._keys.append(key)
+            self._by_key[key_id] = array('L')
+        return key_id
+
+    def append(self, trp_str, key=None) -> None:
+        """
+        Добавляет триплетную строку в конец хранилища
+
+        :param TrpStr trp_str: триплетная строка
+        :param key: первичный ключ записи (например, из :class:`VSPTDTechProcTable`)
+
+        :raises TypeError: если параметр не :class:`TrpStr`
+        """
+        if not isinstance(trp_str, TrpStr):
+            raise TypeError('Должен быть TrpStr, не ' + type_name(trp_str), trp_str)
+
+        record = len(self._record_keys)
+        for trp in trp_str:
+            index = len(self._trp_key)
+            key_id = self._key_id(trp.prefix, trp.name)
+            self._trp_key.append(key_id)
+            self._trp_record.append(record)
+            self._by_key[key_id].append(index)
+
+            flags = (self._BID if trp.bid else 0) | (self._SPECIAL if trp.special else 0)
+            value = trp.value
+            if value is None:
+                kind, slot = self._NONE, 0
+            elif isinstance(value, Trp):
+                kind, slot = self._REF, len(self._refs)
+                self._refs.append(self._key_id(value.prefix, value.name))
+                if value.special:
+                    flags |= self._REF_SPECIAL
+            elif isinstance(value, str):
+                kind, slot = self._STR, len(self._strs)
+                self._strs.append(value)
+            elif isinstance(value, float):
+                kind, slot = self._FLOAT, len(self._floats)
+                self._floats.append(value)
+            elif isinstance(value, int) and -(1 << 63) <= value < (1 << 63):
+                kind, slot = self._INT, len(self._ints)
+                self._ints.append(value)
+            else:
+                kind, slot = self._OBJECT, len(self._objects)
+                self._objects.append(value)
+            self._kind.append(kind)
+            self._slot.append(slot)
+            self._flags.append(flags)
+
+            if index % 8 == 0:
+                self._value_nulls.append(0)
+                self._comment_nulls.append(0)
+            if value is None:
+                self._value_nulls[index >> 3] |= 1 << (index & 7)
+            if trp.comment is None:
+                self._comment_nulls[index >> 3] |= 1 << (index & 7)
+            else:
+                self._comments[index] = trp.comment
+
+        self._record_keys.append(key)
+        self._offsets.append(len(self._trp_key))
+
+    def is_null(self, index) -> bool:
+        """Проверяет по битовой маске, что у триплета с номером ``index`` нет значения"""
+        return bool(self._value_nulls[index >> 3] & (1 << (index & 7)))
+
+    def _value(self, index):
+        """Значение триплета с номером ``index``"""
+        kind, slot = self._kind[index], self._slot[index]
+        if kind == self._NONE:
+            return None
+        elif kind == self._INT:
+            return self._ints[slot]
+        elif kind == self._FLOAT:
+            return self._floats[slot]
+        elif kind == self._STR:
+            return self._strs[slot]
+        elif kind == self._REF:
+            prefix, name = self._keys[self._refs[slot]]
+            return Trp._target_trusted(prefix, name, bool(self._flags[index] & self._REF_SPECIAL))
+        else:
+            return self._objects[slot]
+
+    def _comment(self, index):
+        if self._comment_nulls[index >> 3] & (1 << (index & 7)):
+            return None
+        return self._comments[index]
+
+    def _record(self, index):
+        """Параметры триплета с номером ``index`` в порядке аргументов :class:`Trp`"""
+        prefix, name = self._keys[self._trp_key[index]]
+        flags = self._flags[index]
+        return (
+            prefix, name, self._value(index), self._comment(index),
+            bool(flags & self._BID), bool(flags & self._SPECIAL)
+        )
+
+    def __getitem__(self, index):
+        """
+        Возвращает триплетную строку записи с номером ``index``
+
+        :raises IndexError: если записи с таким номером нет
+        """
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('По принятому индексу не существует записи', index)
+        return TrpStr.from_records(
+            self._record(i) for i in range(self._offsets[index], self._offsets[index + 1])
+        )
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def record_key(self, index):
+        """Возвращает первичный ключ записи с номером ``index`` (``None``, если он не задан)"""
+        return self._record_keys[index]
+
+    def column(self, prefix, name) -> list:
+        """
+        Возвращает значения триплета с заданными префиксом и именем для каждой записи
+
+        Затраты пропорциональны количеству таких триплетов, а не общему количеству триплетов.
+
+        :param str prefix: префикс
+        :param str name: имя
+        :return: список значений длиной, равной количеству записей; ``None``, если триплета в записи нет
+        :rtype: list
+        """
+        result = [None] * len(self)
+        key_id = self._key_ids.get((prefix, name))
+        if key_id is not None:
+            records = self._trp_record
+            for index in self._by_key[key_id]:
+                result[records[index]] = self._value(index)
+        return result
+
+    @classmethod
+    def from_table(cls, table):
+        """
+        Создаёт колоночное хранилище из таблицы, сохраняя первичные ключи записей
+
+        :param VSPTDTechProcTable table: таблица
+        :rtype: TrpStrColumns
+        """
+        result = cls()
+        for key, trp_str in table:
+            result.append(trp_str, key)
+        return result
+
+    def to_table(self, table_cls=None):
+        """
+        Создаёт таблицу из записей хранилища без валидации (см. :meth:`VSPTDTechProcTable.from_records`)
+
+        Сохранённые первичные ключи записей (см. :meth:`from_table`) не вычисляются заново;
+        для записей без ключа он вычисляется методом :meth:`VSPTDTechProcTable.calc_primary_key`.
+
+        :param table_cls: класс таблицы; по умолчанию :class:`VSPTDTechProcTable`
+        :rtype: VSPTDTechProcTable
+        """
+        table_cls = table_cls or VSPTDTechProcTable
+        return table_cls.from_records(self._table_records(table_cls))
+
+    def _table_records(self, table_cls):
+        """Кортежи ``(первичный ключ, параметры триплета...)`` всех записей; недостающие ключи вычисляются"""
+        offsets = self._offsets
+        calc_primary_key = None
+        for index, key in enumerate(self._record_keys):
+            if key is None:
+                if calc_primary_key is None:
+                    calc_primary_key = table_cls().calc_primary_key
+                key = calc_primary_key(self[index])
+            for i in range(offsets[index], offsets[index + 1]):
+                yield (key,) + self._record(i)
+
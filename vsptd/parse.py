@@ -1,14 +1,20 @@
 # -*- coding: utf-8 -*-
 """Разбор строк на ВСПТД-структуры, а также генерация соответствующих регулярных выражений."""
 
+import codecs
+import mmap
+import os
 import re
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 
-from vsptd.vsptd import Trp, TrpStr, VSPTDSettings
-from vsptd.support import isfloat, type_name
+from vsptd.vsptd import Trp, TrpStr, TrpExpr, TrpExprEvaluator, VSPTDSettings
+from vsptd.support import type_name
 
-__all__ = ('VSPTDParse', 'parse_trp_str'
-           # , 'parse_trp_expr'
-           )
+__all__ = ('VSPTDParse', 'parse_trp_str', 'parse_trp_expr', 'iter_trp_strs', 'MappedTrpStrFile', 'parse_many',
+           'dump_trp_strs')
 
 
 # noinspection SpellCheckingInspection
@@ -107,75 +113,765 @@ class VSPTDParse:
 
 
 # noinspection PyProtectedMember
-def parse_trp_str(str_to_parse: str, parse_settings=VSPTDParse()):
+def parse_trp_str(str_to_parse: str, parse_settings=VSPTDParse(), validate=True):
     """
     Разбирает строку на триплеты и возвращает триплетную строку
 
+    Разбор выполняется за один проход по строке (см. :func:`_scan_trps`) и занимает время,
+    линейное относительно её длины, независимо от содержимого значений.
+
     .. note::
         * не поддерживаются "особенные" триплеты;
         * функцией можно парсить и триплеты, но вернётся всё равно триплетная строка ``TrpStr``;
-        * вернёт параметр ``str_to_parse`` без изменений, если он будет ``TrpStr``.
+        * вернёт параметр ``str_to_parse`` без изменений, если он будет ``TrpStr``;
+        * триплеты-ссылки в значениях являются общими неизменяемыми триплетами-целями (см. :meth:`Trp.target`);
+        * триплетные выражения в значениях разбираются функцией :func:`parse_trp_expr` и являются общими
+          неизменяемыми выражениями.
 
     .. warning:: Не гарантируется верный парсинг строк с ошибками.
 
     :param str str_to_parse: строка для парсинга
     :param parse_settings:  настройки конфигурации ВСПТД; по умолчанию используются стандартные
     :type parse_settings: VSPTDParse, используются стандартные по умолчанию
+    :param bool validate: проверять параметры триплетов; ``False`` — для заведомо корректных данных
+        (триплеты создаются через :meth:`Trp.from_trusted`)
     :rtype: TrpStr
 
     :raises TypeError: если ``str_to_parse`` не ``str`` и не ``TrpStr``
+    :raises ValueError: неверный формат значения триплета
+    """
+    if isinstance(str_to_parse, TrpStr):
+        return str_to_parse
+    elif not isinstance(str_to_parse, str):
+        raise TypeError('Строка для парсинга должна быть str, не ' + type_name(str_to_parse), str_to_parse)
+
+    if not validate:
+        return TrpStr.from_records(_scan_trps(str_to_parse, parse_settings._settings, Trp._target_trusted, False))
+    return TrpStr(*(
+        Trp(p, n, v, c, b) for p, n, v, c, b in _scan_trps(str_to_parse, parse_settings._settings)
+    ))
+
+
+def _isword(value: str) -> bool:
+    """Аналог ``re.fullmatch(r'\\w+', value)``"""
+    return value.isalnum() or (value != '' and value.replace('_', 'a').isalnum())
+
+
+def _determine_value(value: str, settings, make_trp=Trp.target, validate=True):
+    """
+    Определение типа значения триплета (без учёта заявки)
+
+    :param make_trp: функция создания триплета-ссылки; по умолчанию — общий триплет-цель :meth:`Trp.target`
+    :param bool validate: проверять триплеты-операнды триплетных выражений (см. :func:`parse_trp_expr`)
+
     :raises ValueError: неверный формат значения триплета
     """
     # TODO: неверно работает с триплетами вида $A.B='[1, 2, 3, 'A']'
-    # noinspection PyProtectedMember
-    def _determine_value(value):
-        """Определение типа значения триплета"""
-        trp_val_str_isltr = parse_settings._settings.trp_val_str_isltr
-        re_trp_ref = parse_settings.re_trp_ref
-
-        # избавляемся от заявки
-        if value.startswith(bid):
-            value = value[len(bid):]
-
-        # None
-        if value == '':
-            return None
-
-        # строка
-        if value.startswith(trp_val_str_isltr) and value.endswith(trp_val_str_isltr):
-            sprtr_len = len(trp_val_str_isltr)
-            value = value[sprtr_len: -sprtr_len]
-            return value
-        # число
-        if value.isdigit():
-            return int(value)
-        # число с плавающей запятой
-        if isfloat(value):
+    # None
+    if value == '':
+        return None
+
+    # строка
+    trp_val_str_isltr = settings.trp_val_str_isltr
+    if value.startswith(trp_val_str_isltr) and value.endswith(trp_val_str_isltr):
+        sprtr_len = len(trp_val_str_isltr)
+        return value[sprtr_len: -sprtr_len]
+    # число
+    if value.isdigit() or (value[:1] in ('-', '+') and value[1:].isdigit()):
+        return int(value)
+    # число с плавающей запятой
+    if '.' in value or 'e' in value or 'E' in value:
+        try:
             return float(value)
-        # триплет-ссылка
-        _trp = re.fullmatch(re_trp_ref, value)
-        if _trp is not None:
-            trp_params = tuple(param for param in _trp.groups() if param != '')  # удаляем пустые параметры
-            return Trp(*trp_params)
-        # TODO триплетное выражение
+        except ValueError:
+            pass
+    # триплет-ссылка
+    trp_start = settings.trp_start
+    if value.startswith(trp_start):
+        prefix, sprtr, name = value[len(trp_start):].partition(settings.trp_pn_sprtr)
+        if sprtr and _isword(prefix) and _isword(name):
+            return make_trp(prefix, name)
+    # триплетное выражение
+    try:
+        return _trp_expr(value, settings, validate)
+    except ValueError:
+        pass
+
+    raise ValueError('Неверный формат значения триплета', value)
+
+
+def _scan_trps(text: str, settings, make_trp=Trp.target, validate=True):
+    """
+    Однопроходный разбор строки на параметры триплетов
+
+    Возвращает генератор кортежей ``(префикс, имя, значение, комментарий, заявка)``; значение уже приведено
+    к нужному типу, пустые имя и комментарий заменены на ``None``. Результат совпадает с разбором
+    регулярным выражением :attr:`VSPTDParse.re_trp`, но без возвратов (backtracking):
+    поиск каждого разделителя продолжается с места предыдущего поиска, а каждый символ строки
+    попадает в срез не более одного раза, поэтому время разбора линейно относительно длины строки.
+
+    :param str text: строка для разбора
+    :param VSPTDSettings settings: настройки конфигурации ВСПТД
+    :param make_trp: функция создания триплета-ссылки
+    :param bool validate: проверять триплеты-операнды триплетных выражений
+    """
+    trp_start = settings.trp_start
+    trp_pn_sprtr = settings.trp_pn_sprtr
+    trp_nv_sprtr = settings.trp_nv_sprtr
+    trp_end = settings.trp_end
+    trp_comment_isltr = settings.trp_comment_isltr
+    comment_end = trp_comment_isltr + trp_end
+    bid = settings.bid
+
+    len_start, len_pn, len_nv, len_end = len(trp_start), len(trp_pn_sprtr), len(trp_nv_sprtr), len(trp_end)
+    len_isltr, len_comment_end, len_bid = len(trp_comment_isltr), len(comment_end), len(bid)
+
+    find = text.find
+    # ближайшие найденные вхождения разделителей (-2 — поиск ещё не выполнялся, -1 — вхождений нет);
+    # позиции поиска для каждого разделителя не убывают, поэтому найденное вхождение
+    # остаётся верным, пока оно не осталось позади
+    next_start = next_pn = next_nv = next_nl = next_end = next_quote = next_comment_end = -2
+
+    pos = find(trp_start)
+    while pos != -1:
+        # префикс: \w+ до разделителя префикса и имени, без начала другого триплета
+        prefix_start = pos + len_start
+        if next_start < prefix_start and next_start != -1:
+            next_start = find(trp_start, prefix_start)
+        if next_pn < prefix_start and next_pn != -1:
+            next_pn = find(trp_pn_sprtr, prefix_start)
+        pn = next_pn
+        if pn == -1 or (pn > next_start != -1):
+            pos = find(trp_start, pos + 1)
+            continue
+        prefix = text[prefix_start:pn]
+        if not prefix.isalnum() and not _isword(prefix):
+            pos = find(trp_start, pos + 1)
+            continue
+
+        # имя: пусто или \w+ до разделителя имени и значения, без начала другого триплета
+        name_start = pn + len_pn
+        if next_nv < name_start and next_nv != -1:
+            next_nv = find(trp_nv_sprtr, name_start)
+        nv = next_nv
+        if nv == -1:
+            return
+        if nv == name_start:
+            name = None
+        else:
+            if next_start < name_start and next_start != -1:
+                next_start = find(trp_start, name_start)
+            name = text[name_start:nv]
+            if (nv > next_start != -1) or (not name.isalnum() and not _isword(name)):
+                pos = find(trp_start, pos + 1)
+                continue
+
+        # значение: до первого конца триплета или до начала комментария, за которым следует конец триплета;
+        # значение и комментарий не переходят на новую строку
+        value_start = nv + len_nv
+        if next_nl < value_start and next_nl != -1:
+            next_nl = find('\n', value_start)
+        if next_end < value_start and next_end != -1:
+            next_end = find(trp_end, value_start)
+        if next_quote < value_start and next_quote != -1:
+            next_quote = find(trp_comment_isltr, value_start) if len_isltr else -1
+        line_end, end, quote = next_nl, next_end, next_quote
+
+        comment = value_end = None
+        if quote != -1 and (end == -1 or quote < end) and (line_end == -1 or quote < line_end):
+            comment_start = quote + len_isltr
+            if next_comment_end < comment_start and next_comment_end != -1:
+                next_comment_end = find(comment_end, comment_start)
+            comment_stop = next_comment_end
+            if comment_stop != -1 and (line_end == -1 or comment_stop < line_end):
+                comment = text[comment_start:comment_stop] or None
+                value_end = quote
+                match_end = comment_stop + len_comment_end
+        if value_end is None:
+            if end == -1 or (end > line_end != -1):
+                pos = find(trp_start, pos + 1)
+                continue
+            value_end = end
+            match_end = end + len_end
+
+        value = text[value_start:value_end]
+        is_bid = value.startswith(bid)
+        value = _determine_value(value[len_bid:] if is_bid else value, settings, make_trp, validate)
+        yield prefix, name, value, comment, is_bid
+        pos = find(trp_start, match_end)
+
+
+def iter_trp_strs(fileobj, record_sep='\n', parse_settings=VSPTDParse(), chunk_size=1 << 16, encoding='utf-8',
+                  validate=True):
+    """
+    Построчно разбирает поток и возвращает генератор триплетных строк
+
+    Поток читается кусками ограниченного размера, поэтому расход памяти не зависит от размера файла.
+    Записи, разорванные границей куска, склеиваются. Пустые записи пропускаются.
+
+    :param fileobj: файловый объект (текстовый или двоичный) с методом ``read``
+    :param str record_sep: разделитель записей (триплетных строк); по умолчанию перевод строки
+    :param parse_settings: настройки конфигурации ВСПТД; по умолчанию используются стандартные
+    :type parse_settings: VSPTDParse, необяз.
+    :param int chunk_size: размер читаемого куска
+    :param str encoding: кодировка; используется лишь для двоичных потоков
+    :param bool validate: проверять параметры триплетов (см. :func:`parse_trp_str`)
+    :rtype: Iterator[TrpStr]
+
+    :raises ValueError: если ``record_sep`` — пустая строка или ``chunk_size`` меньше длины разделителя
+
+    :Пример работы:
+        >>> import io
+        >>> for trp_str in iter_trp_strs(io.StringIO("$A.B=1;\\n$C.D='E';\\n")):
+        ...     print(trp_str)
+        $A.B=1;
+        $C.D='E';
+    """
+    for record in _iter_records(fileobj, record_sep, chunk_size, encoding):
+        yield parse_trp_str(record, parse_settings, validate)
+
+
+def _iter_text_chunks(fileobj, chunk_size, encoding):
+    """Читает поток кусками, декодируя двоичные данные"""
+    decoder = None
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if isinstance(chunk, bytes):
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder(encoding)()
+            text = decoder.decode(chunk, final=not chunk)
+        else:
+            text = chunk
+        if text:
+            yield text
+        if not chunk:
+            return
+
+
+def _iter_records(fileobj, record_sep, chunk_size, encoding):
+    """Возвращает непустые записи потока, разделённые ``record_sep``"""
+    if not record_sep:
+        raise ValueError('Разделитель записей не может быть пустым', record_sep)
+    if chunk_size < len(record_sep):
+        raise ValueError('Размер куска должен быть не меньше длины разделителя записей', chunk_size)
+
+    carry = len(record_sep) - 1  # разделитель может начинаться в конце предыдущего куска
+    pending = []  # куски незавершённой записи
+    for chunk in _iter_text_chunks(fileobj, chunk_size, encoding):
+        if carry and pending:
+            last = pending[-1]
+            chunk = last[-carry:] + chunk
+            pending[-1] = last[:-carry]
+        parts = chunk.split(record_sep)
+        if len(parts) == 1:
+            pending.append(chunk)
+            continue
+        pending.append(parts[0])
+        record = ''.join(pending)
+        if not _is_blank(record):
+            yield record
+        for record in parts[1:-1]:
+            if not _is_blank(record):
+                yield record
+        pending = [parts[-1]]
+
+    record = ''.join(pending)
+    if not _is_blank(record):
+        yield record
+
+
+def _is_blank(record: str) -> bool:
+    """Пустая запись или запись из одних пробельных символов (в смысле :meth:`str.isspace`)"""
+    return not record or record.isspace()
+
+
+def dump_trp_strs(trp_strs, fileobj, record_sep='\n', chunk_size=1 << 16, encoding='utf-8') -> int:
+    """
+    Записывает триплетные строки в поток, завершая каждую разделителем записей
+
+    Текст записывается кусками ограниченного размера, поэтому общая строка для всех записей не создаётся.
+    Используются кэшированные текстовые представления триплетов и триплетных строк.
+    Записанное читается обратно функцией :func:`iter_trp_strs` с тем же разделителем.
+
+    :param trp_strs: триплетные строки
+    :type trp_strs: Iterable[TrpStr]
+    :param fileobj: файловый объект (текстовый или двоичный) с методом ``write``
+    :param str record_sep: разделитель записей (триплетных строк); по умолчанию перевод строки
+    :param int chunk_size: примерный размер записываемого куска (в символах)
+    :param str encoding: кодировка; используется лишь для двоичных потоков
+    :return: количество записанных триплетных строк
+    :rtype: int
+
+    :raises TypeError: если элемент не :class:`TrpStr`
+
+    :Пример работы:
+        >>> import io
+        >>> stream = io.BytesIO()
+        >>> dump_trp_strs([TrpStr(Trp('A', 'B', 1)), TrpStr(Trp('C', 'D', 'E'))], stream)
+        2
+        >>> stream.getvalue()
+        b"$A.B=1;\\n$C.D='E';\\n"
+    """
+    write = fileobj.write
+    binary = None  # определяется при первой записи
+    pending = []
+    size = 0
+    count = 0
+    for trp_str in trp_strs:
+        if not isinstance(trp_str, TrpStr):
+            raise TypeError('Должен быть TrpStr, не ' + type_name(trp_str), trp_str)
+        text = str(trp_str)
+        pending += text, record_sep
+        size += len(text) + len(record_sep)
+        count += 1
+        if size >= chunk_size:
+            binary = _write_text(write, ''.join(pending), binary, encoding)
+            pending = []
+            size = 0
+    if pending:
+        _write_text(write, ''.join(pending), binary, encoding)
+    return count
+
+
+def _write_text(write, text, binary, encoding) -> bool:
+    """Записывает текст в поток, кодируя его для двоичных потоков; возвращает признак двоичного потока"""
+    if binary is None:
+        try:
+            write(text)
+            return False
+        except TypeError:
+            # двоичный поток не принимает str
+            binary = True
+    write(text.encode(encoding) if binary else text)
+    return binary
+
+
+class MappedTrpStrFile:
+    """
+    **Файл триплетных строк, отображённый в память**
 
-        raise ValueError('Неверный формат значения триплета', value)
+    Файл отображается в память (``mmap``), границы записей ищутся по байтам лениво, по мере обращения к записям,
+    поэтому открытие даже очень большого файла практически ничего не стоит. Запись разбирается из среза
+    ``memoryview`` без копирования файла в строку Python: декодируется лишь сама запись.
+    Пустые записи и записи из одних пробельных символов пропускаются.
 
-    if isinstance(str_to_parse, TrpStr):
-        return TrpStr
+    .. note::
+        * кодировка должна быть совместима с ASCII (например, UTF-8 или CP1251);
+        * для отрицательных индексов и ``len`` просматривается весь файл (один раз);
+        * после использования файл необходимо закрыть методом :meth:`close` или использовать ``with``.
+
+    :param str path: путь к файлу
+    :param str record_sep: разделитель записей (триплетных строк); по умолчанию перевод строки
+    :param parse_settings: настройки конфигурации ВСПТД; по умолчанию используются стандартные
+    :type parse_settings: VSPTDParse, необяз.
+    :param str encoding: кодировка файла
+    :param bool validate: проверять параметры триплетов (см. :func:`parse_trp_str`)
+
+    :raises ValueError: если ``record_sep`` — пустая строка
+
+    :Пример работы:
+        >>> with MappedTrpStrFile('trp_strs.txt') as trp_strs:  # doctest: +SKIP
+        ...     print(trp_strs[1000000])
+        ...     for trp_str in trp_strs:
+        ...         pass
+    """
+    def __init__(self, path, record_sep='\n', parse_settings=VSPTDParse(), encoding='utf-8', validate=True):
+        if not record_sep:
+            raise ValueError('Разделитель записей не может быть пустым', record_sep)
+        self._parse_settings = parse_settings
+        self._validate = validate
+        self._encoding = encoding
+        self._sep = record_sep.encode(encoding)
+
+        self._file = open(path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # пустой файл нельзя отобразить в память
+            self._mmap = b''
+        self._view = memoryview(self._mmap)
+
+        # границы найденных записей
+        self._starts = array('Q')
+        self._ends = array('Q')
+        self._bounds = _iter_record_bounds(self._mmap, self._sep, encoding=encoding)
+
+    def __repr__(self):
+        return '<{}: {!r}>'.format(MappedTrpStrFile.__name__, self._file.name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        """Закрывает файл"""
+        self._view.release()
+        if isinstance(self._mmap, mmap.mmap):
+            self._mmap.close()
+        self._file.close()
+
+    def _scan(self, count=None) -> None:
+        """Ищет границы записей, пока их не станет ``count`` или пока не закончится файл"""
+        starts, ends = self._starts, self._ends
+        for start, end in self._bounds:
+            starts.append(start)
+            ends.append(end)
+            if count is not None and len(starts) >= count:
+                return
+
+    def _parse(self, index):
+        text = str(self._view[self._starts[index]:self._ends[index]], self._encoding)
+        return parse_trp_str(text, self._parse_settings, self._validate)
+
+    def __len__(self):
+        self._scan()
+        return len(self._starts)
+
+    def __getitem__(self, index):
+        """
+        Возвращает триплетную строку по номеру записи (или список триплетных строк по срезу)
+
+        :raises IndexError: если записи с таким номером нет
+        :raises TypeError: если индекс не ``int`` и не ``slice``
+        """
+        if isinstance(index, slice):
+            return [self._parse(i) for i in range(*index.indices(len(self)))]
+        if not isinstance(index, int):
+            raise TypeError('Индекс должен быть int или slice, не ' + type_name(index), index)
+        if index < 0:
+            index += len(self)
+        else:
+            self._scan(index + 1)
+        if not 0 <= index < len(self._starts):
+            raise IndexError('По принятому индексу не существует записи', index)
+        return self._parse(index)
+
+    def __iter__(self):
+        index = 0
+        while True:
+            if index >= len(self._starts):
+                self._scan(index + 1)
+                if index >= len(self._starts):
+                    return
+            yield self._parse(index)
+            index += 1
+
+
+def _iter_record_bounds(data, sep: bytes, start=0, stop=None, encoding='utf-8'):
+    """
+    Возвращает границы ``(начало, конец)`` непустых записей, начинающихся в диапазоне ``[start, stop)``
+
+    Запись, начинающаяся внутри диапазона, возвращается целиком, даже если заканчивается за его пределами;
+    поэтому смежные диапазоны делят файл на записи без пропусков и повторов. Пустые записи определяются
+    так же, как в :func:`iter_trp_strs` (см. :func:`_is_blank`), с учётом пробельных символов Unicode.
+
+    :param data: байты (``bytes``, ``mmap``)
+    :param bytes sep: разделитель записей
+    :param str encoding: кодировка записей
+    """
+    size = len(data)
+    stop = size if stop is None else min(stop, size)
+    if start > 0:
+        # начало первой записи диапазона — сразу после разделителя
+        sep_pos = data.find(sep, max(start - len(sep), 0))
+        if sep_pos == -1:
+            return
+        start = sep_pos + len(sep)
+    while start < stop:
+        end = data.find(sep, start)
+        if end == -1:
+            end = size
+        # пропуск пустых записей и записей из пробельных символов; запись, начинающаяся с видимого
+        # символа ASCII, непуста, остальные декодируются для проверки
+        if end > start and (0x20 < data[start] < 0x7f or
+                            not _is_blank(str(data[start:end], encoding, 'replace'))):
+            yield start, end
+        start = end + len(sep)
+
+
+def parse_many(source, workers=None, chunksize=256, parse_settings=VSPTDParse(), record_sep='\n', encoding='utf-8',
+               validate=True):
+    """
+    Разбирает множество строк (или файл) на нескольких ядрах и возвращает генератор триплетных строк
+
+    Работа распределяется по пулу процессов; порядок результатов совпадает с порядком строк.
+    Процессы возвращают результаты в компактном виде (кортежи параметров триплетов),
+    триплетные строки собираются в вызывающем процессе.
+
+    Если ``source`` — путь к файлу (:class:`os.PathLike`, например :class:`pathlib.Path`), файл делится
+    на диапазоны байтов, и каждый процесс самостоятельно отображает в память свой диапазон
+    (см. :class:`MappedTrpStrFile`), поэтому содержимое файла между процессами не передаётся.
+    Путь в виде ``str`` не принимается, так как его нельзя отличить от строки для разбора.
+
+    .. note::
+        * разделитель записей в файле не должен перекрываться сам с собой (например, ``'||'``);
+        * одновременно в обработке находится не более ``2 * workers`` заданий,
+          поэтому расход памяти ограничен и при больших объёмах данных.
+
+    :param source: строки для разбора или путь к файлу
+    :type source: Iterable[str], os.PathLike
+    :param int workers: количество процессов; по умолчанию — количество ядер.
+        При ``workers=1`` разбор производится в текущем процессе
+    :param int chunksize: количество строк в одном задании (для файла — не используется)
+    :param parse_settings: настройки конфигурации ВСПТД; по умолчанию используются стандартные
+    :type parse_settings: VSPTDParse, необяз.
+    :param str record_sep: разделитель записей в файле
+    :param str encoding: кодировка файла
+    :param bool validate: проверять параметры триплетов при сборке триплетных строк (см. :func:`parse_trp_str`)
+    :rtype: Iterator[TrpStr]
+
+    :raises ValueError: если ``workers`` или ``chunksize`` меньше 1, или ``record_sep`` — пустая строка
+    :raises TypeError: если ``source`` — ``str`` или ``bytes``, или (при получении строк) строка для разбора не str
+    """
+    # параметры проверяются сразу при вызове, а не при получении первой строки
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 1 or chunksize < 1:
+        raise ValueError('Количество процессов и размер задания должны быть больше 0', workers, chunksize)
+    settings = parse_settings._settings
+
+    if isinstance(source, (str, bytes)):
+        raise TypeError('Путь к файлу должен быть os.PathLike (например, pathlib.Path), не ' + type_name(source),
+                        source)
+    if isinstance(source, os.PathLike):
+        if not record_sep:
+            raise ValueError('Разделитель записей не может быть пустым', record_sep)
+        path = os.path.abspath(source)
+        size = os.path.getsize(path)
+        range_size = max(size // (workers * 4) + 1, 1 << 20)
+        tasks = (
+            (_parse_file_range, path, start, start + range_size, record_sep, encoding, settings, validate)
+            for start in range(0, size, range_size)
+        )
+    else:
+        tasks = ((_parse_compact, batch, settings, validate) for batch in _batches(_checked_strs(source), chunksize))
+    return _parse_tasks(tasks, workers, validate)
+
+
+def _parse_tasks(tasks, workers, validate):
+    """Выполняет задания разбора (см. :func:`parse_many`) и собирает триплетные строки"""
+    if workers == 1:
+        results = (task[0](*task[1:]) for task in tasks)
+    else:
+        results = _imap_ordered(tasks, workers)
+    for records in results:
+        for record in records:
+            yield _build_trp_str(record, validate)
+
+
+def _checked_strs(strs):
+    """Проверяет тип строк для разбора в вызывающем процессе (см. :func:`parse_many`)"""
+    for str_to_parse in strs:
+        if not isinstance(str_to_parse, str):
+            raise TypeError('Строка для парсинга должна быть str, не ' + type_name(str_to_parse), str_to_parse)
+        yield str_to_parse
+
+
+def _batches(iterable, size):
+    """Делит итерируемый объект на списки длиной ``size``"""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _run_task(task):
+    return task[0](*task[1:])
+
+
+def _imap_ordered(tasks, workers):
+    """Выполняет задания в пуле процессов, сохраняя порядок и ограничивая число заданий в обработке"""
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for task in tasks:
+            pending.append(executor.submit(_run_task, task))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _parse_compact(texts, settings, validate=True) -> list:
+    """
+    Разбирает строки в компактный вид: для каждой строки — кортеж кортежей
+    ``(префикс, имя, значение, комментарий, заявка)``, где триплет-ссылка заменена кортежем ``(префикс, имя)``;
+    триплетные выражения передаются как есть
+    """
+    return [tuple(_scan_trps(text, settings, _ref_record, validate)) for text in texts]
+
+
+def _parse_file_range(path, start, stop, record_sep, encoding, settings, validate=True) -> list:
+    """Разбирает в компактный вид записи файла, начинающиеся в диапазоне байтов ``[start, stop)``"""
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        view = memoryview(data)
+        try:
+            return _parse_compact(
+                (str(view[a:b], encoding)
+                 for a, b in _iter_record_bounds(data, record_sep.encode(encoding), start, stop, encoding)),
+                settings, validate
+            )
+        finally:
+            view.release()
+
+
+def _ref_record(prefix, name):
+    """Компактный вид триплета-ссылки"""
+    return prefix, name
+
+
+def _build_trp_str(record, validate=True) -> TrpStr:
+    """Собирает триплетную строку из компактного вида"""
+    if not validate:
+        return TrpStr.from_records(
+            (p, n, Trp._target_trusted(*v) if isinstance(v, tuple) else v, c, b) for p, n, v, c, b in record
+        )
+    return TrpStr(*(
+        Trp(p, n, Trp.target(*v) if isinstance(v, tuple) else v, c, b) for p, n, v, c, b in record
+    ))
+
+
+def parse_trp_expr(str_to_parse: str, parse_settings=VSPTDParse(), validate=True):
+    """
+    Разбирает строку на триплетное выражение
+
+    Строка разбивается на числа, триплеты-операнды (``$P.N`` и "особенные" ``P.N``), операторы
+    и скобки; выражение в скобках становится вложенным триплетным выражением. Затем выражение компилируется
+    (см. :meth:`TrpExpr.compile`), чем проверяется расстановка операторов с учётом их приоритетов.
+
+    Результаты разбора кэшируются по тексту строки (кэш LRU на 4096 выражений):
+    одинаковые формулы разбираются и компилируются лишь однажды, а возвращаемое выражение разделяется всеми вызовами.
+
+    .. note::
+        * возвращаемое выражение общее и неизменяемо: изменение ``items`` вызывает ``AttributeError``;
+        * триплеты-операнды являются общими неизменяемыми триплетами-целями (см. :meth:`Trp.target`);
+        * пробелы и разделитель ``VSPTDSettings.trp_expr_items_sprtr`` между элементами пропускаются;
+        * вернёт параметр ``str_to_parse`` без изменений, если он будет ``TrpExpr``.
+
+    :param str str_to_parse: строка для парсинга
+    :param parse_settings:  настройки конфигурации ВСПТД; по умолчанию используются стандартные
+    :type parse_settings: VSPTDParse, необяз.
+    :param bool validate: проверять префиксы и имена триплетов-операндов; ``False`` — для заведомо корректных данных
+        (триплеты создаются без валидации)
+    :rtype: TrpExpr
+
+    :raises TypeError: если ``str_to_parse`` не ``str`` и не ``TrpExpr``
+    :raises ValueError: если выражение записано неверно или содержит недопустимый оператор
+
+    :Пример работы:
+        >>> expr = parse_trp_expr('($A.B+1)*K.N')
+        >>> expr.items[0].items
+        (Trp(prefix='A', name='B'), '+', 1)
+        >>> expr.calculate(TrpStr(Trp('A', 'B', 20)), TrpStr(Trp('K', 'N', 2)))
+        42
+        >>> expr is parse_trp_expr('($A.B+1)*K.N')
+        True
+    """
+    if isinstance(str_to_parse, TrpExpr):
+        return str_to_parse
     elif not isinstance(str_to_parse, str):
         raise TypeError('Строка для парсинга должна быть str, не ' + type_name(str_to_parse), str_to_parse)
+    return _trp_expr(str_to_parse, parse_settings._settings, validate)
 
-    re_trp = parse_settings.re_trp
-    parsed_str = re.findall(re_trp, str_to_parse)
 
-    bid = parse_settings._settings.bid
-    result = TrpStr(*(
-        Trp(p, n, _determine_value(v), c, v.startswith(bid)) for p, n, v, c in parsed_str
-    ))
-    return result
+_TRP_EXPR_CACHE_SIZE = 4096  # количество разобранных триплетных выражений, хранимых в кэше
+
+_re_expr_number = re.compile(r'(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?')
+
+
+def _trp_expr(text: str, settings, validate=True) -> TrpExpr:
+    """Возвращает общее триплетное выражение из кэша или разбирает и компилирует его"""
+    # валидаторы пересоздаются при изменении настроек, поэтому служат ключом их актуальности
+    validators = (Trp.settings.validate_prefix, Trp.settings.validate_name) if validate else None
+    return _cached_trp_expr(
+        text, settings.trp_start, settings.trp_pn_sprtr, settings.trp_expr_items_sprtr, validators
+    )
 
 
-# def parse_trp_expr():
-#     # TODO
-#     pass
+@lru_cache(maxsize=_TRP_EXPR_CACHE_SIZE)
+def _cached_trp_expr(text, trp_start, trp_pn_sprtr, items_sprtr, validators) -> TrpExpr:
+    """Разбирает и компилирует триплетное выражение; результаты кэшируются (LRU)"""
+    make_trp = Trp._target_trusted if validators is None else Trp.target
+    expr = _scan_trp_expr(text, trp_start, trp_pn_sprtr, items_sprtr, make_trp)
+    expr.compile()
+    return expr
+
+
+def _scan_trp_expr(text: str, trp_start: str, trp_pn_sprtr: str, items_sprtr: str, make_trp=Trp.target) -> TrpExpr:
+    """
+    Однопроходный разбор строки на элементы триплетного выражения
+
+    Выражения в скобках собираются во вложенные выражения с помощью стека открытых скобок.
+    Порядок операторов не проверяется (это делается при компиляции).
+
+    :param make_trp: функция создания триплета-операнда
+
+    :raises ValueError: если строка содержит недопустимый символ, неверный триплет или непарную скобку
+    """
+    operators, unary_operators = TrpExprEvaluator.operators, TrpExprEvaluator.unary_operators
+    match_number = _re_expr_number.match
+
+    groups = [[]]  # элементы открытых скобок; первая группа — само выражение
+    pos, length = 0, len(text)
+    while pos < length:
+        char = text[pos]
+        if char.isspace():
+            pos += 1
+        elif items_sprtr and text.startswith(items_sprtr, pos):
+            pos += len(items_sprtr)
+        elif char == '(':
+            groups.append([])
+            pos += 1
+        elif char == ')':
+            if len(groups) == 1:
+                raise ValueError('Лишняя закрывающая скобка в триплетном выражении', text)
+            items = groups.pop()
+            groups[-1].append(TrpExpr._shared_trusted(items))
+            pos += 1
+        elif text.startswith(trp_start, pos):
+            prefix, name, pos = _scan_expr_operand(text, pos + len(trp_start), trp_pn_sprtr)
+            groups[-1].append(make_trp(prefix, name))
+        elif char.isdigit() or char == '.':
+            match = match_number(text, pos)
+            if match is None:
+                raise ValueError('Неверный формат числа в триплетном выражении', text)
+            number = match.group()
+            groups[-1].append(float(number) if number.strip('0123456789') else int(number))
+            pos = match.end()
+        elif char.isalnum() or char == '_':
+            prefix, name, pos = _scan_expr_operand(text, pos, trp_pn_sprtr)
+            groups[-1].append(make_trp(prefix, name, True))
+        elif text[pos:pos + 2] in operators:
+            groups[-1].append(text[pos:pos + 2])
+            pos += 2
+        elif char in operators or char in unary_operators:
+            groups[-1].append(char)
+            pos += 1
+        else:
+            raise ValueError('Недопустимый символ в триплетном выражении', text)
+    if len(groups) != 1:
+        raise ValueError('Не закрыта скобка в триплетном выражении', text)
+    return TrpExpr._shared_trusted(groups[0])
+
+
+def _scan_expr_operand(text: str, pos: int, trp_pn_sprtr: str) -> tuple:
+    """Разбирает префикс и имя триплета-операнда, начинающегося с ``pos``; возвращает их и позицию после имени"""
+    pn = _scan_word(text, pos)
+    name_start = pn + len(trp_pn_sprtr)
+    end = _scan_word(text, name_start)
+    if pn == pos or end == name_start or not text.startswith(trp_pn_sprtr, pn):
+        raise ValueError('Неверный формат триплета в триплетном выражении', text)
+    return text[pos:pn], text[name_start:end], end
+
+
+def _scan_word(text: str, pos: int) -> int:
+    """Возвращает позицию конца последовательности символов ``\\w`` (букв, цифр и ``_``), начинающейся с ``pos``"""
+    length = len(text)
+    while pos < length and (text[pos].isalnum() or text[pos] == '_'):
+        pos += 1
+    return pos
@@ -0,0 +1,471 @@
+# -*- coding: utf-8 -*-
+"""
+Продукционные правила вида ``ЕСЛИ <условия> ТО <действия>;`` и инкрементная машина их применения.
+
+Условия правила, соединённые ``И``:
+
+* ``есть($P.N)`` — в рабочей памяти есть триплет с префиксом ``P`` и именем ``N``;
+* ``нет($P.N)`` — такого триплета нет;
+* ``$P.N=V``, ``$P.N!=V``, ``$P.N<V``, ``$P.N<=V``, ``$P.N>V``, ``$P.N>=V`` — сравнение значения триплета
+  со значением ``V``, записанным как значение триплета (``'строка'``, число); если ``V`` — триплет-ссылка
+  ``$A.B``, то значение сравнивается с текущим значением триплета ``A.B`` рабочей памяти.
+  Триплетные выражения в условиях не допускаются.
+
+Символ начала триплета в условиях можно опускать. Действия — вызовы вида ``ИМЯ(аргумент)``, разделённые
+запятыми, например ``НАЙТИ_В_БД(...)``, ``ДОБАВИТЬ_В_БД(P)``, ``УДАЛИТЬ_В_БД(P)``. Машина не выполняет
+действия сама, а возвращает их пакетом (см. :meth:`RuleEngine.flush`).
+"""
+
+import operator
+import re
+from collections import OrderedDict
+
+from vsptd.vsptd import Trp, TrpStr, TrpExpr
+from vsptd.parse import VSPTDParse, _determine_value
+from vsptd.support import type_name
+
+__all__ = ('ACT_FIND_IN_DB', 'ACT_ADD_IN_DB', 'ACT_DEL_FROM_DB', 'Rule', 'parse_rules', 'RuleEngine')
+
+ACT_FIND_IN_DB = 'НАЙТИ_В_БД'  #: Действие "искать в БД"
+ACT_ADD_IN_DB = 'ДОБАВИТЬ_В_БД'  #: Действие "добавить в БД"
+ACT_DEL_FROM_DB = 'УДАЛИТЬ_В_БД'  #: Действие "удалить из БД"
+
+_PRESENT, _ABSENT = 'есть', 'нет'
+_OPERATORS = {
+    '=': operator.eq, '!=': operator.ne, '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+}
+
+_RE_RULE = re.compile(r'\s*ЕСЛИ\s+(.+?)\s+ТО\s+(.+?)\s*;\s*', re.S)
+_RE_RULE_START = re.compile(r'(?:^|(?<=;))\s*(?=ЕСЛИ\s)')
+_RE_ACTION = re.compile(r'(\w+)\((.*)\)', re.S)
+_RE_COMPARISON = re.compile(r'([^<>=!\s]+)\s*(<=|>=|!=|=|<|>)\s*(.*)', re.S)
+_RE_AND = re.compile(r'\s+[Ии]\s+')
+_RE_COMMA = re.compile(r'\s*,\s*')
+
+
+class Rule:
+    """
+    **Продукционное правило**
+
+    Свойства правила неизменяемы.
+
+    :param str text: текст правила вида ``ЕСЛИ <условия> ТО <действия>;``
+    :param parse_settings: регулярные выражения для разбора строк; по умолчанию используются стандартные
+    :type parse_settings: VSPTDParse, необяз.
+
+    :raises TypeError: если текст не ``str``
+    :raises ValueError: если правило записано неверно
+
+    :Пример работы:
+        >>> rule = Rule("ЕСЛИ есть($A.N) И $P.KWO>=5 ТО НАЙТИ_В_БД($A.N), ДОБАВИТЬ_В_БД(P);")
+        >>> rule.conditions
+        (('есть', 'A', 'N', None), ('>=', 'P', 'KWO', 5))
+        >>> rule.actions
+        (('НАЙТИ_В_БД', '$A.N'), ('ДОБАВИТЬ_В_БД', 'P'))
+    """
+    __slots__ = ('__text', '__conditions', '__actions')
+
+    def __init__(self, text, parse_settings=VSPTDParse()):
+        if not isinstance(text, str):
+            raise TypeError('Правило должно быть str, не ' + type_name(text), text)
+        match = _RE_RULE.fullmatch(text)
+        if match is None:
+            raise ValueError('Неверный формат правила', text)
+        settings = parse_settings._settings
+
+        conditions = []
+        for condition in _split(match.group(1), _RE_AND):
+            condition = _parse_condition(condition, settings)
+            if condition not in conditions:
+                conditions.append(condition)
+
+        actions = []
+        for action in _split(match.group(2), _RE_COMMA):
+            action_match = _RE_ACTION.fullmatch(action)
+            if action_match is None:
+                raise ValueError('Неверный формат действия', action)
+            actions.append((action_match.group(1), action_match.group(2).strip()))
+
+        self.__text = text.strip()
+        self.__conditions = tuple(conditions)
+        self.__actions = tuple(actions)
+
+    @property
+    def text(self) -> str:
+        """Текст правила"""
+        return self.__text
+
+    @property
+    def conditions(self) -> tuple:
+        """Условия — кортежи ``(вид, префикс, имя, значение)``; вид — ``есть``, ``нет`` или оператор сравнения"""
+        return self.__conditions
+
+    @property
+    def actions(self) -> tuple:
+        """Действия — кортежи ``(имя действия, аргумент)``"""
+        return self.__actions
+
+    def __str__(self):
+        return self.__text
+
+    def __repr__(self):
+        return 'Rule({!r})'.format(self.__text)
+
+
+def parse_rules(text, parse_settings=VSPTDParse()) -> list:
+    """
+    Разбирает текст, содержащий несколько правил
+
+    Каждое правило начинается со слова ``ЕСЛИ`` и заканчивается символом ``;``.
+
+    :param str text: текст правил
+    :param parse_settings: регулярные выражения для разбора строк; по умолчанию используются стандартные
+    :type parse_settings: VSPTDParse, необяз.
+    :rtype: list
+
+    :raises ValueError: если правило записано неверно
+
+    :Пример работы:
+        >>> [rule.actions for rule in parse_rules("ЕСЛИ нет($A.N) ТО УДАЛИТЬ_В_БД(A); ЕСЛИ $A.N=1 ТО X(1);")]
+        [(('УДАЛИТЬ_В_БД', 'A'),), (('X', '1'),)]
+    """
+    if not isinstance(text, str):
+        raise TypeError('Текст правил должен быть str, не ' + type_name(text), text)
+    bounds = [match.end() for match in _RE_RULE_START.finditer(text)]
+    if not bounds:
+        if text.strip():
+            raise ValueError('Неверный формат правила', text)
+        return []
+    if text[:bounds[0]].strip():
+        raise ValueError('Неверный формат правила', text[:bounds[0]])
+    bounds.append(len(text))
+    return [Rule(text[start:stop], parse_settings) for start, stop in zip(bounds, bounds[1:])]
+
+
+class _Condition:
+    """
+    Узел сети: условие на триплет ``(префикс, имя)``, общее для всех правил, в которых оно встречается
+
+    Условие сравнения с триплетом-ссылкой зависит также от триплета, на который указывает ссылка;
+    ключи обоих триплетов хранятся в ``keys``.
+    """
+    __slots__ = ('condition', 'key', 'ref', 'keys', 'test', 'satisfied', 'rules')
+
+    def __init__(self, condition):
+        kind, prefix, name, value = condition
+        self.condition = _condition_key(condition)
+        self.key = (prefix, name)
+        self.ref = None
+        if kind == _PRESENT:
+            self.test = _is_present
+        elif kind == _ABSENT:
+            self.test = _is_absent
+        elif isinstance(value, Trp):
+            self.ref = (value.prefix, value.name)
+            self.test = _make_ref_comparison(_OPERATORS[kind])
+        else:
+            self.test = _make_comparison(_OPERATORS[kind], value)
+        self.keys = (self.key,) if self.ref is None or self.ref == self.key else (self.key, self.ref)
+        self.satisfied = False
+        self.rules = []  # правила, использующие условие
+
+    def check(self, get) -> bool:
+        """Проверяет условие; ``get`` возвращает триплет рабочей памяти по ``(префикс, имя)`` или None"""
+        if self.ref is None:
+            return self.test(get(self.key))
+        return self.test(get(self.key), get(self.ref))
+
+
+class _RuleState:
+    """Состояние правила в машине: узлы его условий и количество невыполненных условий"""
+    __slots__ = ('rule', 'conditions', 'unsatisfied')
+
+    def __init__(self, rule, conditions):
+        self.rule = rule
+        self.conditions = conditions
+        self.unsatisfied = sum(not condition.satisfied for condition in conditions)
+
+
+class RuleEngine:
+    """
+    **Инкрементная машина применения правил**
+
+    Условия всех правил объединяются в общую сеть (по аналогии с алгоритмом Rete): одинаковые условия разных
+    правил представлены одним узлом, узлы сгруппированы по ключу ``(префикс, имя)``. При изменении рабочей
+    памяти — триплетной строки — проверяются лишь узлы изменённых триплетов, а для правил хранится
+    количество невыполненных условий, поэтому остальные правила не перепроверяются.
+
+    Правило активируется, когда выполняются все его условия, и снова может быть активировано лишь после того,
+    как перестанет выполняться. Действия активированных правил накапливаются и возвращаются пакетом
+    методом :meth:`flush`; если до этого правило перестало выполняться, его активация отменяется.
+
+    .. warning::
+        Рабочую память следует изменять лишь методами машины (:meth:`add`, :meth:`remove`): изменения триплетов
+        в обход машины не отслеживаются.
+
+    :param rules: правила или их тексты
+    :type rules: Iterable[Rule, str], необяз.
+
+    :Пример работы:
+        >>> engine = RuleEngine([
+        ...     "ЕСЛИ есть($A.N) И $P.KWO>=5 ТО НАЙТИ_В_БД($A.N);",
+        ...     "ЕСЛИ нет($A.N) ТО УДАЛИТЬ_В_БД(P);",
+        ... ])
+        >>> engine.flush()
+        [(Rule('ЕСЛИ нет($A.N) ТО УДАЛИТЬ_В_БД(P);'), 'УДАЛИТЬ_В_БД', 'P')]
+        >>> engine.add(TrpStr(Trp('A', 'N', 1), Trp('P', 'KWO', 7)))
+        >>> engine.flush()
+        [(Rule('ЕСЛИ есть($A.N) И $P.KWO>=5 ТО НАЙТИ_В_БД($A.N);'), 'НАЙТИ_В_БД', '$A.N')]
+    """
+
+    def __init__(self, rules=()):
+        self._memory = TrpStr()
+        self._conditions = {}  # (вид, префикс, имя, значение) — узел
+        self._by_key = {}  # (префикс, имя) — узлы
+        self._states = OrderedDict()  # правило — состояние
+        self._agenda = OrderedDict()  # состояния активированных правил
+        for rule in rules:
+            self.add_rule(rule)
+
+    @property
+    def memory(self) -> TrpStr:
+        """Рабочая память; изменять её следует лишь методами машины"""
+        return self._memory
+
+    @property
+    def rules(self) -> list:
+        """Правила машины"""
+        return list(self._states)
+
+    def add_rule(self, rule) -> Rule:
+        """
+        Добавляет правило; если его условия уже выполняются, оно активируется
+
+        :param rule: правило или его текст
+        :type rule: Rule, str
+        :rtype: Rule
+
+        :raises TypeError: если правило не :class:`Rule` и не ``str``
+        :raises ValueError: если правило не содержит условий
+        """
+        if isinstance(rule, str):
+            rule = Rule(rule)
+        elif not isinstance(rule, Rule):
+            raise TypeError('Должен быть Rule или str, не ' + type_name(rule), rule)
+        if rule in self._states:
+            return rule
+
+        nodes = []
+        for condition in rule.conditions:
+            node = self._conditions.get(_condition_key(condition))
+            if node is None:
+                node = _Condition(condition)
+                self._conditions[node.condition] = node
+                node.satisfied = node.check(self._get)
+                for key in node.keys:
+                    self._by_key.setdefault(key, []).append(node)
+            nodes.append(node)
+
+        state = self._states[rule] = _RuleState(rule, tuple(nodes))
+        for node in nodes:
+            node.rules.append(state)
+        if state.unsatisfied == 0:
+            self._agenda[state] = None
+        return rule
+
+    def remove_rule(self, rule) -> None:
+        """
+        Удаляет правило вместе с его неотправленными активациями
+
+        :raises KeyError: если правила нет в машине
+        """
+        try:
+            state = self._states.pop(rule)
+        except KeyError:
+            raise KeyError('Правила нет в машине', rule)
+        self._agenda.pop(state, None)
+        for node in state.conditions:
+            node.rules.remove(state)
+            if not node.rules:
+                del self._conditions[node.condition]
+                for key in node.keys:
+                    nodes = self._by_key[key]
+                    nodes.remove(node)
+                    if not nodes:
+                        del self._by_key[key]
+
+    def add(self, other) -> None:
+        """
+        Добавляет в рабочую память триплет или триплеты триплетной строки (триплеты с теми же префиксом
+        и именем заменяются) и проверяет условия, зависящие от них
+
+        :param other: триплет или триплетная строка
+        :type other: Trp, TrpStr
+
+        :raises TypeError: если параметр не :class:`Trp` и не :class:`TrpStr`
+        """
+        if isinstance(other, Trp):
+            trps = (other,)
+        elif isinstance(other, TrpStr):
+            trps = tuple(other)
+        else:
+            raise TypeError('Должен быть Trp или TrpStr, не ' + type_name(other), other)
+        self._memory.add(other)
+        by_key = self._by_key
+        for trp in trps:
+            key = (trp.prefix, trp.name)
+            if key in by_key:
+                self._update(by_key[key])
+
+    def remove(self, prefix, name) -> None:
+        """
+        Удаляет из рабочей памяти триплет и проверяет условия, зависящие от него
+
+        :raises KeyError: если по заданным префиксу и имени триплет не найден
+        """
+        self._memory.rem(prefix, name)
+        nodes = self._by_key.get((prefix, name))
+        if nodes is not None:
+            self._update(nodes)
+
+    def flush(self) -> list:
+        """
+        Возвращает действия правил, активированных с момента предыдущего вызова, и очищает их очередь
+
+        :return: кортежи ``(правило, имя действия, аргумент)`` в порядке активации правил
+        :rtype: list
+        """
+        agenda, self._agenda = self._agenda, OrderedDict()
+        return [(state.rule, name, argument) for state in agenda for name, argument in state.rule.actions]
+
+    def pending(self) -> int:
+        """Возвращает количество активированных правил, действия которых ещё не возвращены"""
+        return len(self._agenda)
+
+    def _get(self, key):
+        """Возвращает триплет рабочей памяти по ``(префикс, имя)`` или None"""
+        try:
+            return self._memory._get_by_key(hash(key))
+        except KeyError:
+            return None
+
+    def _update(self, nodes) -> None:
+        """Пересчитывает узлы изменённого триплета и счётчики зависящих от них правил"""
+        agenda = self._agenda
+        get = self._get
+        for node in nodes:
+            satisfied = node.check(get)
+            if satisfied == node.satisfied:
+                continue
+            node.satisfied = satisfied
+            if satisfied:
+                for state in node.rules:
+                    state.unsatisfied -= 1
+                    if state.unsatisfied == 0:
+                        agenda[state] = None
+            else:
+                for state in node.rules:
+                    if state.unsatisfied == 0:
+                        agenda.pop(state, None)
+                    state.unsatisfied += 1
+
+
+def _split(text, separator) -> list:
+    """Разделяет текст по разделителю, не учитывая разделители в кавычках и скобках"""
+    parts = []
+    start = 0
+    for match in separator.finditer(text):
+        if _is_top_level(text, start, match.start()):
+            parts.append(text[start:match.start()].strip())
+            start = match.end()
+    parts.append(text[start:].strip())
+    return parts
+
+
+def _is_top_level(text, start, stop) -> bool:
+    """Проверяет, что фрагмент текста не оставляет открытых кавычек и скобок"""
+    quote = None
+    depth = 0
+    for char in text[start:stop]:
+        if quote is not None:
+            if char == quote:
+                quote = None
+        elif char in '\'"':
+            quote = char
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+    return quote is None and depth == 0
+
+
+def _parse_condition(text, settings) -> tuple:
+    """Разбирает условие правила в кортеж ``(вид, префикс, имя, значение)``"""
+    func, bracket, argument = text.partition('(')
+    func = func.strip().lower()
+    if bracket and func in (_PRESENT, _ABSENT):
+        if not argument.endswith(')'):
+            raise ValueError('Неверный формат условия', text)
+        prefix, name = _parse_ref(argument[:-1].strip(), settings, text)
+        return func, prefix, name, None
+
+    match = _RE_COMPARISON.fullmatch(text)
+    if match is None:
+        raise ValueError('Неверный формат условия', text)
+    prefix, name = _parse_ref(match.group(1), settings, text)
+    value = _determine_value(match.group(3).strip(), settings)
+    if isinstance(value, TrpExpr):
+        raise ValueError('Триплетные выражения в условиях не поддерживаются', text)
+    return match.group(2), prefix, name, value
+
+
+def _parse_ref(text, settings, condition) -> tuple:
+    """Разбирает ссылку на триплет ``$P.N`` или ``P.N``"""
+    if text.startswith(settings.trp_start):
+        text = text[len(settings.trp_start):]
+    prefix, sprtr, name = text.partition(settings.trp_pn_sprtr)
+    if not sprtr or not prefix or not name:
+        raise ValueError('Неверный формат условия', condition)
+    settings.validate_prefix(prefix)
+    settings.validate_name(name)
+    return prefix, name
+
+
+def _is_present(trp) -> bool:
+    return trp is not None
+
+
+def _is_absent(trp) -> bool:
+    return trp is None
+
+
+def _condition_key(condition) -> tuple:
+    """Возвращает хешируемый ключ условия: триплет-ссылка заменяется его префиксом и именем"""
+    kind, prefix, name, value = condition
+    if isinstance(value, Trp):
+        return kind, prefix, name, (Trp, value.prefix, value.name)
+    return condition
+
+
+def _make_comparison(op, value):
+    """Возвращает проверку значения триплета; несравнимые значения условию не удовлетворяют"""
+    def test(trp):
+        if trp is None or trp.value is None:
+            return False
+        try:
+            return bool(op(trp.value, value))
+        except TypeError:
+            return False
+    return test
+
+
+def _make_ref_comparison(op):
+    """Возвращает проверку значения триплета относительно значения триплета, на который указывает ссылка"""
+    def test(trp, ref):
+        if trp is None or ref is None or trp.value is None or ref.value is None:
+            return False
+        try:
+            return bool(op(trp.value, ref.value))
+        except TypeError:
+            return False
+    return test
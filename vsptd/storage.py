@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""
+Хранение таблиц технологических процессов в базе данных SQLite.
+
+Таблица :class:`SQLiteTechProcTable` имеет тот же интерфейс, что и :class:`vsptd.extra.VSPTDTechProcTable`,
+но хранит триплеты не в памяти, а в базе данных (модуль ``sqlite3`` стандартной библиотеки).
+"""
+
+import sqlite3
+from itertools import groupby
+
+from vsptd.vsptd import Trp, TrpStr, TrpExpr, _trp_record
+from vsptd.extra import VSPTDTechProcTable
+from vsptd.binary import dumps, loads
+from vsptd.support import type_name
+
+__all__ = ('SQLiteTechProcTable',)
+
+# виды значений
+_NONE, _STR, _INT, _BIGINT, _FLOAT, _TRP, _EXPR = range(7)
+
+# границы целых чисел, хранимых SQLite как INTEGER
+_INT_MIN, _INT_MAX = -(1 << 63), (1 << 63) - 1
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS triplets (
+    record INTEGER NOT NULL,
+    pos INTEGER NOT NULL,
+    prefix TEXT NOT NULL,
+    name TEXT,
+    kind INTEGER NOT NULL,
+    value,
+    comment TEXT,
+    bid INTEGER NOT NULL,
+    special INTEGER NOT NULL,
+    PRIMARY KEY (record, pos)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS triplets_value ON triplets (prefix, name, value);
+'''
+
+_SELECT = '''
+SELECT records.key, prefix, name, kind, value, comment, bid, special
+FROM records JOIN triplets ON triplets.record = records.id
+'''
+
+
+class SQLiteTechProcTable(VSPTDTechProcTable):
+    """
+    **Таблица технологических процессов, хранимая в базе данных SQLite**
+
+    Триплеты хранятся нормализованно: строка таблицы ``records`` на каждый первичный ключ и строка таблицы
+    ``triplets`` на каждый триплет (префикс, имя, вид и значение, комментарий, заявка, "особенность").
+    Триплеты-ссылки и триплетные выражения хранятся в двоичном формате :mod:`vsptd.binary`.
+    Поиск по первичному ключу и по значению триплета (:meth:`lookup`) выполняется запросами SQL.
+
+    .. note::
+        * триплетные строки создаются при каждом обращении, поэтому их изменение не сохраняется в базе;
+          для сохранения следует повторно добавить строку методом :meth:`add`;
+        * вторичные индексы не требуются: значения всех триплетов проиндексированы базой данных.
+
+    :param `*trp_strs`: триплетные строки :class:`TrpStr`
+    :param database: путь к файлу базы данных или открытое соединение ``sqlite3``; по умолчанию
+        база данных в памяти
+    :type database: str, sqlite3.Connection, необяз.
+
+    :raises TypeError: если параметры не :class:`TrpStr`
+
+    :Пример работы:
+        >>> table = SQLiteTechProcTable(
+        ...     TrpStr(Trp('A', 'N', 1), Trp('P', 'N', 1), Trp('P', 'KWO', 5), Trp('Q', 'DI', 1)),
+        ... )
+        >>> print(table['000100100501'])
+        $A.N=1; $P.N=1; $P.KWO=5; $Q.DI=1;
+        >>> table.lookup_keys('P', 'KWO', 5)
+        ['000100100501']
+        >>> table.close()
+    """
+
+    def __init__(self, *trp_strs, database=':memory:'):
+        if isinstance(database, sqlite3.Connection):
+            self._connection = database
+        else:
+            self._connection = sqlite3.connect(database)
+        self._connection.executescript(_SCHEMA)
+        self.extend(trp_strs)
+
+    def close(self) -> None:
+        """Закрывает соединение с базой данных"""
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def add(self, trp_str):
+        """Добавляет триплексную строку; строка с тем же первичным ключом заменяется, сохраняя свою позицию"""
+        self.extend((trp_str,))
+
+    def extend(self, trp_strs) -> None:
+        """
+        Добавляет триплексные строки одной транзакцией; триплеты записываются пакетно (``executemany``)
+
+        :param trp_strs: триплетные строки
+        :type trp_strs: Iterable[TrpStr]
+
+        :raises TypeError: если строка не :class:`TrpStr`
+        """
+        rows = {}  # идентификатор записи — строки таблицы triplets; повторный ключ заменяет прежнюю строку
+        with self._connection as connection:
+            for trp_str in trp_strs:
+                if not isinstance(trp_str, TrpStr):
+                    raise TypeError('Должен быть TrpStr, не ' + type_name(trp_str), trp_str)
+                record_id = self._record_id(connection, self.calc_primary_key(trp_str))
+                rows[record_id] = [
+                    (record_id, pos, *_encode_record(record))
+                    for pos, record in enumerate(map(_trp_record, trp_str))
+                ]
+            connection.executemany(
+                'INSERT INTO triplets VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (row for record_rows in rows.values() for row in record_rows)
+            )
+
+    @staticmethod
+    def _record_id(connection, key) -> int:
+        """Возвращает идентификатор записи с ключом ``key``, создавая её или удаляя её прежние триплеты"""
+        row = connection.execute('SELECT id FROM records WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return connection.execute('INSERT INTO records (key) VALUES (?)', (key,)).lastrowid
+        connection.execute('DELETE FROM triplets WHERE record = ?', row)
+        return row[0]
+
+    def to_records(self) -> list:
+        """
+        Возвращает триплеты всех строк таблицы списком кортежей
+        ``(первичный ключ, префикс, имя, значение, комментарий, заявка, особенность)``
+
+        См. :meth:`VSPTDTechProcTable.to_records`.
+
+        :rtype: list
+        """
+        return [
+            (key, prefix, name, _decode_value(kind, value), comment, bool(bid), bool(special))
+            for key, prefix, name, kind, value, comment, bid, special in self._select('', ())
+        ]
+
+    @classmethod
+    def from_records(cls, records, database=':memory:'):
+        """
+        Создаёт таблицу из кортежей, возвращённых :meth:`to_records`, без валидации
+
+        Первичные ключи не вычисляются заново; все триплеты записываются одной транзакцией.
+
+        :param records: кортежи ``(первичный ключ, префикс, имя, значение, комментарий, заявка, особенность)``
+        :type records: Iterable[tuple]
+        :param database: см. :class:`SQLiteTechProcTable`
+        :rtype: SQLiteTechProcTable
+        """
+        table = cls(database=database)
+        record_ids = {}
+        positions = {}
+        rows = []
+        with table._connection as connection:
+            for key, *record in records:
+                try:
+                    record_id = record_ids[key]
+                except KeyError:
+                    record_id = record_ids[key] = table._record_id(connection, key)
+                    positions[record_id] = 0
+                rows.append((record_id, positions[record_id], *_encode_record(record)))
+                positions[record_id] += 1
+            connection.executemany('INSERT INTO triplets VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        return table
+
+    def create_index(self, prefix, name) -> None:
+        """Ничего не делает: значения всех триплетов проиндексированы базой данных"""
+
+    def drop_index(self, prefix, name) -> None:
+        """Ничего не делает. См. :meth:`create_index`"""
+
+    def indexes(self) -> list:
+        """Возвращает пустой список. См. :meth:`create_index`"""
+        return []
+
+    def lookup_keys(self, prefix, name, value) -> list:
+        """
+        Возвращает первичные ключи строк, в которых триплет имеет заданное значение; поиск выполняется запросом SQL
+
+        :param str prefix: префикс
+        :param str name: имя
+        :param value: значение триплета
+        :rtype: list
+        """
+        condition, params = _value_condition(prefix, name, value)
+        return [
+            key for key, in self._connection.execute(
+                'SELECT DISTINCT records.key FROM records JOIN triplets ON triplets.record = records.id'
+                ' WHERE ' + condition + ' ORDER BY records.id',
+                params
+            )
+        ]
+
+    def lookup(self, prefix, name, value) -> list:
+        """
+        Возвращает строки, в которых триплет имеет заданное значение; поиск выполняется запросом SQL
+
+        :rtype: list
+        """
+        condition, params = _value_condition(prefix, name, value)
+        return [
+            trp_str for _, trp_str in self._group(self._select(
+                'WHERE records.id IN (SELECT record FROM triplets WHERE ' + condition + ')', params
+            ))
+        ]
+
+    def _select(self, where, params):
+        """Выбирает триплеты записей в порядке их следования"""
+        return self._connection.execute(_SELECT + where + ' ORDER BY records.id, pos', params)
+
+    @staticmethod
+    def _group(rows):
+        """Собирает триплетные строки из выбранных триплетов; возвращает пары ``(первичный ключ, строка)``"""
+        from_records = TrpStr.from_records
+        for key, group in groupby(rows, key=lambda row: row[0]):
+            yield key, from_records(
+                (prefix, name, _decode_value(kind, value), comment, bool(bid), bool(special))
+                for _, prefix, name, kind, value, comment, bid, special in group
+            )
+
+    def __contains__(self, key):
+        return self._connection.execute('SELECT 1 FROM records WHERE key = ?', (key,)).fetchone() is not None
+
+    def __getitem__(self, key):
+        """Возвращает по первичному ключу триплексную строку"""
+        for _, trp_str in self._group(self._select('WHERE records.key = ?', (key,))):
+            return trp_str
+        raise KeyError(key)
+
+    def __delitem__(self, key):
+        """Удаляет по первичному ключу триплексную строку"""
+        with self._connection as connection:
+            row = connection.execute('SELECT id FROM records WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                raise KeyError(key)
+            connection.execute('DELETE FROM triplets WHERE record = ?', row)
+            connection.execute('DELETE FROM records WHERE id = ?', row)
+
+    def __iter__(self):
+        yield from self._group(self._select('', ()))
+
+    def __len__(self):
+        return self._connection.execute('SELECT COUNT(*) FROM records').fetchone()[0]
+
+    def __repr__(self):
+        return 'SQLiteTechProcTable(' + ', '.join('{0!r}'.format(trp_str) for _, trp_str in self) + ')'
+
+
+def _encode_value(value) -> tuple:
+    """Возвращает вид и хранимое в базе представление значения триплета"""
+    if value is None:
+        return _NONE, None
+    if isinstance(value, str):
+        return _STR, value
+    if isinstance(value, int) and not isinstance(value, bool):
+        if _INT_MIN <= value <= _INT_MAX:
+            return _INT, value
+        return _BIGINT, str(value)
+    if isinstance(value, float):
+        return _FLOAT, value
+    if isinstance(value, Trp):
+        return _TRP, dumps(value)
+    if isinstance(value, TrpExpr):
+        return _EXPR, dumps(value)
+    raise TypeError('Значение должно быть str, int, float, Trp, TrpExpr, не ' + type_name(value), value)
+
+
+def _encode_record(record) -> tuple:
+    """Преобразует кортеж параметров триплета в строку таблицы ``triplets`` (без записи и позиции)"""
+    prefix, name, value, comment, bid, special = record
+    return (prefix, name, *_encode_value(value), comment, int(bid), int(special))
+
+
+def _decode_value(kind, value):
+    """Восстанавливает значение триплета по его виду и хранимому представлению"""
+    if kind == _BIGINT:
+        return int(value)
+    if kind == _TRP:
+        trp = loads(value)
+        return Trp._target_trusted(trp.prefix, trp.name, trp.special)
+    if kind == _EXPR:
+        return loads(value)
+    return value
+
+
+def _value_condition(prefix, name, value) -> tuple:
+    """Возвращает условие SQL на значение триплета и его параметры; числа сравниваются, как в Python"""
+    if isinstance(value, float) and value.is_integer():
+        # целое значение float может совпадать с большим целым, хранимым как текст
+        value = int(value)
+    kind, stored = _encode_value(value)
+    if kind == _NONE:
+        return 'prefix = ? AND name IS ? AND value IS NULL', (prefix, name)
+    if kind in (_INT, _FLOAT):
+        # как и в Python, 1 == 1.0
+        return 'prefix = ? AND name IS ? AND value = ? AND kind IN (?, ?)', (prefix, name, stored, _INT, _FLOAT)
+    if kind == _BIGINT:
+        try:
+            as_float = float(value)
+        except OverflowError:
+            as_float = None
+        if as_float == value:
+            return (
+                'prefix = ? AND name IS ? AND (value = ? AND kind = ? OR value = ? AND kind = ?)',
+                (prefix, name, stored, _BIGINT, as_float, _FLOAT)
+            )
+    return 'prefix = ? AND name IS ? AND value = ? AND kind = ?', (prefix, name, stored, kind)
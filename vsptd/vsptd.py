@@ -4,12 +4,20 @@
 Также содержит функционал для настройки параметров ВСПТД.
 """
 
+import operator
 import re
 from collections import OrderedDict
+from sys import intern
+from weakref import WeakValueDictionary
+
+try:
+    import numpy
+except ImportError:  # NumPy — необязательная зависимость, нужна лишь для пакетного вычисления выражений
+    numpy = None
 
 from vsptd.support import type_name
 
-__all__ = ('VSPTDSettings', 'Trp', 'TrpStr', 'TrpExpr')
+__all__ = ('VSPTDSettings', 'Trp', 'TrpStr', 'TrpExpr', 'TrpExprEvaluator', 'TrpExprMemo')
 
 
 class VSPTDSettings:
@@ -44,6 +52,9 @@ class VSPTDSettings:
     prefix_min = 1  #: Мин. длина префикса триплета
     prefix_max = 32  #: Макс. длина префикса триплета
     prefix_regexp = r'[A-Z]+\d*'  #: Формат префикса триплета (RegExp)
+    #: Формат префикса для определения семейства префиксов (RegExp): первая группа — основа семейства,
+    #: например, ``E`` для ``E``, ``E1``, ``E2``. Используется при нестрогом поиске по префиксу
+    prefix_family_regexp = r'([A-Z]+)\d*'
     prefix_types = (str,)  #: Типы данных префикса триплета
 
     name_min = 1  #: Мин. длина имени триплета
@@ -62,14 +73,69 @@ class VSPTDSettings:
     comment_regexp = None  #: Формат комментария триплета (RegExp)
     comment_types = (str,)  #: Типы данных комментария триплета
 
+    #: Параметры валидации для каждого параметра триплета: (мин. длина, макс. длина, RegExp, типы, название)
+    _validation_params = {
+        'prefix': ('prefix_min', 'prefix_max', 'prefix_regexp', 'prefix_types', 'префикса'),
+        'name': ('name_min', 'name_max', 'name_regexp', 'name_types', 'имени'),
+        'value': ('value_str_min', 'value_str_max', 'value_str_regexp', 'value_types', 'значения'),
+        'comment': ('comment_min', 'comment_max', 'comment_regexp', 'comment_types', 'комментария'),
+    }
+    #: Названия скомпилированных функций (валидаторов и ``prefix_family``) и кортежа ``text_format``
+    #: с символами текстового представления (хранятся в экземпляре)
+    _compiled = ('validate_prefix', 'validate_name', 'validate_value', 'validate_comment', 'prefix_family',
+                 'text_format')
+
     def __repr__(self):
         return '<{}>'.format(VSPTDSettings.__name__)
 
+    def __setattr__(self, attr, value):
+        object.__setattr__(self, attr, value)
+        self._reset()
+
+    def __getattr__(self, attr):
+        # вызывается лишь при отсутствии атрибута: функции компилируются при первом обращении
+        if attr in VSPTDSettings._compiled:
+            self._compile()
+            return self.__dict__[attr]
+        raise AttributeError(attr)
+
+    def __getstate__(self):
+        # скомпилированные функции не сериализуются
+        return {attr: value for attr, value in self.__dict__.items() if attr not in VSPTDSettings._compiled}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+    def _reset(self) -> None:
+        """Сбрасывает скомпилированные функции; они будут заново скомпилированы при следующем обращении"""
+        for attr in VSPTDSettings._compiled:
+            self.__dict__.pop(attr, None)
+
+    def _compile(self) -> None:
+        """Компилирует валидаторы параметров триплета, ``prefix_family`` и ``text_format`` по текущим настройкам"""
+        for param, (min_, max_, regexp, types, param_name) in VSPTDSettings._validation_params.items():
+            self.__dict__['validate_' + param] = _compile_validator(
+                getattr(self, min_), getattr(self, max_), getattr(self, regexp), getattr(self, types), param_name
+            )
+        self.__dict__['prefix_family'] = _compile_prefix_family(self.prefix_family_regexp)
+        # новый кортеж создаётся при любом изменении настроек, поэтому его идентичность
+        # служит признаком актуальности кэшированного текстового представления
+        self.__dict__['text_format'] = (
+            self.bid, self.trp_start, self.trp_pn_sprtr, self.trp_nv_sprtr,
+            self.trp_val_str_isltr, self.trp_comment_isltr, self.trp_end, self.trps_sprtr,
+        )
+
     def validate(self, prefix=None, name=None, value=None, comment=None) -> None:
         """
         Проверяет корректность параметра триплета. В случае ошибки вызывает исключение
 
-        .. note:: Проверить можно лишь один параметр за раз. Необходимо всегда указывать имя параметра функции.
+        .. note::
+            * Проверить можно лишь один параметр за раз. Необходимо всегда указывать имя параметра функции.
+            * Для каждого параметра доступен также отдельный скомпилированный валидатор:
+              ``validate_prefix``, ``validate_name``, ``validate_value``, ``validate_comment``.
+              Валидаторы компилируются при первом обращении и сбрасываются при изменении настроек.
+            * Аналогично компилируется функция ``prefix_family(prefix)``, возвращающая основу семейства
+              префикса согласно ``prefix_family_regexp``.
 
         :param prefix: префикс триплета
         :param name: имя триплета
@@ -77,46 +143,15 @@ class VSPTDSettings:
         :param comment: комментарий триплета
         """
         if prefix is not None:
-            trp_param, min_, max_, regexp, types, param_name = \
-                prefix, self.prefix_min, self.prefix_max, self.prefix_regexp, self.prefix_types, 'префикса'
+            self.validate_prefix(prefix)
         elif name is not None:
-            trp_param, min_, max_, regexp, types, param_name = \
-                name, self.name_min, self.name_max, self.name_regexp, self.name_types, 'имени'
+            self.validate_name(name)
         elif value is not None:
-            trp_param, min_, max_, regexp, types, param_name = \
-                value, self.value_str_min, self.value_str_max, self.value_str_regexp, self.value_types, 'значения'
+            self.validate_value(value)
         elif comment is not None:
-            trp_param, min_, max_, regexp, types, param_name = \
-                comment, self.comment_min, self.comment_max, self.comment_regexp, self.comment_types, 'комментария'
-        else:
-            # эта ветка нужна, так как параметры триплета могут принимать значение None,
-            # отсюда есть возможность валидация параметров без предварительной проверки на None
-            return
-
-        msg_err_type = 'Типом {0} может быть {1}, не {2}'
-        msg_err_len = 'Длина {0} должна быть от {1} до {2}, не {3}'
-        msg_err_regexp = 'Формат {0} некорректен'
-
-        if not isinstance(trp_param, types):
-            types_names = ', '.join(map(lambda x: x.__name__, types))
-            raise TypeError(
-                msg_err_type.format(param_name, types_names, type_name(trp_param)),
-                trp_param
-            )
-        if not isinstance(trp_param, str):
-            # прекратить проверку, если объект не является строкой
-            return
-
-        if not (min_ <= len(trp_param) <= max_):
-            raise ValueError(
-                msg_err_len.format(param_name, min_, max_, len(trp_param)),
-                trp_param
-            )
-        if (isinstance(regexp, str) or hasattr(regexp, 'pattern')) and re.fullmatch(regexp, trp_param) is None:
-            raise ValueError(
-                msg_err_regexp.format(param_name),
-                trp_param
-            )
+            self.validate_comment(comment)
+        # иначе ничего не проверяется, так как параметры триплета могут принимать значение None,
+        # отсюда есть возможность валидация параметров без предварительной проверки на None
 
     def to_dict(self) -> dict:
         """
@@ -130,7 +165,7 @@ class VSPTDSettings:
             if not attr.startswith('_') and not callable(value)
         }
         # берём свойства экземпляра класса
-        result.update(self.__dict__)
+        result.update(self.__getstate__())
         return result
 
     def from_dict(self, settings: dict) -> None:
@@ -142,6 +177,75 @@ class VSPTDSettings:
         :param dict settings: настройки
         """
         self.__dict__.update(settings)
+        self._reset()
+
+
+def _compile_validator(min_, max_, regexp, types, param_name):
+    """
+    Создаёт функцию проверки параметра триплета с заранее вычисленными ограничениями
+
+    :param int min_: мин. длина строки
+    :param int max_: макс. длина строки
+    :param regexp: формат строки (RegExp): ``str``, скомпилированное выражение или None
+    :param tuple types: допустимые типы
+    :param str param_name: название параметра для сообщений об ошибках
+    """
+    if isinstance(regexp, str):
+        fullmatch = re.compile(regexp).fullmatch
+    elif hasattr(regexp, 'pattern'):
+        fullmatch = regexp.fullmatch
+    else:
+        fullmatch = None
+    types_names = ', '.join(map(lambda x: x.__name__, types))
+
+    def validate(trp_param):
+        if trp_param is None:
+            return
+        if not isinstance(trp_param, types):
+            raise TypeError(
+                'Типом {0} может быть {1}, не {2}'.format(param_name, types_names, type_name(trp_param)),
+                trp_param
+            )
+        if not isinstance(trp_param, str):
+            # прекратить проверку, если объект не является строкой
+            return
+        if not (min_ <= len(trp_param) <= max_):
+            raise ValueError(
+                'Длина {0} должна быть от {1} до {2}, не {3}'.format(param_name, min_, max_, len(trp_param)),
+                trp_param
+            )
+        if fullmatch is not None and fullmatch(trp_param) is None:
+            raise ValueError('Формат {0} некорректен'.format(param_name), trp_param)
+    return validate
+
+
+def _compile_prefix_family(regexp):
+    """
+    Создаёт функцию, возвращающую основу семейства префикса
+
+    Результат запоминается для каждого префикса, поэтому выражение выполняется один раз на префикс.
+    Если префикс не соответствует формату, он сам считается основой своего семейства.
+
+    :param regexp: формат префикса (RegExp): ``str`` или скомпилированное выражение;
+        первая группа (при её наличии) — основа семейства
+    """
+    pattern = re.compile(regexp) if isinstance(regexp, str) else regexp
+    fullmatch = pattern.fullmatch
+    group = 1 if pattern.groups else 0
+    cache = {}
+
+    def prefix_family(prefix):
+        try:
+            return cache[prefix]
+        except KeyError:
+            pass
+        match = fullmatch(prefix)
+        family = prefix if match is None else match.group(group)
+        if len(cache) >= 4096:
+            cache.clear()
+        cache[prefix] = family
+        return family
+    return prefix_family
 
 
 class Trp:
@@ -191,19 +295,23 @@ class Trp:
     #: `Свойство класса.` Настройки конфигурации ВСПТД :class:`VSPTDSettings`; по умолчанию используются стандартные
     settings = VSPTDSettings()
 
-    __slots__ = ('__prefix', '__name', '__value', '__comment', '__bid', '__special')
+    # __text — кэшированное текстовое представление; действительно, если __text_format —
+    # текущий settings.text_format (None — кэш сброшен, False — триплет ещё создаётся)
+    __slots__ = ('__prefix', '__name', '__value', '__comment', '__bid', '__special', '__text', '__text_format')
 
     def __init__(self, prefix: str, name=None, value=None, comment=None, bid=False, special=False):
-        self.settings.validate(prefix=prefix)
-        self.__prefix = prefix
+        self.settings.validate_prefix(prefix)
+        self.__prefix = _intern(prefix)
         if name == '':
             name = None
         else:
-            self.settings.validate(name=name)
-        self.__name = name
+            self.settings.validate_name(name)
+        self.__name = _intern(name)
 
         # установка свойств value, comment, special, bind выполняется
         # таким образом с целью их валидации через setter'ы
+        self.__text = None
+        self.__text_format = False
         self.__value = None
         self.value = value
         self.__comment = None
@@ -212,6 +320,90 @@ class Trp:
         self.bid = bid
         self.__special = False
         self.special = special
+        self.__text_format = None
+
+    @classmethod
+    def from_trusted(cls, prefix: str, name=None, value=None, comment=None, bid=False, special=False):
+        """
+        Создаёт триплет без валидации параметров
+
+        Предназначен для заведомо корректных данных (например, полученных от парсера или из базы данных).
+
+        .. warning::
+            Параметры не проверяются и не приводятся: пустые имя и комментарий должны быть переданы как ``None``.
+
+        :rtype: Trp
+
+        :Пример работы:
+            >>> Trp.from_trusted('A', 'B', 'C')
+            Trp(prefix='A', name='B', value='C')
+        """
+        trp = cls.__new__(cls)
+        trp.__prefix = _intern(prefix)
+        trp.__name = _intern(name)
+        trp.__value = value
+        trp.__comment = comment
+        trp.__bid = bid
+        trp.__special = special
+        trp.__text = None
+        trp.__text_format = None
+        return trp
+
+    def to_record(self) -> tuple:
+        """
+        Возвращает параметры триплета кортежем ``(префикс, имя, значение, комментарий, заявка, особенность)``
+
+        Обратная операция — :meth:`from_trusted`.
+
+        :rtype: tuple
+
+        :Пример работы:
+            >>> Trp('A', 'B', 'C', 'D').to_record()
+            ('A', 'B', 'C', 'D', False, False)
+        """
+        return _trp_record(self)
+
+    @classmethod
+    def target(cls, prefix: str, name=None, special=False):
+        """
+        Возвращает общий неизменяемый триплет-цель
+
+        Для каждой комбинации параметров создаётся лишь один экземпляр, который разделяется всеми
+        использующими его триплетами и триплетными выражениями. Изменение его свойств
+        ``value``, ``comment``, ``bid``, ``special`` вызывает ``AttributeError``.
+        Параметры проверяются при каждом вызове по текущим настройкам, даже если экземпляр уже создан.
+        Экземпляры хранятся, пока на них есть ссылки.
+
+        :param str prefix: префикс триплета
+        :param name: имя триплета
+        :type name: str, необяз.
+        :param bool special: "особенность" триплета
+        :rtype: Trp
+
+        :raises TypeError: если параметры не соответствующих типов
+        :raises ValueError: если параметры не удовлетворяют соответствующим требованиям
+
+        :Пример работы:
+            >>> Trp.target('C', 'D') is Trp.target('C', 'D')
+            True
+            >>> print(Trp('A', 'B', Trp.target('C', 'D')))
+            $A.B=$C.D;
+        """
+        cls.settings.validate_prefix(prefix)
+        if name == '':
+            name = None
+        else:
+            cls.settings.validate_name(name)
+        return cls._target_trusted(prefix, name, special)
+
+    @staticmethod
+    def _target_trusted(prefix: str, name=None, special=False):
+        """Возвращает общий неизменяемый триплет-цель без валидации параметров. См. :meth:`target`"""
+        key = (prefix, name, special)
+        target = _targets.get(key)
+        if target is None:
+            target = _targets[key] = _TrpTarget.from_trusted(prefix, name, special=special)
+        return target
 
     @property
     def prefix(self):
@@ -240,8 +432,9 @@ class Trp:
                 value
             )
         else:
-            self.settings.validate(value=value)
+            self.settings.validate_value(value)
         self.__value = value
+        self._changed()
 
     @property
     def comment(self):
@@ -253,8 +446,9 @@ class Trp:
         if value == '':
             value = None
         else:
-            self.settings.validate(comment=value)
+            self.settings.validate_comment(value)
         self.__comment = value
+        self._changed()
 
     @property
     def bid(self):
@@ -266,6 +460,7 @@ class Trp:
         if not isinstance(value, bool):
             raise TypeError('Параметр заявки должен быть bool, не ' + type_name(value), value)
         self.__bid = value
+        self._changed()
 
     @property
     def special(self):
@@ -277,6 +472,16 @@ class Trp:
         if not isinstance(value, bool):
             raise TypeError('Параметр special должен быть bool, не ' + type_name(value), value)
         self.__special = value
+        self._changed()
+
+    def _changed(self) -> None:
+        """Сбрасывает кэшированное текстовое представление триплета и триплетных строк"""
+        if self.__text_format is False:
+            # триплет ещё создаётся и не может входить в триплетные строки
+            return
+        self.__text_format = None
+        global _trp_version
+        _trp_version += 1
 
     def __add__(self, other):
         if isinstance(other, Trp):
@@ -287,34 +492,35 @@ class Trp:
             raise TypeError('Должен быть Trp или TrpStr, не ' + type_name(other), other)
 
     def __str__(self):
-        bid = self.settings.bid
-        trp_start = self.settings.trp_start
-        trp_pn_sprtr = self.settings.trp_pn_sprtr
-        trp_nv_sprtr = self.settings.trp_nv_sprtr
-        trp_str_isltr = self.settings.trp_val_str_isltr
-        trp_comment_isltr = self.settings.trp_comment_isltr
-        trp_end = self.settings.trp_end
-
-        result = ''
-        if not self.special:
-            result += trp_start
-        result += self.prefix + trp_pn_sprtr
-        if self.name is not None:
-            result += self.name
-        if self.value is None and not self.bid:
+        text_format = self.settings.text_format
+        if self.__text_format is text_format:
+            return self.__text
+        bid, trp_start, trp_pn_sprtr, trp_nv_sprtr, trp_str_isltr, trp_comment_isltr, trp_end, _ = text_format
+
+        value = self.__value
+        result = [trp_start] if not self.__special else []
+        result += self.__prefix, trp_pn_sprtr
+        if self.__name is not None:
+            result.append(self.__name)
+        if value is not None or self.__bid:
             # если не указано значение триплета и это не заявка, то считаем, что это триплет-цель
-            return result
-        result += trp_nv_sprtr
-        if self.bid:
-            result += bid
-        if self.value is not None:
-            if isinstance(self.value, str):
-                result += trp_str_isltr + self.value + trp_str_isltr
-            else:
-                result += str(self.value)
-        if self.comment is not None and self.comment != '':
-            result += trp_comment_isltr + self.comment + trp_comment_isltr
-        result += trp_end
+            result.append(trp_nv_sprtr)
+            if self.__bid:
+                result.append(bid)
+            if value is not None:
+                if isinstance(value, str):
+                    result += trp_str_isltr, value, trp_str_isltr
+                else:
+                    result.append(str(value))
+            if self.__comment is not None and self.__comment != '':
+                result += trp_comment_isltr, self.__comment, trp_comment_isltr
+            result.append(trp_end)
+        result = ''.join(result)
+
+        # представление изменяемых значений (триплетов, кроме общих триплетов-целей, и выражений) не кэшируется
+        if not isinstance(value, (Trp, TrpExpr)) or type(value) is _TrpTarget:
+            self.__text = result
+            self.__text_format = text_format
         return result
 
     def __repr__(self):
@@ -334,6 +540,8 @@ class Trp:
 
     def __eq__(self, other):
         # учитывается также комментарий, special, bid
+        if self is other:
+            return True
         return isinstance(other, Trp) and \
                 self.prefix == other.prefix and \
                 self.name == other.name and \
@@ -353,12 +561,213 @@ class Trp:
         yield 'special', self.special
 
 
+def _intern(value):
+    """Интернирует строку; прочие объекты возвращает без изменений"""
+    return intern(value) if type(value) is str else value
+
+
+# параметры триплета кортежем (см. Trp.to_record); читаются напрямую из слотов, минуя свойства
+_trp_record = operator.attrgetter(
+    '_Trp__prefix', '_Trp__name', '_Trp__value', '_Trp__comment', '_Trp__bid', '_Trp__special'
+)
+_trp_value = operator.attrgetter('_Trp__value')
+
+
+def _frozen_setter(self, value):
+    raise AttributeError('Общий триплет-цель неизменяем', self)
+
+
+class _TrpTarget(Trp):
+    """
+    Общий неизменяемый триплет-цель (приспособленец). См. :meth:`Trp.target`
+    """
+    __slots__ = ('__weakref__',)
+
+    value = property(Trp.value.fget, _frozen_setter, doc=Trp.value.__doc__)
+    comment = property(Trp.comment.fget, _frozen_setter, doc=Trp.comment.__doc__)
+    bid = property(Trp.bid.fget, _frozen_setter, doc=Trp.bid.__doc__)
+    special = property(Trp.special.fget, _frozen_setter, doc=Trp.special.__doc__)
+
+    def __reduce__(self):
+        # при десериализации возвращается общий экземпляр
+        return Trp._target_trusted, (self.prefix, self.name, self.special)
+
+
+# общие триплеты-цели: (префикс, имя, "особенность") — триплет; неиспользуемые удаляются сборщиком мусора
+_targets = WeakValueDictionary()
+
+_trp_version = 0  # счётчик изменений триплетов; при изменении сбрасываются кэши текста триплетных строк
+_expr_version = 0  # счётчик изменений триплетных выражений (их items)
+
+
+def _versions() -> tuple:
+    """Возвращает счётчики изменений триплетов и триплетных выражений"""
+    return _trp_version, _expr_version
+
+
+def _index_add(index, group, key):
+    # добавляет ключ триплета в группу индекса TrpStr (группа — упорядоченный словарь ключей)
+    keys = index.get(group)
+    if keys is None:
+        keys = index[group] = {}
+    keys[key] = None
+
+
+def _index_remove(index, group, key):
+    # удаляет ключ триплета из группы индекса TrpStr; пустые группы удаляются
+    keys = index[group]
+    del keys[key]
+    if not keys:
+        del index[group]
+
+
+class _TrpStrData:
+    """
+    Хранилище триплетов :class:`TrpStr` вместе с индексами
+
+    Индексы по префиксам, семействам префиксов и список ключей строятся при первом обращении
+    и далее поддерживаются при каждом изменении, поэтому создание триплетной строки (например, при разборе)
+    не тратит время на индексы, которые могут не понадобиться.
+
+    Хранилище может разделяться несколькими триплетными строками. Разделяемое хранилище (``shared``)
+    не изменяется: перед изменением триплетная строка получает собственную копию (см. :meth:`TrpStr._writable`).
+    Все изменения выполняются через методы хранилища, чтобы индексы оставались согласованными.
+    """
+    __slots__ = (
+        'trps', 'prefixes', 'families', 'family_rule', 'order', 'offsets', 'holes', 'shared', 'text', 'version'
+    )
+
+    def __init__(self):
+        self.trps = OrderedDict()  # ключ hash((префикс, имя)) — триплет
+        self.prefixes = None  # префикс — ключи триплетов в порядке следования
+        self.families = None  # основа семейства префиксов — ключи триплетов в порядке следования
+        self.family_rule = None  # функция, по которой построен индекс семейств
+        self.order = None  # ключи триплетов в порядке следования; удалённые заменяются на None ("дыры")
+        self.offsets = None  # ключ — позиция в order
+        self.holes = 0  # количество "дыр" в order
+        self.shared = False
+        self.text = None  # кэш текста: (text_format триплетов, text_format строки, _trp_version, текст)
+        self.version = 0  # счётчик изменений состава хранилища
+
+    def clone(self):
+        """Возвращает неразделяемую копию хранилища (сами триплеты не копируются)"""
+        result = _TrpStrData()
+        result.trps = self.trps.copy()
+        result.text = self.text
+        if self.prefixes is not None:
+            result.prefixes = {prefix: keys.copy() for prefix, keys in self.prefixes.items()}
+            result.families = {family: keys.copy() for family, keys in self.families.items()}
+            result.family_rule = self.family_rule
+        if self.order is not None:
+            result.order = self.keys_order().copy()
+        return result
+
+    def store(self, key, trp) -> None:
+        """Добавляет триплет по ключу ``hash((prefix, name))`` или заменяет существующий, сохраняя его позицию"""
+        trps = self.trps
+        self.text = None
+        self.version += 1
+        if key not in trps:
+            if self.prefixes is not None:
+                _index_add(self.prefixes, trp.prefix, key)
+                _index_add(self.families, self.family_rule(trp.prefix), key)
+            if self.order is not None:
+                if self.offsets is not None:
+                    self.offsets[key] = len(self.order)
+                self.order.append(key)
+        trps[key] = trp
+
+    def discard(self, key) -> None:
+        """Удаляет триплет по ключу ``hash((prefix, name))``"""
+        trp = self.trps.pop(key)
+        self.text = None
+        self.version += 1
+        if self.prefixes is not None:
+            _index_remove(self.prefixes, trp.prefix, key)
+            _index_remove(self.families, self.family_rule(trp.prefix), key)
+        if self.order is not None:
+            # на месте ключа остаётся "дыра"; список уплотняется, когда "дыр" становится больше половины
+            self.order[self.positions().pop(key)] = None
+            self.holes += 1
+            if self.holes > 32 and self.holes * 2 > len(self.order):
+                self.keys_order()
+
+    def discard_at(self, index) -> None:
+        """
+        Удаляет триплет по позиции
+
+        Как и при удалении по ключу, на месте ключа остаётся «дыра», поэтому позиции остальных ключей
+        не пересчитываются; список уплотняется перед следующим доступом по позиции.
+
+        :raises IndexError: если по позиции триплета не существует
+        """
+        order = self.keys_order()
+        key = order[index]
+        trp = self.trps.pop(key)
+        self.text = None
+        self.version += 1
+        if self.prefixes is not None:
+            _index_remove(self.prefixes, trp.prefix, key)
+            _index_remove(self.families, self.family_rule(trp.prefix), key)
+        order[index] = None
+        self.holes += 1
+        if self.offsets is not None:
+            del self.offsets[key]
+
+    def keys_order(self) -> list:
+        """Возвращает ключи триплетов в порядке следования, предварительно уплотнив список при наличии «дыр»"""
+        # уплотнение не меняет содержимого, поэтому допустимо и для разделяемого хранилища
+        if self.order is None:
+            self.order = list(self.trps)
+        elif self.holes:
+            self.order = [key for key in self.order if key is not None]
+            self.offsets = None
+            self.holes = 0
+        return self.order
+
+    def positions(self) -> dict:
+        """Возвращает позиции ключей в списке ключей, при необходимости перестраивая их"""
+        if self.offsets is None:
+            order = self.order if self.order is not None else self.keys_order()
+            self.offsets = {key: i for i, key in enumerate(order) if key is not None}
+        return self.offsets
+
+    def reorder(self, trps) -> None:
+        """Заменяет содержимое хранилища теми же триплетами в другом порядке"""
+        self.trps = trps
+        self.text = None
+        self.version += 1
+        self.order = None
+        self.offsets = None
+        self.holes = 0
+        self.prefixes = self.families = None
+
+    def indexed(self, family_rule):
+        """
+        Возвращает хранилище, предварительно построив индексы по префиксам и семействам префиксов,
+        если они ещё не построены или построены по другим настройкам
+        """
+        # построение индексов не меняет содержимого, поэтому допустимо и для разделяемого хранилища
+        if self.prefixes is None or family_rule is not self.family_rule:
+            prefixes = self.prefixes = {}
+            families = self.families = {}
+            self.family_rule = family_rule
+            for key, trp in self.trps.items():
+                _index_add(prefixes, trp.prefix, key)
+                _index_add(families, family_rule(trp.prefix), key)
+        return self
+
+
 class TrpStr:
     """
     **Триплетная строка**
 
     .. note::
-        Триплетная строка упорядочена. Новые триплеты добавляются в конец, старые обновляются и сохраняют свои позиции.
+        * Триплетная строка упорядочена. Новые триплеты добавляются в конец, старые обновляются
+          и сохраняют свои позиции.
+        * Выборка по префиксу, срез и сложение возвращают представления, разделяющие хранилище
+          с исходными триплетными строками. Хранилище копируется лишь при изменении одной из сторон
+          (копирование при записи). Сами триплеты, как и прежде, не копируются.
 
     :param `*trps`: триплеты :class:`Trp`
     :raises TypeError: если параметры не :class:`Trp`
@@ -366,29 +775,160 @@ class TrpStr:
         >>> TrpStr(Trp('A', 'B', 'C'))
         TrpStr(Trp(prefix='A', name='B', value='C'))
     """
-    __slots__ = ('__trps',)
+    # __data — хранилище _TrpStrData или None, если триплетная строка — ещё не материализованное представление;
+    # __view — части представления: кортежи (хранилище или триплет, ключи или None — все ключи хранилища)
+    __slots__ = ('__data', '__view')
 
     #: `Свойство класса.` Настройки конфигурации ВСПТД :class:`VSPTDSettings`; по умолчанию используются стандартные
     settings = VSPTDSettings()
 
     def __init__(self, *trps):
-        def check_type(trp):
+        self.__data = data = _TrpStrData()
+        self.__view = None
+        for trp in trps:
             # для проверки, все ли аргументы — триплеты
-            if isinstance(trp, Trp):
-                return True
-            else:
+            if not isinstance(trp, Trp):
                 raise TypeError('Должен быть Trp, не ' + type_name(trp), trp)
-        self.__trps = OrderedDict({hash((trp.prefix, trp.name)): trp for trp in trps if check_type(trp)})
+            data.store(hash((trp.prefix, trp.name)), trp)
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Создаёт триплетную строку из кортежей параметров триплетов без валидации
+
+        Предназначен для заведомо корректных данных (например, полученных от парсера или из базы данных).
+        См. :meth:`Trp.from_trusted`.
+
+        :param records: кортежи ``(префикс, имя, значение, комментарий, заявка, особенность)``;
+            последние параметры можно опускать
+        :type records: Iterable[tuple]
+        :rtype: TrpStr
+
+        :Пример работы:
+            >>> TrpStr.from_records([('A', 'B', 'C'), ('D', 'E', 1, 'F')])
+            TrpStr(Trp(prefix='A', name='B', value='C'), Trp(prefix='D', name='E', value=1, comment='F'))
+        """
+        result = cls()
+        # хранилище новой строки ещё не имеет индексов, поэтому триплеты записываются в него напрямую
+        trps = result.__data.trps
+        from_trusted = Trp.from_trusted
+        for record in records:
+            trps[hash((record[0], record[1] if len(record) > 1 else None))] = from_trusted(*record)
+        return result
+
+    def to_records(self) -> list:
+        """
+        Возвращает параметры триплетов списком кортежей ``(префикс, имя, значение, комментарий, заявка, особенность)``
+
+        Обратная операция — :meth:`from_records`.
+
+        :rtype: list
+
+        :Пример работы:
+            >>> TrpStr(Trp('A', 'B', 'C'), Trp('D', 'E', 1, 'F')).to_records()
+            [('A', 'B', 'C', None, False, False), ('D', 'E', 1, 'F', False, False)]
+        """
+        return list(map(_trp_record, self))
+
+    @staticmethod
+    def _from_parts(parts):
+        """Создаёт представление из частей (см. :meth:`_parts`); хранилище собирается при первом обращении"""
+        result = TrpStr.__new__(TrpStr)
+        result.__data = None
+        result.__view = parts
+        return result
+
+    def _parts(self) -> tuple:
+        """Возвращает части, из которых состоит триплетная строка; хранилище при этом становится разделяемым"""
+        data = self.__data
+        if data is None:
+            return self.__view
+        if not data.trps:
+            return ()
+        data.shared = True
+        return (data, None),
+
+    def _single_part(self):
+        """
+        Для представления, состоящего из части одного хранилища, возвращает ``(триплеты, ключи или None)``,
+        иначе None. Такие представления читаются без сборки собственного хранилища
+        """
+        view = self.__view
+        if self.__data is None and len(view) == 1 and isinstance(view[0][0], _TrpStrData):
+            return view[0][0].trps, view[0][1]
+        return None
+
+    def _data(self):
+        """Возвращает хранилище для чтения, при необходимости собирая его из частей представления"""
+        data = self.__data
+        if data is not None:
+            return data
+
+        parts = self.__view
+        source, keys = parts[0] if parts else (None, None)
+        if isinstance(source, _TrpStrData) and keys is None:
+            data = source.clone()
+            parts = parts[1:]
+        else:
+            data = _TrpStrData()
+        store = data.store
+        for source, keys in parts:
+            if isinstance(source, Trp):
+                store(hash((source.prefix, source.name)), source)
+            elif keys is None:
+                for key, trp in source.trps.items():
+                    store(key, trp)
+            else:
+                trps = source.trps
+                for key in keys:
+                    store(key, trps[key])
+        self.__data = data
+        self.__view = None
+        return data
+
+    def _writable(self):
+        """Возвращает хранилище для изменения; разделяемое хранилище предварительно копируется"""
+        data = self._data()
+        if data.shared:
+            data = self.__data = data.clone()
+        return data
+
+    def _keys_by_prefix(self, prefix, strict):
+        """Возвращает ключи триплетов по префиксу (``strict=True``) или по семейству префиксов"""
+        data = self._data().indexed(self.settings.prefix_family)
+        return (data.prefixes if strict else data.families).get(prefix, ())
+
+    def __reduce__(self):
+        # хранилище содержит скомпилированные функции, поэтому сериализуются лишь триплеты
+        return TrpStr, tuple(self)
 
     def __str__(self):
-        trps_sprtr = self.settings.trps_sprtr
-        return trps_sprtr.join(str(trp) for trp in self)
+        # текст кэшируется в хранилище и сбрасывается при изменении строки, её триплетов или настроек
+        trp_format = Trp.settings.text_format
+        text_format = self.settings.text_format
+        data = self.__data
+        if data is not None:
+            cached = data.text
+            if cached is not None and cached[0] is trp_format and cached[1] is text_format \
+                    and cached[2] == _trp_version:
+                return cached[3]
+
+        version = _trp_version
+        result = text_format[-1].join([str(trp) for trp in self])
+        # изменение триплетного выражения не отслеживается, поэтому строки с выражениями не кэшируются
+        if data is not None and not any(isinstance(trp.value, TrpExpr) for trp in data.trps.values()):
+            data.text = (trp_format, text_format, version, result)
+        return result
 
     def __repr__(self):
         return 'TrpStr({})'.format(', '.join(repr(trp) for trp in self))
 
     def __len__(self):
-        return len(self.__trps)
+        part = self._single_part()
+        if part is not None:
+            trps, keys = part
+            return len(trps if keys is None else keys)
+        return len(self._data().trps)
 
     def __bool__(self):
         # приведение к типу bool
@@ -405,18 +945,22 @@ class TrpStr:
             return self.getpr(key)
         # триплет по индексу
         elif isinstance(key, int):
-            if key >= 0:
-                sequence = enumerate(self.__trps.values())
-            else:
-                sequence = enumerate(reversed(self.__trps.values()))
-                key = abs(key) - 1
+            part = self._single_part()
             try:
-                return next(v for i, v in sequence if i == key)
-            except StopIteration:
+                if part is not None and part[1] is not None:
+                    return part[0][part[1][key]]
+                data = self._data()
+                return data.trps[data.keys_order()[key]]
+            except IndexError:
                 raise IndexError('Про принятому индексу не существует триплета', key)
         # трипл. строка по срезу
         elif isinstance(key, slice):
-            return TrpStr(*tuple(self)[key])
+            part = self._single_part()
+            if part is not None and part[1] is not None:
+                return TrpStr._from_parts(((self.__view[0][0], part[1][key]),))
+            data = self._data()
+            data.shared = True
+            return TrpStr._from_parts(((data, tuple(data.keys_order()[key])),))
         else:
             raise KeyError('Неверный формат ключа', key)
 
@@ -429,22 +973,15 @@ class TrpStr:
             self.rempr(key)
         # триплет по индексу
         elif isinstance(key, int):
-            if key >= 0:
-                sequence = enumerate(self.__trps)
-            else:
-                sequence = enumerate(reversed(self.__trps))
-                key = abs(key) - 1
-            for i, hash_ in sequence:
-                if i == key:
-                    del self.__trps[hash_]
-                    return
-                elif i > key:
-                    break
-            raise IndexError('Про принятому индексу не существует триплета', key)
+            try:
+                self._writable().discard_at(key)
+            except IndexError:
+                raise IndexError('Про принятому индексу не существует триплета', key)
         # триплеты по срезу
         elif isinstance(key, slice):
-            for hash_ in tuple(self.__trps.keys())[key]:
-                del self.__trps[hash_]
+            data = self._writable()
+            for hash_ in data.keys_order()[key]:
+                data.discard(hash_)
         else:
             raise KeyError('Неверный формат ключа', key)
 
@@ -462,45 +999,45 @@ class TrpStr:
         """
         # префикс
         if isinstance(item, str):
-            self.settings.validate(prefix=item)
-            for trp in self:
-                if trp.prefix == item:
-                    return True
-            return False
+            self.settings.validate_prefix(item)
+            return item in self._data().indexed(self.settings.prefix_family).prefixes
         # (префикс, имя)
         elif isinstance(item, (tuple, list)):
             prefix, name = item
-            self.settings.validate(prefix=prefix)
-            self.settings.validate(name=name)
-            return hash((prefix, name)) in self.__trps
+            self.settings.validate_prefix(prefix)
+            self.settings.validate_name(name)
+            return hash((prefix, name)) in self._data().trps
         else:
             raise TypeError('Должен быть str, tuple, list, не ' + type_name(item), item)
 
     def __eq__(self, other):
         # не учитывает порядок триплетов
-        return isinstance(other, TrpStr) and \
-               len(self) == len(other) and \
-               all(trp == other.__trps.get(hash_) for hash_, trp in self.__trps.items())
+        if not isinstance(other, TrpStr) or len(self) != len(other):
+            return False
+        other_trps = other._data().trps
+        return all(trp == other_trps.get(hash_) for hash_, trp in self._data().trps.items())
 
     def __add__(self, other):
         if isinstance(other, Trp):
-            result = TrpStr()
-            result.__trps.update(self.__trps)
-            result.__trps.update({hash((other.prefix, other.name)): other})
-            return result
+            return TrpStr._from_parts(self._parts() + ((other, None),))
         elif isinstance(other, TrpStr):
-            result = TrpStr()
-            result.__trps.update(self.__trps)
-            result.__trps.update(other.__trps)
-            return result
+            return TrpStr._from_parts(self._parts() + other._parts())
         else:
             raise TypeError('Должен быть Trp или TrpStr, не ' + type_name(other), other)
 
     def __iter__(self):
-        yield from self.__trps.values()
+        part = self._single_part()
+        if part is None:
+            yield from self._data().trps.values()
+        elif part[1] is None:
+            yield from part[0].values()
+        else:
+            trps = part[0]
+            for key in part[1]:
+                yield trps[key]
 
     def __reversed__(self):
-        yield from reversed(self.__trps.values())
+        yield from reversed(self._data().trps.values())
 
     def add(self, other) -> None:
         """
@@ -519,9 +1056,12 @@ class TrpStr:
             >>> my_trp_str.add(Trp('D', 'E', 'F'))
         """
         if isinstance(other, Trp):
-            self.__trps.update({hash((other.prefix, other.name)): other})
+            self._writable().store(hash((other.prefix, other.name)), other)
         elif isinstance(other, TrpStr):
-            self.__trps.update(other.__trps)
+            trps = tuple(other._data().trps.items())
+            store = self._writable().store
+            for hash_, trp in trps:
+                store(hash_, trp)
         else:
             raise TypeError('Должен быть Trp или TrpStr, не ' + type_name(other), other)
 
@@ -538,10 +1078,14 @@ class TrpStr:
         if not isinstance(trp, Trp):
             raise TypeError('Должен быть Trp, не ' + type_name(trp), trp)
 
-        try:
-            return next(i for i, trp_ in enumerate(self.__trps.values()) if trp_ == trp)
-        except StopIteration:
+        # равные триплеты имеют одинаковые префикс и имя, поэтому достаточно проверить один триплет
+        data = self._data()
+        hash_ = hash((trp.prefix, trp.name))
+        trp_ = data.trps.get(hash_)
+        if trp_ is None or trp_ != trp:
             raise ValueError('Триплет не найден в триплетной строке', trp)
+        data.keys_order()  # позиции считаются без учёта "дыр"
+        return data.positions()[hash_]
 
     def get(self, prefix: str, name):
         """
@@ -557,41 +1101,72 @@ class TrpStr:
         :raises ValueError: если префикс/имя не удовлетворяет соответствующим требованиям
         :raises KeyError: если по заданным префиксу и имени триплет не найден
         """
-        self.settings.validate(prefix=prefix)
-        self.settings.validate(name=name)
+        self.settings.validate_prefix(prefix)
+        self.settings.validate_name(name)
 
         try:
-            return self.__trps[hash((prefix, name))]
+            return self._data().trps[hash((prefix, name))]
         except KeyError:
             raise KeyError('По заданным префиксу и имени триплет не найден', (prefix, name))
 
+    def _get_by_key(self, key):
+        """
+        Возвращает триплет по заранее вычисленному ключу ``hash((prefix, name))`` без валидации
+
+        Используется во внутренней работе пакета (например, в :class:`TrpExprEvaluator`).
+
+        :raises KeyError: если по ключу триплет не найден
+        """
+        return (self.__data or self._data()).trps[key]
+
+    def _trps(self):
+        """
+        Возвращает триплеты по ключам ``hash((prefix, name))`` — только для чтения
+
+        Используется во внутренней работе пакета (например, в :class:`vsptd.extra.BidPlan`).
+        """
+        return (self.__data or self._data()).trps
+
+    def _revision(self) -> tuple:
+        """
+        Возвращает хранилище и счётчик изменений его состава; пока они не изменились, строка содержит
+        те же триплеты в том же порядке (см. :class:`vsptd.extra.FormulaGraph`)
+        """
+        data = self.__data or self._data()
+        return data, data.version
+
     def getpr(self, prefix: str, strict=True):
         """
         Возвращает из триплетной строки триплеты по заданному префиксу
 
-        Эквивалентно ``<TrpStr>[prefix]``
+        Эквивалентно ``<TrpStr>[prefix]``. Возвращается представление, разделяющее хранилище с исходной строкой.
 
         :param str prefix: префикс
-        :param bool strict: использовать строгий поиск (не включает префиксы вида E, E1, E2 и т.д.), True по умолчанию
+        :param bool strict: использовать строгий поиск (не включает префиксы вида E, E1, E2 и т.д.), True по умолчанию.
+            Семейство префиксов определяется настройкой ``prefix_family_regexp``
         :rtype: TrpStr
 
         :raises TypeError: если префикс не является ``str``
         :raises ValueError: префикс не удовлетворяет соответствующим требованиям
         :raises KeyError: если по заданному префиксу триплетов не найдено
         """
-        self.settings.validate(prefix=prefix)
+        self.settings.validate_prefix(prefix)
 
-        result = TrpStr()
-        if strict:
-            result.__trps.update({hash_: trp for hash_, trp in self.__trps.items() if trp.prefix == prefix})
-        else:
-            pattern = r'^([A-Z]+)(\d*)$'
-            result.__trps.update({hash_: trp for hash_, trp in self.__trps.items()
-                                  if re.findall(pattern, trp.prefix)[0][0] == prefix})
-        if len(result.__trps) == 0:
+        result = self._getpr_trusted(prefix, strict)
+        if result is None:
             raise KeyError('По заданному префиксу триплетов не найдено', prefix)
         return result
 
+    def _getpr_trusted(self, prefix, strict=True):
+        """Возвращает представление с триплетами по префиксу без валидации (None, если их нет). См. :meth:`getpr`"""
+        keys = self._keys_by_prefix(prefix, strict)
+        if not keys:
+            return None
+
+        data = self.__data
+        data.shared = True
+        return TrpStr._from_parts(((data, tuple(keys)),))
+
     def rem(self, prefix: str, name) -> None:
         """
         Удаляет из триплетной строки триплет по заданным префиксу и имени
@@ -605,13 +1180,13 @@ class TrpStr:
         :raises ValueError: если префикс/имя не удовлетворяет соответствующим требованиям
         :raises KeyError: если по заданным префиксу и имени триплет не найден
         """
-        self.settings.validate(prefix=prefix)
-        self.settings.validate(name=name)
+        self.settings.validate_prefix(prefix)
+        self.settings.validate_name(name)
 
-        try:
-            del self.__trps[hash((prefix, name))]
-        except KeyError:
+        hash_ = hash((prefix, name))
+        if hash_ not in self._data().trps:
             raise KeyError('По заданным префиксу и имени триплет не найден', (prefix, name))
+        self._writable().discard(hash_)
 
     def rempr(self, prefix: str, strict=True) -> None:
         """
@@ -620,31 +1195,28 @@ class TrpStr:
         Эквивалентно ``del <TrpStr>[prefix]``
 
         :param str prefix: префикс
-        :param bool strict: использовать строгий поиск (не включает префиксы вида E, E1, E2 и т.д.), True по умолчанию
+        :param bool strict: использовать строгий поиск (не включает префиксы вида E, E1, E2 и т.д.), True по умолчанию.
+            Семейство префиксов определяется настройкой ``prefix_family_regexp``
 
         :raises TypeError: если префикс не является ``str``
         :raises ValueError: префикс не удовлетворяет соответствующим требованиям
         :raises KeyError: если по заданному префиксу триплетов не найдено
         """
-        self.settings.validate(prefix=prefix)
+        self.settings.validate_prefix(prefix)
 
-        count = len(self.__trps)
-        if strict:
-            for hash_ in tuple(hash_ for hash_, trp in self.__trps.items() if trp.prefix == prefix):
-                del self.__trps[hash_]
-        else:
-            pattern = r'^([A-Z]+)(\d*)$'  # паттерн для префикса; WARN: опасно, если изменится вид префикса
-            for hash_ in tuple(hash_ for hash_, trp in self.__trps.items()
-                               if re.findall(pattern, trp.prefix)[0][0] == prefix):
-                del self.__trps[hash_]
-        if count == len(self.__trps):
+        keys = tuple(self._keys_by_prefix(prefix, strict))
+        if not keys:
             raise KeyError('По заданному префиксу триплетов не найдено', prefix)
+        data = self._writable()
+        for hash_ in keys:
+            data.discard(hash_)
 
     def sort(self) -> None:
         """
         Сортирует триплетную строку в лексиграфическом порядке по префиксу и имени триплетов
         """
-        self.__trps = OrderedDict(sorted(self.__trps.items(), key=lambda item: (item[1].prefix, item[1].name)))
+        data = self._writable()
+        data.reorder(OrderedDict(sorted(data.trps.items(), key=lambda item: (item[1].prefix, item[1].name))))
 
 
 class TrpExpr:
@@ -653,7 +1225,8 @@ class TrpExpr:
 
     .. note::
         * операторы должны быть в виде строк ``str``;
-        * используемые триплеты должны быть триплетами-целями.
+        * используемые триплеты должны быть триплетами-целями;
+        * вложенное триплетное выражение вычисляется и записывается как выражение в скобках.
 
     :param `*items`: параметры
     :type `*items`: str, int, float, bool, Trp
@@ -668,12 +1241,23 @@ class TrpExpr:
         >>> print(Trp('E', 'F', expr))
         $E.F=$A.B*$C.D;
     """
-    __slots__ = ('items',)
+    __slots__ = ('__items', '__evaluator')
 
     #: `Свойство класса.` Настройки конфигурации ВСПТД :class:`VSPTDSettings`; по умолчанию используются стандартные
     settings = VSPTDSettings()
 
     def __init__(self, *items):
+        self.__evaluator = None
+        self.items = items
+
+    @property
+    def items(self):
+        """Операнды и операторы в триплетном выражении"""
+        return self.__items
+
+    @items.setter
+    def items(self, items):
+        items = tuple(items)
         for item in items:
             if isinstance(item, Trp):
                 if item.value is not None:
@@ -683,53 +1267,555 @@ class TrpExpr:
                     'Элемент должен быть str, int, float, Trp, TrpExpr, не ' + type_name(item),
                     item
                 )
-        self.items = items  #: Операнды и операторы в триплетном выражении
+        self.__items = items
+        self.__evaluator = None
+        global _expr_version
+        _expr_version += 1
+
+    @staticmethod
+    def _shared_trusted(items):
+        """
+        Создаёт общее неизменяемое триплетное выражение без валидации элементов
+
+        Используется при разборе строк (см. :func:`vsptd.parse.parse_trp_expr`): одно выражение
+        разделяется всеми триплетами с одинаковой записью формулы. Изменение ``items`` вызывает ``AttributeError``.
+        """
+        expr = object.__new__(_TrpExprShared)
+        expr.__items = tuple(items)
+        expr.__evaluator = None
+        return expr
 
     def __str__(self):
         items_trp_expr_sprtr = TrpExpr.settings.trp_expr_items_sprtr
-        return items_trp_expr_sprtr.join(str(item) for item in self.items)
+        return items_trp_expr_sprtr.join(
+            '(' + str(item) + ')' if isinstance(item, TrpExpr) else str(item) for item in self.items
+        )
 
     def __repr__(self):
         return 'TrpExpr({})'.format(', '.join(repr(item) for item in self.items))
 
-    def calculate(self, source=None, special_source=None):
+    def compile(self):
+        """
+        Возвращает скомпилированный вычислитель выражения :class:`TrpExprEvaluator`
+
+        Вычислитель кэшируется и пересоздаётся только после изменения ``items``
+        у самого выражения или у вложенных в него выражений.
+
+        :rtype: TrpExprEvaluator
+
+        :raises ValueError: если выражение записано неверно или содержит недопустимый оператор
+
+        :Пример работы:
+            >>> evaluator = TrpExpr(Trp('A', 'B'), '*', Trp('C', 'D')).compile()
+            >>> evaluator(TrpStr(Trp('A', 'B', 21), Trp('C', 'D', 2)))
+            42
+        """
+        evaluator = self.__evaluator
+        if evaluator is None or not evaluator.is_actual():
+            evaluator = TrpExprEvaluator(self)
+            self.__evaluator = evaluator
+        return evaluator
+
+    def calculate(self, source=None, special_source=None, memo=None):
         """
         Вычисляет выражение
 
-        .. warning::
-            В текущей версии для вычисления выражения используется ``eval``,
-            что потенциально опасно.
+        Эквивалентно ``<TrpExpr>.compile()(source, special_source, memo)``.
 
         :param source: триплетная строка, откуда будут браться значения
         :type source: TrpStr, необяз.
         :param special_source: триплетная строка, откуда будут браться значения,
             соответствующие "специальным" триплетам
         :type special_source: TrpStr, необяз.
+        :param memo: кэш результатов вычисления (см. :class:`TrpExprMemo`); по умолчанию не используется
+        :type memo: TrpExprMemo, необяз.
 
         :return: результат вычисления выражения
 
+        :raises ValueError: если выражение записано неверно или содержит недопустимый оператор
+        :raises KeyError: если в триплетной строке не найден триплет-операнд
+
         :Пример работы:
             >>> expr = TrpExpr(Trp('A', 'B'), '*', Trp('C', 'D'))
             >>> trp_str = TrpStr(Trp('A', 'B', 21), Trp('C', 'D', 2))
             >>> expr.calculate(trp_str)
             42
         """
-        result = []
-        for item in self.items:
+        return self.compile()(source, special_source, memo)
+
+    def calculate_many(self, sources, special_source=None):
+        """
+        Вычисляет выражение для каждой триплетной строки из ``sources``
+
+        Эквивалентно ``<TrpExpr>.compile().calculate_many(sources, special_source)``.
+        См. :meth:`TrpExprEvaluator.calculate_many`.
+
+        .. note:: Требуется NumPy.
+
+        :param sources: триплетные строки, откуда будут браться значения
+        :type sources: Iterable[TrpStr]
+        :param special_source: триплетная строка, откуда будут браться значения,
+            соответствующие "специальным" триплетам
+        :type special_source: TrpStr, необяз.
+        :rtype: numpy.ma.MaskedArray
+        """
+        return self.compile().calculate_many(sources, special_source)
+
+
+def _frozen_items_setter(self, items):
+    raise AttributeError('Общее триплетное выражение неизменяемо', self)
+
+
+class _TrpExprShared(TrpExpr):
+    """
+    Общее неизменяемое триплетное выражение. См. :meth:`TrpExpr._shared_trusted`
+    """
+    __slots__ = ()
+
+    items = property(TrpExpr.items.fget, _frozen_items_setter, doc=TrpExpr.items.__doc__)
+
+    def __reduce__(self):
+        return TrpExpr._shared_trusted, (self.items,)
+
+
+def _chain_compare(funcs, operands):
+    """Цепочка сравнений вида ``a < b <= c``, аналогичная принятой в Python"""
+    def chain_compare(values):
+        left = operands[0](values)
+        for func, operand in zip(funcs, operands[1:]):
+            right = operand(values)
+            result = func(left, right)
+            if not result:
+                return result
+            left = right
+        return result
+    return chain_compare
+
+
+class TrpExprEvaluator:
+    """
+    **Скомпилированный вычислитель триплетного выражения**
+
+    Создаётся методом :meth:`TrpExpr.compile`. При компиляции выражение (вместе с вложенными выражениями)
+    разбирается по приоритетам операторов, константные подвыражения вычисляются заранее,
+    а для триплетов-операндов заранее вычисляются ключи поиска в триплетной строке.
+    При вызове не производится ни построение строк, ни ``eval``.
+
+    .. note::
+        * допустимы только операторы из :attr:`operators` и :attr:`unary_operators`, а также скобки;
+        * приоритет и ассоциативность операторов совпадают с принятыми в Python;
+        * изменение "особенности" триплетов-операндов после компиляции не учитывается.
+
+    :param TrpExpr expr: триплетное выражение
+
+    :raises ValueError: если выражение записано неверно или содержит недопустимый оператор
+
+    :Пример работы:
+        >>> evaluator = TrpExprEvaluator(TrpExpr(Trp('A', 'B'), '+', 2, '*', 3))
+        >>> evaluator(TrpStr(Trp('A', 'B', 1)))
+        7
+    """
+    #: Бинарные операторы: оператор — (функция, приоритет)
+    operators = {
+        '==': (operator.eq, 1),
+        '!=': (operator.ne, 1),
+        '<': (operator.lt, 1),
+        '<=': (operator.le, 1),
+        '>': (operator.gt, 1),
+        '>=': (operator.ge, 1),
+        '+': (operator.add, 2),
+        '-': (operator.sub, 2),
+        '*': (operator.mul, 3),
+        '/': (operator.truediv, 3),
+        '//': (operator.floordiv, 3),
+        '%': (operator.mod, 3),
+        '**': (operator.pow, 5),
+    }
+    #: Унарные операторы
+    unary_operators = {
+        '+': operator.pos,
+        '-': operator.neg,
+    }
+    _unary_priority = 4
+    _compare_priority = 1
+    _right_assoc = ('**',)
+
+    _re_token = re.compile(
+        r'\s*(?:'
+        r'(\d+(?:\.\d*)?(?:[eE][-+]?\d+)?|\.\d+(?:[eE][-+]?\d+)?)|'  # число
+        r'(\*\*|//|==|!=|<=|>=|[-+*/%<>()])'  # оператор или скобка
+        r')'
+    )
+
+    __slots__ = ('expr', 'operands', '_deps', '_tree', '_func')
+
+    def __init__(self, expr):
+        if not isinstance(expr, TrpExpr):
+            raise TypeError('Должен быть TrpExpr, не ' + type_name(expr), expr)
+        self.expr = expr  #: Исходное триплетное выражение
+        #: Триплеты-операнды: кортежи (ключ, "особенность", префикс, имя)
+        self.operands = ()
+        self._deps = []
+        operands = {}
+        tokens = self._tokenize(expr, operands)
+        self.operands = tuple(sorted(operands, key=operands.get))
+        self._deps = tuple(self._deps)
+
+        self._tree, pos = self._parse(tokens, 0, 0)
+        if pos != len(tokens):
+            raise ValueError('Неверный формат триплетного выражения', str(expr))
+        self._func = self._build(self._tree)
+
+    def __repr__(self):
+        return '<{}: {}>'.format(TrpExprEvaluator.__name__, self.expr)
+
+    def __call__(self, source=None, special_source=None, memo=None):
+        """
+        Вычисляет выражение
+
+        :param source: триплетная строка, откуда будут браться значения
+        :type source: TrpStr, необяз.
+        :param special_source: триплетная строка, откуда будут браться значения,
+            соответствующие "специальным" триплетам
+        :type special_source: TrpStr, необяз.
+        :param memo: кэш результатов вычисления (см. :class:`TrpExprMemo`); по умолчанию не используется
+        :type memo: TrpExprMemo, необяз.
+
+        :return: результат вычисления выражения
+        """
+        if memo is None:
+            return self._func(self.fetch(source, special_source))
+        return memo.evaluate(self, self.fetch(source, special_source))
+
+    def evaluate(self, values):
+        """
+        Вычисляет выражение по заранее собранным значениям триплетов-операндов
+
+        :param values: значения в порядке :attr:`operands` (см. :meth:`fetch`)
+        :type values: Sequence
+        :return: результат вычисления выражения
+        """
+        return self._func(values)
+
+    def fetch(self, source=None, special_source=None) -> list:
+        """
+        Возвращает значения триплетов-операндов в порядке :attr:`operands`
+
+        :raises KeyError: если в триплетной строке не найден триплет-операнд
+        """
+        values = []
+        for key, special, prefix, name in self.operands:
+            try:
+                values.append((special_source if special else source)._get_by_key(key).value)
+            except KeyError:
+                raise KeyError('По заданным префиксу и имени триплет не найден', (prefix, name))
+        return values
+
+    def calculate_many(self, sources, special_source=None):
+        """
+        Вычисляет выражение сразу для множества триплетных строк
+
+        Значения каждого триплета-операнда собираются в столбец (массив NumPy),
+        после чего выражение вычисляется один раз над столбцами.
+        Строки, в которых отсутствует триплет-операнд или его значение равно ``None``, маскируются.
+
+        Результаты совпадают с :meth:`__call__`: целочисленные столбцы хранятся как объекты Python
+        (без переполнения), а если при вычислении над столбцами возникла ошибка (деление на ноль,
+        переполнение и т.п.), выражение вычисляется построчно, и строки с ошибкой маскируются.
+
+        .. note::
+            * требуется NumPy;
+            * значения "особенных" триплетов берутся из ``special_source`` и одинаковы для всех строк;
+            * для таблицы :class:`vsptd.extra.VSPTDTechProcTable` можно передать
+              ``(trp_str for _, trp_str in table)``.
+
+        :param sources: триплетные строки, откуда будут браться значения
+        :type sources: Iterable[TrpStr]
+        :param special_source: триплетная строка, откуда будут браться значения,
+            соответствующие "специальным" триплетам
+        :type special_source: TrpStr, необяз.
+        :return: результаты вычисления; маска равна ``True`` для строк, где не хватает значений
+        :rtype: numpy.ma.MaskedArray
+
+        :raises ImportError: если не установлен NumPy
+        :raises KeyError: если в ``special_source`` не найден "особенный" триплет-операнд
+
+        :Пример работы:
+            >>> evaluator = TrpExpr(Trp('A', 'B'), '*', 2).compile()
+            >>> evaluator.calculate_many([TrpStr(Trp('A', 'B', 1)), TrpStr(), TrpStr(Trp('A', 'B', 3))]).tolist()
+            [2, None, 6]
+        """
+        if numpy is None:
+            raise ImportError('Для пакетного вычисления выражений необходим NumPy')
+
+        sources = tuple(sources)
+        mask = numpy.zeros(len(sources), dtype=bool)
+        columns = []
+        rows = []  # значения операндов: столбцы-списки или значения "особенных" триплетов
+        for key, special, prefix, name in self.operands:
+            if special:
+                try:
+                    value = special_source._get_by_key(key).value
+                except KeyError:
+                    raise KeyError('По заданным префиксу и имени триплет не найден', (prefix, name))
+                columns.append(value)
+                rows.append(value)
+                continue
+
+            column = []
+            for i, source in enumerate(sources):
+                try:
+                    value = source._get_by_key(key).value
+                except KeyError:
+                    value = None
+                if value is None:
+                    mask[i] = True
+                    value = 1  # заполнитель маскированной строки, не вызывающий деления на ноль
+                column.append(value)
+            rows.append(column)
+            array = numpy.array(column)
+            if array.dtype.kind != 'f':
+                # целые числа — объекты Python, чтобы избежать переполнения
+                array = numpy.array(column, dtype=object)
+            columns.append(array)
+
+        try:
+            with numpy.errstate(all='raise'):
+                result = self._calculate_columns(self._tree, columns)
+        except (ArithmeticError, TypeError, ValueError):
+            result = self._calculate_rows(rows, mask)
+        result = numpy.broadcast_to(result, mask.shape) if numpy.ndim(result) == 0 else result
+        return numpy.ma.masked_array(result, mask=mask)
+
+    def _calculate_rows(self, rows, mask):
+        """Построчное вычисление; строки, при вычислении которых возникла ошибка, добавляются в маску"""
+        specials = [not isinstance(row, list) for row in rows]
+        results = []
+        for i in range(len(mask)):
+            if mask[i]:
+                results.append(0)
+                continue
+            try:
+                results.append(self._func([row if special else row[i] for row, special in zip(rows, specials)]))
+            except (ArithmeticError, TypeError, ValueError):
+                mask[i] = True
+                results.append(0)
+        result = numpy.array(results)
+        if result.dtype.kind not in 'biuf':
+            result = numpy.array(results, dtype=object)
+        return result
+
+    def _calculate_columns(self, node, columns):
+        """Вычисление дерева выражения над столбцами значений"""
+        kind = node[0]
+        if kind == 'const':
+            return node[1]
+        elif kind == 'operand':
+            return columns[node[1]]
+        elif kind == 'unary':
+            return node[1](self._calculate_columns(node[2], columns))
+        elif kind == 'binary':
+            return node[1](self._calculate_columns(node[2], columns), self._calculate_columns(node[3], columns))
+        else:
+            operands = [self._calculate_columns(operand, columns) for operand in node[2]]
+            return numpy.logical_and.reduce(
+                [func(left, right) for func, left, right in zip(node[1], operands, operands[1:])]
+            )
+
+    def is_actual(self) -> bool:
+        """Проверяет, что с момента компиляции не изменились ``items`` выражения и вложенных выражений"""
+        return all(expr.items is items for expr, items in self._deps)
+
+    def _tokenize(self, expr, operands):
+        """Разбивает элементы выражения на лексемы: ('op', оператор) или ('node', узел)"""
+        self._deps.append((expr, expr.items))
+        tokens = []
+        for item in expr.items:
             if isinstance(item, Trp):
-                if item.special:
-                    value = special_source.get(item.prefix, item.name).value
-                    result.append(str(value))
-                else:
-                    value = source.get(item.prefix, item.name).value
-                    result.append(str(value))
+                operand = (hash((item.prefix, item.name)), item.special, item.prefix, item.name)
+                index = operands.setdefault(operand, len(operands))
+                tokens.append(('node', ('operand', index)))
             elif isinstance(item, TrpExpr):
-                result.append(str(item.calculate(source, special_source)))
+                sub_tokens = self._tokenize(item, operands)
+                node, pos = self._parse(sub_tokens, 0, 0)
+                if pos != len(sub_tokens):
+                    raise ValueError('Неверный формат триплетного выражения', str(item))
+                tokens.append(('node', node))
+            elif isinstance(item, str):
+                pos = 0
+                item = item.strip()
+                while pos < len(item):
+                    match = self._re_token.match(item, pos)
+                    if match is None:
+                        raise ValueError('Недопустимый оператор в триплетном выражении', item)
+                    number, op = match.groups()
+                    if number is not None:
+                        tokens.append(('node', ('const', float(number) if number.strip('0123456789') else int(number))))
+                    else:
+                        tokens.append(('op', op))
+                    pos = match.end()
             else:
-                result.append(str(item))
+                tokens.append(('node', ('const', item)))
+        return tokens
+
+    def _parse(self, tokens, pos, min_priority):
+        """Разбор лексем методом восхождения по приоритетам (precedence climbing)"""
+        left, pos = self._parse_unary(tokens, pos)
+        chain = None  # цепочка сравнений текущего уровня
+        while pos < len(tokens):
+            kind, op = tokens[pos]
+            if kind != 'op' or op not in self.operators:
+                break
+            func, priority = self.operators[op]
+            if priority < min_priority:
+                break
+            next_priority = priority if op in self._right_assoc else priority + 1
+            right, pos = self._parse(tokens, pos + 1, next_priority)
+            if priority == self._compare_priority:
+                if chain is None:
+                    chain = ([], [left])
+                chain[0].append(func)
+                chain[1].append(right)
+                left = ('compare', tuple(chain[0]), tuple(chain[1]))
+            else:
+                chain = None
+                left = self._fold(('binary', func, left, right))
+        return left, pos
+
+    def _parse_unary(self, tokens, pos):
+        if pos >= len(tokens):
+            raise ValueError('Неверный формат триплетного выражения', str(self.expr))
+        kind, value = tokens[pos]
+        if kind == 'node':
+            return value, pos + 1
+        if value in self.unary_operators:
+            operand, pos = self._parse(tokens, pos + 1, self._unary_priority)
+            return self._fold(('unary', self.unary_operators[value], operand)), pos
+        if value == '(':
+            node, pos = self._parse(tokens, pos + 1, 0)
+            if pos >= len(tokens) or tokens[pos] != ('op', ')'):
+                raise ValueError('Не закрыта скобка в триплетном выражении', str(self.expr))
+            return node, pos + 1
+        raise ValueError('Неверный формат триплетного выражения', str(self.expr))
+
+    @staticmethod
+    def _fold(node):
+        """Свёртка константных подвыражений"""
+        args = node[2:]
+        if all(arg[0] == 'const' for arg in args):
+            try:
+                return 'const', node[1](*(arg[1] for arg in args))
+            except Exception:
+                # ошибка (например, деление на ноль) будет вызвана при вычислении
+                pass
+        return node
+
+    def _build(self, node):
+        """Построение вычисляющей функции по дереву выражения"""
+        kind = node[0]
+        if kind == 'const':
+            const = node[1]
+            return lambda values: const
+        elif kind == 'operand':
+            return operator.itemgetter(node[1])
+        elif kind == 'unary':
+            func, operand = node[1], self._build(node[2])
+            return lambda values: func(operand(values))
+        elif kind == 'binary':
+            func, left, right = node[1], self._build(node[2]), self._build(node[3])
+            return lambda values: func(left(values), right(values))
+        else:
+            return _chain_compare(node[1], tuple(self._build(operand) for operand in node[2]))
+
+
+class TrpExprMemo:
+    """
+    **Кэш результатов вычисления триплетных выражений (LRU)**
+
+    Результат запоминается по вычислителю выражения (:class:`TrpExprEvaluator`), кортежу значений
+    триплетов-операндов и их типов (равные значения разных типов, например ``1`` и ``1.0``, могут давать
+    разные результаты), поэтому повторное вычисление с теми же значениями сводится к поиску в словаре.
+    При переполнении вытесняется результат, к которому дольше всего не обращались.
+    Передаётся параметром ``memo`` в :meth:`TrpExpr.calculate` и :meth:`TrpExprEvaluator.__call__`.
+
+    .. note::
+        * после изменения ``items`` выражения создаётся новый вычислитель, поэтому прежние результаты
+          не используются и со временем вытесняются;
+        * результат не запоминается, если значение операнда нехешируемое (например, триплет-ссылка);
+        * исключения при вычислении не запоминаются.
+
+    :param int maxsize: наибольшее количество запоминаемых результатов
+
+    :raises TypeError: если ``maxsize`` не int
+    :raises ValueError: если ``maxsize`` меньше 1
+
+    :Пример работы:
+        >>> memo = TrpExprMemo(maxsize=2)
+        >>> expr = TrpExpr(Trp('A', 'B'), '*', 2)
+        >>> expr.calculate(TrpStr(Trp('A', 'B', 21)), memo=memo)
+        42
+        >>> expr.calculate(TrpStr(Trp('A', 'B', 21), Trp('C', 'D', 1)), memo=memo)
+        42
+        >>> memo.hits, memo.misses
+        (1, 1)
+    """
+    __slots__ = ('maxsize', 'hits', 'misses', 'evictions', '_cache')
+
+    def __init__(self, maxsize=1024):
+        if not isinstance(maxsize, int) or isinstance(maxsize, bool):
+            raise TypeError('Размер должен быть int, не ' + type_name(maxsize), maxsize)
+        if maxsize < 1:
+            raise ValueError('Размер должен быть не меньше 1', maxsize)
+        self.maxsize = maxsize  #: Наибольшее количество запоминаемых результатов
+        self.hits = 0  #: Количество вычислений, результат которых взят из кэша
+        self.misses = 0  #: Количество вычислений, результат которых не найден в кэше
+        self.evictions = 0  #: Количество вытесненных результатов
+        self._cache = OrderedDict()
+
+    def __repr__(self):
+        return '<{}: {}/{}, hits={}, misses={}>'.format(
+            TrpExprMemo.__name__, len(self._cache), self.maxsize, self.hits, self.misses
+        )
+
+    def __len__(self):
+        return len(self._cache)
+
+    def evaluate(self, evaluator, values):
+        """
+        Возвращает результат вычисления выражения из кэша или вычисляет и запоминает его
+
+        :param TrpExprEvaluator evaluator: вычислитель выражения
+        :param values: значения триплетов-операндов в порядке :attr:`TrpExprEvaluator.operands`
+        :type values: Sequence
+        :return: результат вычисления выражения
+        """
+        values = tuple(values)
+        key = (evaluator, values, tuple(map(type, values)))
+        cache = self._cache
+        try:
+            result = cache[key]
+        except KeyError:
+            pass
+        except TypeError:
+            # нехешируемое значение операнда
+            self.misses += 1
+            return evaluator.evaluate(values)
+        else:
+            self.hits += 1
+            cache.move_to_end(key)
+            return result
+
+        self.misses += 1
+        result = cache[key] = evaluator.evaluate(values)
+        if len(cache) > self.maxsize:
+            cache.popitem(last=False)
+            self.evictions += 1
+        return result
 
-        # TODO переписать с использованием модуля operator
-        return eval(''.join(result), {'__builtins__': {}})
+    def clear(self) -> None:
+        """Очищает кэш и обнуляет счётчики"""
+        self._cache.clear()
+        self.hits = self.misses = self.evictions = 0
 
 # настройка валидации значения триплетов
 # сделано следующим образом, так как классы Trp и TrpExpr объявляются после объявления VSPTDSettings